@@ -0,0 +1,23 @@
+import numpy as np
+import hashlib
+
+def file_checksum(path : str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def export_linear_model(model, joblib_path : str, npz_path : str) -> None:
+    # Same layout as LinearScorer.save in the gateway (app/models/linear.py), tagged with the
+    # joblib checksum so the gateway only uses it while it matches the joblib next to it
+    np.savez(
+        npz_path,
+        source_checksum=np.array(file_checksum(joblib_path)),
+        coef=np.atleast_2d(model.coef_),
+        intercept=np.atleast_1d(model.intercept_),
+        classes=np.asarray(model.classes_),
+        n_features=np.array(np.atleast_2d(model.coef_).shape[1]),
+        kind=np.array(type(model).__name__),
+        feature_names=np.asarray(getattr(model, "feature_names_in_", []), dtype=str)
+    )
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import json
+
+class FeatureSchema:
+    # Training-time half of the gateway's FeaturePipeline (app/models/features.py).
+    # Fitted on the training split and saved as <model>.features.json next to the model,
+    # so the gateway replays exactly the same encoding and scaling at serve time.
+
+    def __init__(self, columns : list, categorical : dict = None, mean : list = None, scale : list = None):
+        self.columns = list(columns)
+        self.categorical = categorical or {}
+        self.mean = mean
+        self.scale = scale
+
+    @staticmethod
+    def fit(X : pd.DataFrame, categorical : dict = None, standardize : bool = False) -> "FeatureSchema":
+        schema = FeatureSchema(X.columns, categorical)
+        if standardize:
+            encoded = schema.encode(X)
+            mean = encoded.mean(axis=0)
+            scale = encoded.std(axis=0)
+            # Same convention as StandardScaler for constant columns
+            scale[scale == 0] = 1.0
+            schema.mean = mean.tolist()
+            schema.scale = scale.tolist()
+        return schema
+
+    def encode(self, X : pd.DataFrame) -> np.ndarray:
+        X = X[self.columns].copy()
+        for column, mapping in self.categorical.items():
+            X[column] = X[column].map(mapping)
+        return X.to_numpy(dtype=np.float64)
+
+    def transform(self, X : pd.DataFrame) -> np.ndarray:
+        encoded = self.encode(X)
+        if self.mean is None:
+            return encoded
+        return (encoded - np.asarray(self.mean)) / np.asarray(self.scale)
+
+    def save(self, path : str) -> None:
+        with open(path, "w") as f:
+            json.dump({
+                "columns" : self.columns,
+                "categorical" : self.categorical,
+                "mean" : self.mean,
+                "scale" : self.scale
+            }, f, indent=2)
+
+    @staticmethod
+    def load(path : str) -> "FeatureSchema":
+        with open(path) as f:
+            schema = json.load(f)
+        return FeatureSchema(schema["columns"], schema.get("categorical"), schema.get("mean"), schema.get("scale"))
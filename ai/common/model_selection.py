@@ -0,0 +1,150 @@
+# Cross-validated model selection that weighs accuracy against serving cost.
+#
+# Every candidate family is tuned with GridSearchCV across all cores, then its best estimator
+# is timed for single-row and batch prediction and measured for serialized size. The report
+# marks the Pareto front over (accuracy, single-row latency, size) and which candidates fit
+# the gateway's latency budget.
+#
+#   cd ai && python -m common.model_selection thyroid --csv tyroid_cancer_risk/dataset.csv --out reports --latency-budget-us 200
+import argparse
+import json
+import os
+import pickle
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.model_selection import GridSearchCV, train_test_split
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+from common.export import export_linear_model
+from common.features import FeatureSchema
+from common.specs import SPECS
+from common.train import prepare
+
+CANDIDATES = {
+    "logistic_regression" : (LogisticRegression(max_iter=1000), {"C" : [0.01, 0.1, 1.0, 10.0]}),
+    "sgd_log_loss" : (SGDClassifier(loss="log_loss", random_state=42), {"alpha" : [1e-5, 1e-4, 1e-3]}),
+    "decision_tree" : (DecisionTreeClassifier(random_state=42), {"max_depth" : [4, 8, 16]}),
+    "random_forest" : (RandomForestClassifier(random_state=42), {"n_estimators" : [50, 200], "max_depth" : [8, None]}),
+    "hist_gradient_boosting" : (HistGradientBoostingClassifier(random_state=42), {"learning_rate" : [0.05, 0.1], "max_depth" : [3, None]}),
+    "knn" : (KNeighborsClassifier(), {"n_neighbors" : [5, 15, 45]})
+}
+
+def latency(model, X : np.ndarray, number : int) -> float:
+    timings = []
+    for _ in range(number):
+        start = time.perf_counter()
+        model.predict(X)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+def pareto_front(results : list) -> None:
+    for result in results:
+        result["pareto"] = not any(
+            other is not result
+            and other["accuracy"] >= result["accuracy"]
+            and other["single_row_us"] <= result["single_row_us"]
+            and other["size_bytes"] <= result["size_bytes"]
+            and (
+                other["accuracy"] > result["accuracy"]
+                or other["single_row_us"] < result["single_row_us"]
+                or other["size_bytes"] < result["size_bytes"]
+            )
+            for other in results
+        )
+
+def write_report(results : list, path : str, budget_us : float) -> None:
+    with open(path + ".json", "w") as f:
+        json.dump(results, f, indent=2)
+
+    lines = [
+        f"| candidate | accuracy | cv accuracy | 1 row (us) | 1024 rows (us) | size (KB) | pareto | within {budget_us:g} us |",
+        "|---|---|---|---|---|---|---|---|"
+    ]
+    for result in sorted(results, key=lambda result: -result["accuracy"]):
+        lines.append(
+            f"| {result['name']} | {result['accuracy']:.4f} | {result['cv_accuracy']:.4f} | "
+            f"{result['single_row_us']:.1f} | {result['batch_us']:.1f} | {result['size_bytes'] / 1024:.1f} | "
+            f"{'yes' if result['pareto'] else ''} | {'yes' if result['within_budget'] else ''} |"
+        )
+    with open(path + ".md", "w") as f:
+        f.write("\n".join(lines) + "\n")
+    print("\n".join(lines))
+
+def main(argv : list = None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("dataset", choices=sorted(SPECS.keys()))
+    parser.add_argument("--csv", required=True)
+    parser.add_argument("--out", default="reports")
+    parser.add_argument("--candidates", nargs="*", default=sorted(CANDIDATES.keys()), choices=sorted(CANDIDATES.keys()))
+    parser.add_argument("--cv", type=int, default=5)
+    parser.add_argument("--sample-rows", type=int, default=None, help="subsample large datasets before searching")
+    parser.add_argument("--latency-budget-us", type=float, default=500.0)
+    parser.add_argument("--save", action="store_true", help="write the most accurate candidate within budget as gateway artifacts")
+    args = parser.parse_args(argv)
+
+    spec = SPECS[args.dataset]
+    X, y = prepare(pd.read_csv(args.csv), spec)
+    if args.sample_rows and len(X) > args.sample_rows:
+        sample = np.random.default_rng(42).choice(len(X), args.sample_rows, replace=False)
+        X = X.iloc[sample]
+        y = y[sample]
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, train_size=0.8, random_state=42)
+
+    # Every candidate sees the same standardized inputs, which is what the gateway's pipeline replays
+    schema = FeatureSchema.fit(X_train, standardize=True)
+    X_train = schema.transform(X_train)
+    X_test = schema.transform(X_test)
+    # prepare() already encoded the categorical columns, the maps are only needed by the gateway
+    schema.categorical = spec["categorical"]
+    single_row = X_test[:1]
+    batch = np.resize(X_test, (1024, X_test.shape[1]))
+
+    results = []
+    estimators = {}
+    for name in args.candidates:
+        estimator, grid = CANDIDATES[name]
+        started = time.perf_counter()
+        search = GridSearchCV(estimator, grid, cv=args.cv, n_jobs=-1, scoring="accuracy")
+        search.fit(X_train, y_train)
+        model = search.best_estimator_
+        estimators[name] = model
+
+        result = {
+            "name" : name,
+            "params" : search.best_params_,
+            "cv_accuracy" : float(search.best_score_),
+            "accuracy" : float((model.predict(X_test) == y_test).mean()),
+            "single_row_us" : latency(model, single_row, 200) * 1e6,
+            "batch_us" : latency(model, batch, 20) * 1e6,
+            "size_bytes" : len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)),
+            "search_seconds" : time.perf_counter() - started
+        }
+        result["within_budget"] = result["single_row_us"] <= args.latency_budget_us
+        results.append(result)
+        print(f"{name}: accuracy {result['accuracy']:.4f}, {result['single_row_us']:.1f} us/row, {result['size_bytes']} bytes")
+
+    pareto_front(results)
+    os.makedirs(args.out, exist_ok=True)
+    write_report(results, os.path.join(args.out, f"{args.dataset}_model_selection"), args.latency_budget_us)
+
+    if args.save:
+        eligible = [result for result in results if result["within_budget"]]
+        if not eligible:
+            raise SystemExit("No candidate fits the latency budget")
+        best = max(eligible, key=lambda result: result["accuracy"])
+        model = estimators[best["name"]]
+        base = os.path.join(args.out, spec["artifact"])
+        joblib.dump(model, base + ".joblib")
+        schema.save(base + ".features.json")
+        if hasattr(model, "coef_"):
+            export_linear_model(model, base + ".joblib", base + ".npz")
+        print(f"Saved {best['name']} to {base}.joblib")
+
+if __name__ == "__main__":
+    main()
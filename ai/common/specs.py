@@ -0,0 +1,37 @@
+# Dataset descriptions for the shared training CLI, mirroring what each predictor's main.py does.
+YES_NO = {"No" : 0, "Yes" : 1}
+GENDER = {"Female" : 0, "Male" : 1}
+
+SPECS = {
+    "general_health" : {
+        "artifact" : "general_health_predictor",
+        "target" : "disease_risk",
+        "target_map" : None,
+        "drop" : [],
+        "categorical" : {"gender" : GENDER},
+        "standardize" : False
+    },
+    "pregnancy" : {
+        "artifact" : "pregnancy_risk_model",
+        "target" : "Risk Level",
+        "target_map" : {"Low" : 0, "High" : 1},
+        "drop" : [],
+        "categorical" : {},
+        "standardize" : False
+    },
+    "thyroid" : {
+        "artifact" : "tyoid_cancer_risk",
+        "target" : "Thyroid_Cancer_Risk",
+        "target_map" : {"Low" : 0, "Medium" : 1, "High" : 2},
+        "drop" : ["Patient_ID", "Country", "Ethnicity", "Radiation_Exposure", "Diagnosis", "Nodule_Size"],
+        "categorical" : {
+            "Family_History" : YES_NO,
+            "Iodine_Deficiency" : YES_NO,
+            "Smoking" : YES_NO,
+            "Obesity" : YES_NO,
+            "Diabetes" : YES_NO,
+            "Gender" : GENDER
+        },
+        "standardize" : True
+    }
+}
@@ -0,0 +1,197 @@
+# Out-of-core training for the risk predictors.
+#
+# Streams the dataset in chunks (optionally through a one-off Parquet cache), fits an
+# incremental estimator with partial_fit and writes the artifacts the gateway loads:
+# <artifact>.joblib, <artifact>.features.json and the <artifact>.npz linear fast path.
+#
+#   cd ai && python -m common.train thyroid --csv tyroid_cancer_risk/dataset.csv --out tyroid_cancer_risk --memory-mb 256
+import argparse
+import os
+import resource
+import sys
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDClassifier
+
+from common.features import FeatureSchema
+from common.specs import SPECS
+from common.export import export_linear_model
+
+def peak_memory_mb() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return usage / (1024 * 1024) if sys.platform == "darwin" else usage / 1024
+
+def rows_per_chunk(csv_path : str, memory_mb : float) -> int:
+    # Sized from a sample, with headroom for the encoded copy and the estimator's own buffers
+    sample = pd.read_csv(csv_path, nrows=1000)
+    bytes_per_row = max(1, sample.memory_usage(deep=True).sum() / max(1, len(sample)))
+    return max(1000, int(memory_mb * 1024 * 1024 / (bytes_per_row * 4)))
+
+def build_parquet_cache(csv_path : str, parquet_path : str, chunk_rows : int) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("--parquet-cache needs pyarrow installed")
+
+    writer = None
+    rows = 0
+    tmp_path = parquet_path + ".tmp"
+    try:
+        for chunk in pd.read_csv(csv_path, chunksize=chunk_rows):
+            rows += len(chunk)
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema)
+            else:
+                table = table.cast(writer.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp_path, parquet_path)
+    return rows
+
+def read_chunks(args, chunk_rows : int):
+    if args.parquet_cache:
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(args.parquet_cache).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(args.csv, chunksize=chunk_rows)
+
+def prepare(chunk : pd.DataFrame, spec : dict):
+    chunk = chunk.drop(columns=[column for column in spec["drop"] if column in chunk.columns])
+    if spec["target_map"]:
+        chunk[spec["target"]] = chunk[spec["target"]].map(spec["target_map"])
+    for column, mapping in spec["categorical"].items():
+        chunk[column] = chunk[column].map(mapping)
+    chunk = chunk.dropna()
+    X = chunk.drop(columns=[spec["target"]])
+    y = chunk[spec["target"]].to_numpy()
+    return X, y
+
+def split(offset : int, count : int, test_every : int) -> np.ndarray:
+    # Deterministic hold-out by row position, so every pass sees the same split without storing it
+    return (np.arange(offset, offset + count) % test_every) == 0
+
+class Pass:
+    def __init__(self, name : str):
+        self.name = name
+        self.rows = 0
+        self.started = time.perf_counter()
+
+    def done(self) -> None:
+        elapsed = time.perf_counter() - self.started
+        print(f"[{self.name}] {self.rows} rows in {elapsed:.2f}s, {self.rows / max(elapsed, 1e-9):,.0f} rows/s, peak memory {peak_memory_mb():.1f} MB")
+
+def main(argv : list = None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("dataset", choices=sorted(SPECS.keys()))
+    parser.add_argument("--csv", required=True)
+    parser.add_argument("--out", default=".")
+    parser.add_argument("--parquet-cache", default=None, help="columnar copy of the CSV, built on first use")
+    parser.add_argument("--memory-mb", type=float, default=256.0)
+    parser.add_argument("--chunk-rows", type=int, default=None)
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--test-every", type=int, default=5, help="every Nth row is held out for evaluation")
+    args = parser.parse_args(argv)
+
+    spec = SPECS[args.dataset]
+    chunk_rows = args.chunk_rows or rows_per_chunk(args.csv, args.memory_mb)
+    print(f"Training {args.dataset} in chunks of {chunk_rows} rows")
+
+    if args.parquet_cache and not os.path.exists(args.parquet_cache):
+        stats = Pass("parquet cache")
+        stats.rows = build_parquet_cache(args.csv, args.parquet_cache, chunk_rows)
+        stats.done()
+
+    # Pass 1: column order, class labels and streaming mean/variance for the scaler. Each chunk's
+    # (count, mean, M2) is merged with Chan's parallel update, which doesn't lose the variance to
+    # cancellation the way E[x^2] - E[x]^2 does on large, low-variance columns
+    stats = Pass("schema")
+    columns = None
+    classes = set()
+    count = 0
+    mean = None
+    m2 = None
+    for chunk in read_chunks(args, chunk_rows):
+        X, y = prepare(chunk, spec)
+        stats.rows += len(chunk)
+        if columns is None:
+            columns = list(X.columns)
+        classes.update(np.unique(y).tolist())
+        if spec["standardize"] and len(X):
+            encoded = X[columns].to_numpy(dtype=np.float64)
+            chunk_count = len(encoded)
+            chunk_mean = encoded.mean(axis=0)
+            chunk_m2 = ((encoded - chunk_mean) ** 2).sum(axis=0)
+            if mean is None:
+                mean, m2 = chunk_mean, chunk_m2
+            else:
+                delta = chunk_mean - mean
+                merged = count + chunk_count
+                mean = mean + delta * (chunk_count / merged)
+                m2 = m2 + chunk_m2 + delta ** 2 * (count * chunk_count / merged)
+            count += chunk_count
+    stats.done()
+
+    if columns is None:
+        raise SystemExit("The dataset is empty")
+
+    # Categorical columns are already mapped by prepare, so the schema's maps only matter at serve time
+    schema = FeatureSchema(columns, spec["categorical"])
+    if spec["standardize"] and count:
+        scale = np.sqrt(m2 / count)
+        scale[scale == 0] = 1.0
+        schema.mean = mean.tolist()
+        schema.scale = scale.tolist()
+
+    classes = np.array(sorted(classes))
+    model = SGDClassifier(loss="log_loss", random_state=42)
+
+    def scaled(X : pd.DataFrame) -> np.ndarray:
+        encoded = X[columns].to_numpy(dtype=np.float64)
+        if schema.mean is None:
+            return encoded
+        return (encoded - np.asarray(schema.mean)) / np.asarray(schema.scale)
+
+    for epoch in range(args.epochs):
+        stats = Pass(f"epoch {epoch + 1}/{args.epochs}")
+        offset = 0
+        for chunk in read_chunks(args, chunk_rows):
+            X, y = prepare(chunk, spec)
+            test = split(offset, len(X), args.test_every)
+            offset += len(X)
+            stats.rows += len(chunk)
+            if (~test).any():
+                model.partial_fit(scaled(X)[~test], y[~test], classes=classes)
+        stats.done()
+
+    stats = Pass("evaluate")
+    correct = 0
+    evaluated = 0
+    offset = 0
+    for chunk in read_chunks(args, chunk_rows):
+        X, y = prepare(chunk, spec)
+        test = split(offset, len(X), args.test_every)
+        offset += len(X)
+        stats.rows += len(chunk)
+        if test.any():
+            correct += int((model.predict(scaled(X)[test]) == y[test]).sum())
+            evaluated += int(test.sum())
+    stats.done()
+    print("Acc:", correct / evaluated if evaluated else float("nan"))
+
+    os.makedirs(args.out, exist_ok=True)
+    base = os.path.join(args.out, spec["artifact"])
+    joblib.dump(model, base + ".joblib")
+    schema.save(base + ".features.json")
+    export_linear_model(model, base + ".joblib", base + ".npz")
+    print(f"Wrote {base}.joblib, {base}.features.json and {base}.npz")
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,28 @@
+import os
+import sys
 import pandas as pd
 from sklearn.linear_model import LogisticRegression
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
-from sklearn.preprocessing import StandardScaler
 import joblib
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.features import FeatureSchema
+
 dataset_path = "dataset.csv"
 
 df = pd.read_csv(dataset_path)
 
-df.drop("id", axis = 1)
-
-df['gender'] = df['gender'].map({'Female': 0, 'Male': 1})
-
+# "id" stays a feature: the served model and its form expect all 15 columns
 X = df.drop("disease_risk", axis=1)
 y = df["disease_risk"]
 
 X_train, X_test, y_train, y_test = train_test_split(X, y, train_size=0.8, random_state=42)
 
+schema = FeatureSchema.fit(X_train, categorical={"gender" : {"Female" : 0, "Male" : 1}})
+X_train = schema.transform(X_train)
+X_test = schema.transform(X_test)
+
 model = LogisticRegression()
 
 model.fit(X_train, y_train)
@@ -28,3 +33,4 @@ accuracy = accuracy_score(y_test, y_pred)
 print("Acc:", accuracy)
 
 joblib.dump(model, "general_health_predictor.joblib")
+schema.save("general_health_predictor.features.json")
@@ -1,9 +1,14 @@
+import os
+import sys
 import pandas as pd
 from sklearn.linear_model import LogisticRegression
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
 import joblib
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.features import FeatureSchema
+
 dataset_path = "dataset.csv"
 
 df = pd.read_csv(dataset_path)
@@ -21,6 +26,10 @@ y = data_cleaned["Risk Level"]
 
 X_train, X_test, y_train, y_test = train_test_split(X, y, train_size=0.8, random_state=42)
 
+schema = FeatureSchema.fit(X_train)
+X_train = schema.transform(X_train)
+X_test = schema.transform(X_test)
+
 model = LogisticRegression()
 
 model.fit(X_train, y_train)
@@ -31,3 +40,4 @@ accuracy = accuracy_score(y_test, y_pred)
 print("Acc:", accuracy)
 
 joblib.dump(model, "pregnancy_risk_model.joblib")
+schema.save("pregnancy_risk_model.features.json")
@@ -5,11 +5,45 @@ class Settings(BaseSettings):
     DB_NAME: str
     DB_USER_COLLECTION: str
     DB_LOGS_COLLECTION: str
+    DB_LOG_ROLLUPS_COLLECTION : str = "log_rollups"
+    DB_LOCKS_COLLECTION : str = "locks"
     DB_APPOINTMENTS_COLLECTION : str
     DB_FORMS_COLLECTION : str
+    DB_AVAILABILITY_COLLECTION : str = "availability"
+    DB_SCHEDULES_COLLECTION : str = "schedules"
+    DB_WAITLIST_COLLECTION : str = "waitlist"
     #Security
     JWT_ALGORITHM: str
     SECRET_KEY: str
+    #Scheduling
+    SLOT_FIRST_HOUR : int = 8
+    SLOT_LAST_HOUR : int = 15
+    SLOT_WORKING_DAYS : int = 5
+    RELEASE_MAX_ATTEMPTS : int = 20
+    RELEASE_RETRY_PAUSE_S : float = 0.05
+    APPOINTMENT_TIMEZONE : str = "UTC"
+    DATE_MIGRATION_ENABLED : bool = True
+    DATE_MIGRATION_BATCH_SIZE : int = 500
+    DATE_MIGRATION_PAUSE_S : float = 0.05
+    #Logging
+    LOG_QUEUE_SIZE : int = 10000
+    LOG_BATCH_SIZE : int = 500
+    LOG_FLUSH_INTERVAL_S : float = 1.0
+    LOG_QUEUE_POLICY : str = "drop"
+    LOG_SHUTDOWN_TIMEOUT_S : float = 10.0
+    LOG_MIGRATION_ENABLED : bool = True
+    LOG_MIGRATION_BATCH_SIZE : int = 500
+    LOG_MIGRATION_PAUSE_S : float = 0.05
+    LOG_PAGE_SIZE : int = 100
+    LOG_MAX_PAGE_SIZE : int = 1000
+    LOG_STREAM_BATCH_SIZE : int = 500
+    LOG_ROLLUP_MINUTE_TTL_DAYS : int = 14
+    LOG_ROLLUP_MAX_BUCKETS : int = 20000
+    LOG_RETENTION_DAYS : int = 30
+    LOG_ARCHIVE_DIR : str = "log_archive"
+    LOG_ARCHIVE_CODEC : str = "gzip"
+    LOG_ARCHIVE_INTERVAL_S : float = 3600.0
+    LOG_ARCHIVE_LEASE_S : float = 600.0
     class Config:
         env_file = ".env"
 
@@ -0,0 +1,55 @@
+from app.core.config import settings
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+# Appointment dates travel as wall-clock strings in the clinic's timezone and are stored as BSON
+# datetimes (UTC). Documents written before the migration still hold the string, so every reader
+# here accepts both.
+DATE_FORMAT = "%Y-%m-%d %H:%M"
+
+def local_zone() -> ZoneInfo:
+    return ZoneInfo(settings.APPOINTMENT_TIMEZONE)
+
+def local_now() -> datetime:
+    # Naive wall-clock time in the clinic's timezone, the same frame as DATE_FORMAT strings
+    return datetime.now(local_zone()).replace(tzinfo=None)
+
+def to_storage(date : str) -> datetime:
+    return datetime.strptime(date, DATE_FORMAT).replace(tzinfo=local_zone()).astimezone(timezone.utc)
+
+def to_local(value) -> datetime:
+    # Naive wall-clock datetime of a stored date, whichever form it is in
+    if isinstance(value, str):
+        return datetime.strptime(value, DATE_FORMAT)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(local_zone()).replace(tzinfo=None)
+
+def to_display(value) -> str:
+    if isinstance(value, str):
+        return value
+    return to_local(value).strftime(DATE_FORMAT)
+
+def range_filter(start : str = None, end : str = None) -> dict:
+    # [start, end) over both forms; each branch of the $or can use an index on date
+    if not start and not end:
+        return {}
+    native = {}
+    legacy = {}
+    if start:
+        native["$gte"] = to_storage(start)
+        legacy["$gte"] = start
+    if end:
+        native["$lt"] = to_storage(end)
+        legacy["$lt"] = end
+    return {"$or" : [{"date" : native}, {"date" : legacy}]}
+
+def display_expression(field : str = "$date") -> dict:
+    # Aggregation-side to_display, so pipelines keep returning the string format
+    return {
+        "$cond" : [
+            {"$eq" : [{"$type" : field}, "date"]},
+            {"$dateToString" : {"format" : DATE_FORMAT, "date" : field, "timezone" : settings.APPOINTMENT_TIMEZONE}},
+            field
+        ]
+    }
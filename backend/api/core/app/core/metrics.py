@@ -0,0 +1,123 @@
+from pymongo import monitoring
+from bisect import bisect_left
+import threading
+
+# Latency buckets in seconds, from 1 ms to 10 s
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def format_labels(names : tuple, values : tuple, extra : str = "") -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def format_value(value) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    def __init__(self, name : str, help : str, labels : tuple = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self.values = {}
+
+    def inc(self, labels : tuple = (), amount : float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{format_labels(self.labels, labels)} {format_value(value)}" for labels, value in sorted(self.values.items())]
+        return lines
+
+class Gauge(Counter):
+    def dec(self, labels : tuple = (), amount : float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+    def render(self) -> list:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+class Histogram:
+    # Per label set: a count per bucket (non-cumulative, summed up when rendered), the sum and the count.
+    # observe() is a bisect and two list updates, cheap enough for every request.
+    def __init__(self, name : str, help : str, labels : tuple = (), buckets : tuple = LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self.series = {}
+
+    def observe(self, labels : tuple, value : float) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                bucket_label = 'le="' + format_value(float(bound)) + '"'
+                lines.append(f"{self.name}_bucket{format_labels(self.labels, labels, bucket_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labels, labels)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(self.labels, labels)} {cumulative}")
+        return lines
+
+class Metrics:
+    registry = []
+    # Samples gathered from other modules' own counters when /metrics is scraped: name -> (type, help, callable)
+    collectors = {}
+
+    @staticmethod
+    def counter(name : str, help : str, labels : tuple = ()) -> Counter:
+        metric = Counter(name, help, labels)
+        Metrics.registry.append(metric)
+        return metric
+
+    @staticmethod
+    def gauge(name : str, help : str, labels : tuple = ()) -> Gauge:
+        metric = Gauge(name, help, labels)
+        Metrics.registry.append(metric)
+        return metric
+
+    @staticmethod
+    def histogram(name : str, help : str, labels : tuple = (), buckets : tuple = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labels, buckets)
+        Metrics.registry.append(metric)
+        return metric
+
+    @staticmethod
+    def collect(name : str, type : str, help : str, callback) -> None:
+        Metrics.collectors[name] = (type, help, callback)
+
+    @staticmethod
+    def render() -> str:
+        lines = []
+        for metric in Metrics.registry:
+            lines += metric.render()
+        for name, (type, help, callback) in Metrics.collectors.items():
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {type}"]
+            lines += [f"{name}{format_labels(tuple(labels), tuple(labels.values()))} {format_value(value)}" for labels, value in callback()]
+        return "\n".join(lines) + "\n"
+
+REQUEST_DURATION = Metrics.histogram("http_request_duration_seconds", "Time from receiving a request to its response", ("method", "route"))
+REQUESTS = Metrics.counter("http_requests_total", "Requests served", ("method", "route", "status"))
+IN_FLIGHT = Metrics.gauge("http_requests_in_flight", "Requests being processed")
+MONGO_DURATION = Metrics.histogram("mongodb_command_duration_seconds", "MongoDB command round trips", ("command",))
+MONGO_FAILURES = Metrics.counter("mongodb_command_failures_total", "MongoDB commands that failed", ("command",))
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    # The driver reports the duration with each outcome, so nothing is kept between started and succeeded.
+    # Events can come from the driver's monitor threads, the lock keeps the histogram consistent.
+    lock = threading.Lock()
+
+    def started(self, event) -> None:
+        pass
+
+    def succeeded(self, event) -> None:
+        with MongoCommandMetrics.lock:
+            MONGO_DURATION.observe((event.command_name,), event.duration_micros / 1e6)
+
+    def failed(self, event) -> None:
+        with MongoCommandMetrics.lock:
+            MONGO_DURATION.observe((event.command_name,), event.duration_micros / 1e6)
+            MONGO_FAILURES.inc((event.command_name,))
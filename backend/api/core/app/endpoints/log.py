@@ -2,16 +2,28 @@ from fastapi import APIRouter,Depends
 from app.modules.auth.service import AuthService
 from app.modules.log.service import LogService
 from app.modules.log.model import LogEntry
+from typing import Optional
+from datetime import datetime
 
 router = APIRouter()
 
 @router.get (
     "/logs/"
 )
-async def logs(current_user : dict = Depends(AuthService.get_current_user)):
-    result = await LogService.fetch_logs(current_user) 
+async def logs(start : Optional[datetime] = None, end : Optional[datetime] = None, user : Optional[str] = None, type : Optional[str] = None,
+               path : Optional[str] = None, after : Optional[str] = None, limit : Optional[int] = None, format : str = "json",
+               current_user : dict = Depends(AuthService.get_current_user)):
+    result = await LogService.fetch_logs(current_user, start, end, user, type, path, after, limit, format) 
     return result
 
+@router.get (
+    "/logs/rollups"
+)
+async def log_rollups(granularity : str = "minute", start : Optional[datetime] = None, end : Optional[datetime] = None,
+                      route : Optional[str] = None, role : Optional[str] = None, group_by : Optional[str] = None,
+                      current_user : dict = Depends(AuthService.get_current_user)):
+    return await LogService.fetch_rollups(current_user, granularity, start, end, route, role, group_by)
+
 @router.post (
     "/logs/register"
 )
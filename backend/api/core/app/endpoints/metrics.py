@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.core.metrics import Metrics
+
+router = APIRouter()
+
+@router.get(
+    "/metrics",
+    summary="Request, MongoDB and background writer metrics in the Prometheus text format"
+)
+async def metrics():
+    return PlainTextResponse(Metrics.render(), media_type="text/plain; version=0.0.4")
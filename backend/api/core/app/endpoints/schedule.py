@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends
+from app.modules.availability.service import AvailabilityService
+from app.modules.availability.model import ScheduleRequest
+from app.modules.auth.service import AuthService
+
+router = APIRouter()
+
+@router.put(
+    "/doctors/me/schedule",
+    summary="Set the working hours, slot length and holidays of the doctor in the token"
+)
+async def set_schedule(req : ScheduleRequest, current_user : dict = Depends(AuthService.get_current_user)):
+    return await AvailabilityService.set_schedule(current_user["email"], current_user["role"], req)
+
+@router.get(
+    "/doctors/{doctor_id}/schedule",
+    summary="Get a doctor's working hours, slot length and holidays"
+)
+async def get_schedule(doctor_id : str, current_user : dict = Depends(AuthService.get_current_user)):
+    return await AvailabilityService.get_schedule_for_doctor(doctor_id)
\ No newline at end of file
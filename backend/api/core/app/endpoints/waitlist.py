@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends
+from app.modules.waitlist.service import WaitlistService
+from app.modules.waitlist.model import WaitlistRequest
+from app.modules.auth.service import AuthService
+
+router = APIRouter()
+
+@router.post(
+    "/waitlist",
+    summary="Wait for the next cancelled slot of a doctor or a specialization"
+)
+async def join_waitlist(req : WaitlistRequest, current_user : dict = Depends(AuthService.get_current_user)):
+    return await WaitlistService.join(current_user["email"], current_user["role"], req)
+
+@router.get(
+    "/waitlist/me",
+    summary="Get the waitlists the patient in the token is on, with their position"
+)
+async def get_waitlist_entries(current_user : dict = Depends(AuthService.get_current_user)):
+    return await WaitlistService.get_entries_for_patient(current_user["email"], current_user["role"])
+
+@router.delete(
+    "/waitlist/{entry_id}",
+    summary="Leave a waitlist"
+)
+async def leave_waitlist(entry_id : str, current_user : dict = Depends(AuthService.get_current_user)):
+    return await WaitlistService.leave(current_user["email"], entry_id)
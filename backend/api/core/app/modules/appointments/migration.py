@@ -0,0 +1,70 @@
+from app.core.db import Database
+from app.core.config import settings
+from app.core.dates import to_storage
+from pymongo import UpdateOne
+import asyncio
+
+class DateMigration:
+    # Converts appointment dates stored as strings into BSON datetimes while the service keeps
+    # running. Batches walk _id order so unparseable documents are skipped rather than refetched,
+    # and each update is conditional on the old string, so a document rewritten meanwhile (or by
+    # another instance running the same migration) is left alone.
+    task = None
+    converted = 0
+    skipped = 0
+
+    @staticmethod
+    async def migrate_batch(after):
+        col = Database.db[settings.DB_APPOINTMENTS_COLLECTION]
+        query = {"date" : {"$type" : "string"}}
+        if after is not None:
+            query["_id"] = {"$gt" : after}
+
+        cursor = col.find(query, {"date" : 1}).sort("_id", 1).limit(settings.DATE_MIGRATION_BATCH_SIZE)
+        docs = await cursor.to_list(length=None)
+        if not docs:
+            return None
+
+        updates = []
+        for doc in docs:
+            try:
+                updates.append(UpdateOne({"_id" : doc["_id"], "date" : doc["date"]}, {"$set" : {"date" : to_storage(doc["date"])}}))
+            except ValueError:
+                print(f"Appointment {doc['_id']} has an unreadable date {doc['date']!r}, leaving it as is")
+                DateMigration.skipped += 1
+
+        if updates:
+            result = await col.bulk_write(updates, ordered=False)
+            DateMigration.converted += result.modified_count
+        return docs[-1]["_id"]
+
+    @staticmethod
+    async def run() -> None:
+        after = None
+        try:
+            while True:
+                after = await DateMigration.migrate_batch(after)
+                if after is None:
+                    break
+                await asyncio.sleep(settings.DATE_MIGRATION_PAUSE_S)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Appointment date migration stopped, it resumes on next start: {e}")
+            return
+        print(f"Appointment date migration done: {DateMigration.converted} converted, {DateMigration.skipped} skipped")
+
+    @staticmethod
+    def start() -> None:
+        if settings.DATE_MIGRATION_ENABLED:
+            DateMigration.task = asyncio.create_task(DateMigration.run())
+
+    @staticmethod
+    async def stop() -> None:
+        if DateMigration.task and not DateMigration.task.done():
+            DateMigration.task.cancel()
+            try:
+                await DateMigration.task
+            except asyncio.CancelledError:
+                pass
+        DateMigration.task = None
@@ -1,5 +1,6 @@
 from app.core.db import Database
 from app.core.config import settings
+from app.core.dates import to_storage, to_local, range_filter, display_expression
 from bson import ObjectId
 class AppointmentRepository:
     @staticmethod
@@ -11,9 +12,22 @@ class AppointmentRepository:
     @staticmethod
     async def insert_appointment(doctor_id : str, patient_id : str, date : str):
         col = Database.db[settings.DB_APPOINTMENTS_COLLECTION]
-        response = await col.insert_one({"doctor_id" : ObjectId(doctor_id), "patient_id" : ObjectId(patient_id), "date" : date, "status" : "upcoming"})
+        response = await col.insert_one({"doctor_id" : ObjectId(doctor_id), "patient_id" : ObjectId(patient_id), "date" : to_storage(date), "status" : "upcoming"})
         return response
     
+    @staticmethod
+    async def has_upcoming_at(patient_id, date : str) -> bool:
+        col = Database.db[settings.DB_APPOINTMENTS_COLLECTION]
+        return await col.find_one({"patient_id" : ObjectId(patient_id), "date" : {"$in" : [to_storage(date), date]}, "status" : "upcoming"}, {"_id" : 1}) is not None
+
+    @staticmethod
+    async def get_upcoming_dates(doctor_id : str, start : str, end : str):
+        col = Database.db[settings.DB_APPOINTMENTS_COLLECTION]
+        query = {"doctor_id" : ObjectId(doctor_id), "status" : "upcoming"}
+        query.update(range_filter(start, end))
+        cursor = col.find(query, {"date" : 1, "_id" : 0})
+        return [to_local(doc["date"]) async for doc in cursor]
+    
     @staticmethod
     async def get_appointments_for_doctor(doctor_id: str):
         col = Database.db[settings.DB_APPOINTMENTS_COLLECTION]
@@ -36,7 +50,7 @@ class AppointmentRepository:
             {
                 "$project": {   
                     "_id" : 1,                         
-                    "date": 1,
+                    "date": display_expression(),
                     "status" : 1,
                     "patient_first_name": "$patient_info.first_name", 
                     "patient_last_name": "$patient_info.last_name"
@@ -72,7 +86,7 @@ class AppointmentRepository:
             {
                 "$project": {   
                     "_id" : 1,                         
-                    "date": 1,
+                    "date": display_expression(),
                     "doctor_first_name": "$doctor_info.first_name", 
                     "doctor_last_name": "$doctor_info.last_name",
                     "doctor_specialization" : "$doctor_info.specialization"
@@ -131,7 +145,7 @@ class AppointmentRepository:
             {
                 "$project": {   
                     "_id" : 1,                         
-                    "date": 1,
+                    "date": display_expression(),
                     "status": 1,
                     "doctor_first_name": "$doctor_info.first_name", 
                     "doctor_last_name": "$doctor_info.last_name",
@@ -1,5 +1,8 @@
 from app.modules.appointments.repository import AppointmentRepository
 from app.modules.user.repository import UserRepository
+from app.modules.availability.service import AvailabilityService
+from app.modules.waitlist.service import WaitlistService
+from app.core.dates import to_display
 from fastapi import HTTPException
 
 class AppointmentService:
@@ -7,19 +10,34 @@ class AppointmentService:
     async def create_appointment(doctor_id: str, patient_email: str, date: str):
         try:
             patient_id = await UserRepository.get_user_id_by_email(patient_email)
+            claimed = await AvailabilityService.claim(doctor_id, date)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Error creating appointment: {str(e)}")
 
+        if not claimed:
+            raise HTTPException(status_code=409, detail="This slot is already booked")
+
+        try:
             response = await AppointmentRepository.insert_appointment(
                 doctor_id=doctor_id,
                 patient_id=patient_id,
                 date=date
             )
-
         except Exception as e:
+            await AvailabilityService.release(doctor_id, date)
             raise HTTPException(status_code=400, detail=f"Error creating appointment: {str(e)}")
 
         if not response:
+            await AvailabilityService.release(doctor_id, date)
             raise HTTPException(status_code=500, detail="Failed to create appointment")
 
+        try:
+            await WaitlistService.remove_booked(patient_id, doctor_id)
+        except Exception as e:
+            print(f"Couldn't take patient {patient_id} off the waitlists of doctor {doctor_id}: {e}")
+
         return {
             "message": "Successfully created appointment",
             "date": date
@@ -60,6 +78,17 @@ class AppointmentService:
         result = await AppointmentRepository.cancel_appointment_by_id(appointment_id, user_id)
 
         if result.modified_count == 1:
+            doctor_id = str(app["doctor_id"])
+            date = to_display(app["date"])
+            # The slot stays claimed when it goes straight to the head of the waitlist, and is
+            # released whenever that doesn't happen, failures included
+            try:
+                filled = await WaitlistService.backfill(doctor_id, date, app["patient_id"])
+            except Exception as e:
+                print(f"Couldn't backfill {date} for doctor {doctor_id}: {e}")
+                filled = False
+            if not filled:
+                await AvailabilityService.release(doctor_id, date)
             return {"message" : "Succesfully canceled appointment"}
         else:
             raise HTTPException(400, "Couldn't cancel appointment")
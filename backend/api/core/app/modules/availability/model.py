@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+from typing import Dict, List
+
+class ScheduleRequest(BaseModel):
+    slot_minutes : int = 60
+    # ISO weekday ("1" is Monday) -> list of ["HH:MM", "HH:MM"] working windows
+    hours : Dict[str, List[List[str]]]
+    holidays : List[str] = []
@@ -0,0 +1,97 @@
+from app.core.db import Database
+from app.core.config import settings
+from bson import ObjectId, Int64
+from pymongo.errors import DuplicateKeyError
+
+def version_filter(version : int):
+    # Weeks and schedules written before templates were versioned have no version field, they are version 0
+    return version if version else {"$in" : [0, None]}
+
+class AvailabilityRepository:
+    # One document per doctor and week ("week" is the Monday, d1..d7 are ISO weekdays), each day
+    # an int64 bitmap with bit i set when the doctor's i-th slot of the day is booked (see schedule.py).
+
+    @staticmethod
+    async def setup() -> None:
+        col = Database.db[settings.DB_AVAILABILITY_COLLECTION]
+        await col.create_index([("doctor_id", 1), ("week", 1)], unique=True)
+
+    @staticmethod
+    async def get_week(doctor_id : str, week : str):
+        col = Database.db[settings.DB_AVAILABILITY_COLLECTION]
+        return await col.find_one({"doctor_id" : ObjectId(doctor_id), "week" : week})
+
+    @staticmethod
+    async def create_week(doctor_id : str, week : str, days : dict, version : int = 0) -> None:
+        col = Database.db[settings.DB_AVAILABILITY_COLLECTION]
+        try:
+            await col.update_one(
+                {"doctor_id" : ObjectId(doctor_id), "week" : week},
+                {"$setOnInsert" : {**{f"d{day}" : Int64(mask) for day, mask in days.items()}, "version" : version}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # Someone else created the week between our filter and the insert, theirs is just as good
+            pass
+
+    @staticmethod
+    async def claim_slot(doctor_id : str, week : str, day : int, bit : int, version : int = 0) -> bool:
+        # Only lands on a week laid out by the same schedule version the bit was computed with
+        col = Database.db[settings.DB_AVAILABILITY_COLLECTION]
+        mask = Int64(1 << bit)
+        result = await col.update_one(
+            {"doctor_id" : ObjectId(doctor_id), "week" : week, "version" : version_filter(version), f"d{day}" : {"$bitsAllClear" : mask}},
+            {"$bit" : {f"d{day}" : {"or" : mask}}}
+        )
+        return result.modified_count == 1
+
+    @staticmethod
+    async def release_slot(doctor_id : str, week : str, day : int, bit : int, version : int = 0) -> int:
+        # 0 when the week is laid out by another schedule version, or the bit was already clear
+        col = Database.db[settings.DB_AVAILABILITY_COLLECTION]
+        result = await col.update_one(
+            {"doctor_id" : ObjectId(doctor_id), "week" : week, "version" : version_filter(version)},
+            {"$bit" : {f"d{day}" : {"and" : Int64(~(1 << bit))}}}
+        )
+        return result.modified_count
+
+    @staticmethod
+    async def get_weeks_from(doctor_id : str, week : str) -> list:
+        col = Database.db[settings.DB_AVAILABILITY_COLLECTION]
+        cursor = col.find({"doctor_id" : ObjectId(doctor_id), "week" : {"$gte" : week}}).sort("week", 1)
+        return await cursor.to_list(length=None)
+
+    @staticmethod
+    async def swap_week(doc : dict, days : dict, version : int) -> bool:
+        # Replaces a week's bitmaps with ones laid out by another schedule version, only if nothing
+        # claimed or released a slot in it since `doc` was read
+        col = Database.db[settings.DB_AVAILABILITY_COLLECTION]
+        query = {"_id" : doc["_id"], "version" : version_filter(doc.get("version", 0))}
+        query.update({f"d{day}" : doc.get(f"d{day}", 0) for day in range(1, 8)})
+        result = await col.update_one(query, {"$set" : {**{f"d{day}" : Int64(mask) for day, mask in days.items()}, "version" : version}})
+        return result.modified_count == 1
+
+class ScheduleRepository:
+    @staticmethod
+    async def setup() -> None:
+        col = Database.db[settings.DB_SCHEDULES_COLLECTION]
+        await col.create_index("doctor_id", unique=True)
+
+    @staticmethod
+    async def get_schedule(doctor_id : str):
+        col = Database.db[settings.DB_SCHEDULES_COLLECTION]
+        return await col.find_one({"doctor_id" : ObjectId(doctor_id)}, {"_id" : 0})
+
+    @staticmethod
+    async def set_schedule(doctor_id : str, slot_minutes : int, hours : dict, holidays : list, version : int) -> bool:
+        # Written as `version` only over version - 1, so two concurrent changes can't both think they won
+        col = Database.db[settings.DB_SCHEDULES_COLLECTION]
+        try:
+            await col.update_one(
+                {"doctor_id" : ObjectId(doctor_id), "version" : version_filter(version - 1)},
+                {"$set" : {"slot_minutes" : slot_minutes, "hours" : hours, "holidays" : holidays, "version" : version}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return False
+        return True
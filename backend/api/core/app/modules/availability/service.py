@@ -0,0 +1,180 @@
+from app.modules.availability.repository import AvailabilityRepository, ScheduleRepository
+from app.modules.availability.schedule import Schedule
+from app.modules.availability.model import ScheduleRequest
+from app.modules.appointments.repository import AppointmentRepository
+from app.modules.user.repository import UserRepository
+from app.core.dates import local_now
+from app.core.config import settings
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+import asyncio
+
+DATE_FORMAT = "%Y-%m-%d %H:%M"
+
+def week_start(date : datetime) -> datetime:
+    return datetime(date.year, date.month, date.day) - timedelta(days=date.weekday())
+
+class AvailabilityService:
+    @staticmethod
+    async def get_schedule(doctor_id : str) -> Schedule:
+        return Schedule.from_doc(await ScheduleRepository.get_schedule(doctor_id))
+
+    @staticmethod
+    async def build_week(doctor_id : str, week : str, schedule : Schedule) -> None:
+        # Weeks nobody has booked through the bitmap yet are seeded from the appointments already stored
+        start = datetime.strptime(week, "%Y-%m-%d")
+        dates = await AppointmentRepository.get_upcoming_dates(
+            doctor_id,
+            start.strftime(DATE_FORMAT),
+            (start + timedelta(days=7)).strftime(DATE_FORMAT)
+        )
+
+        days = {day : 0 for day in range(1, 8)}
+        for date in dates:
+            position = schedule.position(date)
+            if position:
+                days[position[1]] |= 1 << position[2]
+
+        await AvailabilityRepository.create_week(doctor_id, week, days, schedule.version)
+
+    @staticmethod
+    def parse_slot(date : str, schedule : Schedule):
+        try:
+            position = schedule.position(datetime.strptime(date, DATE_FORMAT))
+        except ValueError:
+            raise HTTPException(400, f"Date must be formatted as {DATE_FORMAT}")
+
+        if position is None:
+            raise HTTPException(400, "Date is not an available appointment slot")
+        return position
+
+    @staticmethod
+    async def claim(doctor_id : str, date : str) -> bool:
+        schedule = await AvailabilityService.get_schedule(doctor_id)
+        week, day, bit = AvailabilityService.parse_slot(date, schedule)
+
+        if await AvailabilityRepository.claim_slot(doctor_id, week, day, bit, schedule.version):
+            return True
+
+        # A failed claim is either a taken slot, a week still laid out by another schedule version
+        # while set_schedule rebuilds it, or a week without a bitmap yet
+        if await AvailabilityRepository.get_week(doctor_id, week) is not None:
+            return False
+
+        await AvailabilityService.build_week(doctor_id, week, schedule)
+        return await AvailabilityRepository.claim_slot(doctor_id, week, day, bit, schedule.version)
+
+    @staticmethod
+    async def release(doctor_id : str, date : str) -> None:
+        # A release computed with one schedule version misses a week laid out by another. When the week
+        # is ahead the schedule read here was stale, when it is behind set_schedule is rebuilding it and
+        # carries the bit over, so either way the schedule is read again and the release retried
+        for _ in range(settings.RELEASE_MAX_ATTEMPTS):
+            try:
+                schedule = await AvailabilityService.get_schedule(doctor_id)
+                position = schedule.position(datetime.strptime(date, DATE_FORMAT))
+            except ValueError:
+                return
+
+            if position is None or await AvailabilityRepository.release_slot(doctor_id, *position, schedule.version):
+                return
+
+            doc = await AvailabilityRepository.get_week(doctor_id, position[0])
+            if doc is None or (doc.get("version") or 0) == schedule.version:
+                return
+            if (doc.get("version") or 0) < schedule.version:
+                await asyncio.sleep(settings.RELEASE_RETRY_PAUSE_S)
+        print(f"Couldn't release {date} for doctor {doctor_id}, its week kept being rebuilt")
+
+    @staticmethod
+    async def rebuild_week(doctor_id : str, doc : dict, previous : Schedule, schedule : Schedule) -> list:
+        # Lays a stored week out again under a new template, in place. Slots claimed for a booking that
+        # isn't stored yet are only in the bitmap, so its bits are carried over along with the stored
+        # appointments. The swap only lands if the week didn't change meanwhile, otherwise it is redone.
+        # Returns the dates the new template has no slot for
+        week = datetime.strptime(doc["week"], "%Y-%m-%d")
+        while doc is not None and doc.get("version", 0) < schedule.version:
+            dates = set(await AppointmentRepository.get_upcoming_dates(
+                doctor_id,
+                week.strftime(DATE_FORMAT),
+                (week + timedelta(days=7)).strftime(DATE_FORMAT)
+            ))
+            if doc.get("version", 0) == previous.version:
+                for day in range(1, 8):
+                    mask = int(doc.get(f"d{day}", 0))
+                    while mask:
+                        lowest = mask & -mask
+                        dates.add(previous.slot_time(week + timedelta(days=day - 1), lowest.bit_length() - 1))
+                        mask ^= lowest
+
+            days = {day : 0 for day in range(1, 8)}
+            unplaced = []
+            for date in sorted(dates):
+                position = schedule.position(date)
+                if position and position[0] == doc["week"]:
+                    days[position[1]] |= 1 << position[2]
+                else:
+                    unplaced.append(date)
+
+            if await AvailabilityRepository.swap_week(doc, days, schedule.version):
+                return unplaced
+            doc = await AvailabilityRepository.get_week(doctor_id, doc["week"])
+        return []
+
+    @staticmethod
+    async def set_schedule(doctor_email : str, role : str, req : ScheduleRequest):
+        if role != "doctor":
+            raise HTTPException(403, "Only doctors can set a schedule")
+
+        try:
+            schedule = Schedule(req.slot_minutes, req.hours, req.holidays)
+        except (ValueError, KeyError) as e:
+            raise HTTPException(400, f"Invalid schedule: {str(e)}")
+
+        doctor_id = await UserRepository.get_user_id_by_email(doctor_email)
+        previous = await AvailabilityService.get_schedule(doctor_id)
+        schedule.version = previous.version + 1
+        now = local_now()
+
+        # Upcoming appointments must keep a slot, the doctor moves or cancels them first
+        upcoming = await AppointmentRepository.get_upcoming_dates(doctor_id, now.strftime(DATE_FORMAT), None)
+        orphaned = sorted(date for date in upcoming if schedule.position(date) is None)
+        if orphaned:
+            listed = ", ".join(date.strftime(DATE_FORMAT) for date in orphaned[:10])
+            raise HTTPException(409, f"{len(orphaned)} upcoming appointments fall outside the new schedule, move or cancel them first: {listed}")
+
+        if not await ScheduleRepository.set_schedule(doctor_id, req.slot_minutes, req.hours, req.holidays, schedule.version):
+            raise HTTPException(409, "The schedule was changed meanwhile, try again")
+
+        # Bit positions depend on the template, so the weeks still ahead are rebuilt under the new one.
+        # Claims made with the old template fail on the rebuilt weeks and the new template's fail on the
+        # old ones, so nothing is claimed twice in between. Listed again until no week is left behind,
+        # in case a claim with the old template created one meanwhile
+        unplaced = []
+        while True:
+            weeks = await AvailabilityRepository.get_weeks_from(doctor_id, week_start(now).strftime("%Y-%m-%d"))
+            stale = [doc for doc in weeks if doc.get("version", 0) < schedule.version]
+            if not stale:
+                break
+            for doc in stale:
+                unplaced += await AvailabilityService.rebuild_week(doctor_id, doc, previous, schedule)
+
+        response = {"message" : "Succesfully updated schedule"}
+        # Bookings that were in flight during the check above and that the new template has no slot for
+        unplaced = sorted(date for date in unplaced if date >= now)
+        if unplaced:
+            response["unplaced"] = [date.strftime(DATE_FORMAT) for date in unplaced]
+        return response
+
+    @staticmethod
+    async def get_schedule_for_doctor(doctor_id : str):
+        doc = await ScheduleRepository.get_schedule(doctor_id)
+        if doc is None:
+            schedule = Schedule.default()
+            doc = {
+                "slot_minutes" : schedule.slot_minutes,
+                "hours" : {str(day) : [[f"{start // 60:02d}:{start % 60:02d}", f"{end // 60:02d}:{end % 60:02d}"] for start, end in windows] for day, windows in schedule.hours.items()},
+                "holidays" : []
+            }
+        doc.pop("doctor_id", None)
+        return {"schedule" : doc}
@@ -0,0 +1,271 @@
+from app.core.config import settings
+from app.modules.log.repository import LogRepository
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+import asyncio
+import gzip
+import heapq
+import io
+import itertools
+import json
+import mmap
+import os
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+INDEX_FILE = "index.json"
+LEASE = "log_archive"
+EXTENSIONS = {"gzip" : ".ndjson.gz", "zstd" : ".ndjson.zst"}
+
+def log_key(doc : dict) -> tuple:
+    return doc["timestamp"], doc["_id"]
+
+def open_writer(path : str, codec : str):
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).stream_writer(open(path, "wb"), closefd=True)
+    return gzip.open(path, "wb", compresslevel=6)
+
+def open_reader(data, codec : str):
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().stream_reader(data)
+    return gzip.GzipFile(fileobj=data, mode="rb")
+
+class LogArchive:
+    # Request logs older than LOG_RETENTION_DAYS leave MongoDB for compressed NDJSON files in
+    # LOG_ARCHIVE_DIR, one or more per day, newest first inside each file like the log API serves
+    # them. index.json lists every file with the time range it covers, so a query only opens the
+    # files its range overlaps; those are memory-mapped and decompressed as they are read.
+    index = None
+    index_mtime = None
+    task = None
+    archived = 0
+    owner = str(ObjectId())
+
+    @staticmethod
+    def codec() -> str:
+        if settings.LOG_ARCHIVE_CODEC == "zstd" and zstandard is None:
+            print("zstandard isn't installed, archiving request logs with gzip")
+            return "gzip"
+        return settings.LOG_ARCHIVE_CODEC
+
+    @staticmethod
+    def load_index() -> list:
+        path = os.path.join(settings.LOG_ARCHIVE_DIR, INDEX_FILE)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return []
+        if LogArchive.index is None or mtime != LogArchive.index_mtime:
+            with open(path) as index:
+                LogArchive.index = json.load(index)
+            LogArchive.index_mtime = mtime
+        return LogArchive.index
+
+    @staticmethod
+    def save_index(entries : list) -> None:
+        # Replaced in one rename, so readers see either the old index or the new one
+        path = os.path.join(settings.LOG_ARCHIVE_DIR, INDEX_FILE)
+        with open(path + ".tmp", "w") as index:
+            json.dump(entries, index)
+        os.replace(path + ".tmp", path)
+        LogArchive.index = entries
+        LogArchive.index_mtime = os.path.getmtime(path)
+
+    @staticmethod
+    def file_name(day : datetime, codec : str) -> str:
+        # Logs of a day that reach MongoDB late go to a further part, archived files are never rewritten
+        part = sum(1 for entry in LogArchive.load_index() if entry["day"] == day.strftime("%Y-%m-%d"))
+        return f"logs-{day.strftime('%Y-%m-%d')}-{part}{EXTENSIONS[codec]}"
+
+    @staticmethod
+    def write_docs(archive, docs : list) -> None:
+        archive.write("".join(json.dumps({**doc, "_id" : str(doc["_id"]), "timestamp" : doc["timestamp"].isoformat()}, default=str) + "\n" for doc in docs).encode())
+
+    @staticmethod
+    async def archive_day(day : datetime) -> int:
+        # Streams the day's logs into the file a batch at a time. Logs whose _id is less than a minute
+        # older than the run may still be in flight from the writer and are left for the next run.
+        # The file and its index entry are in place before anything is deleted, so a crash in between
+        # leaves the logs in both places rather than in neither. Only the logs written to the file are
+        # deleted, by _id: re-running the query would also take logs that TimestampMigration turned
+        # into this day meanwhile. Runs under the archive lease, renewed with every batch.
+        started = ObjectId.from_datetime(datetime.now(timezone.utc) - timedelta(minutes=1))
+        query = {"timestamp" : {"$type" : "date", "$gte" : day, "$lt" : day + timedelta(days=1)}, "_id" : {"$lt" : started}}
+        codec = LogArchive.codec()
+        os.makedirs(settings.LOG_ARCHIVE_DIR, exist_ok=True)
+        name = LogArchive.file_name(day, codec)
+        path = os.path.join(settings.LOG_ARCHIVE_DIR, name)
+
+        written = []
+        first = last = None
+        archive = await asyncio.to_thread(open_writer, path + ".tmp", codec)
+        try:
+            batch = []
+            async for doc in LogRepository.find_logs(query):
+                batch.append(doc)
+                if len(batch) == settings.LOG_STREAM_BATCH_SIZE:
+                    await LogArchive.renew_lease()
+                    await asyncio.to_thread(LogArchive.write_docs, archive, batch)
+                    written.extend(doc["_id"] for doc in batch)
+                    first, last = first or batch[0]["timestamp"], batch[-1]["timestamp"]
+                    batch = []
+            if batch:
+                await asyncio.to_thread(LogArchive.write_docs, archive, batch)
+                written.extend(doc["_id"] for doc in batch)
+                first, last = first or batch[0]["timestamp"], batch[-1]["timestamp"]
+        finally:
+            await asyncio.to_thread(archive.close)
+
+        count = len(written)
+        if count == 0:
+            os.remove(path + ".tmp")
+            return 0
+
+        try:
+            await LogArchive.renew_lease()
+        except Exception:
+            os.remove(path + ".tmp")
+            raise
+        os.replace(path + ".tmp", path)
+        LogArchive.save_index(LogArchive.load_index() + [{
+            "file" : name,
+            "day" : day.strftime("%Y-%m-%d"),
+            "codec" : codec,
+            "start" : last.isoformat(),
+            "end" : first.isoformat(),
+            "count" : count
+        }])
+        for position in range(0, count, settings.LOG_STREAM_BATCH_SIZE):
+            await LogRepository.delete_logs({"_id" : {"$in" : written[position : position + settings.LOG_STREAM_BATCH_SIZE]}})
+        return count
+
+    @staticmethod
+    async def renew_lease() -> None:
+        if not await LogRepository.acquire_lease(LEASE, LogArchive.owner, settings.LOG_ARCHIVE_LEASE_S):
+            raise RuntimeError("Lost the request log archive lease to another process")
+
+    @staticmethod
+    async def run_once() -> int:
+        # Whole days only, oldest first, up to the retention cutoff. Every worker of both services runs
+        # this loop, only the one holding the lease archives: file parts, the index and the deletes
+        # would race otherwise
+        if not await LogRepository.acquire_lease(LEASE, LogArchive.owner, settings.LOG_ARCHIVE_LEASE_S):
+            return 0
+
+        cutoff = datetime.now() - timedelta(days=settings.LOG_RETENTION_DAYS)
+        cutoff = datetime(cutoff.year, cutoff.month, cutoff.day)
+        archived = 0
+        try:
+            oldest = await LogRepository.get_oldest_timestamp()
+            while oldest is not None and oldest < cutoff:
+                day = datetime(oldest.year, oldest.month, oldest.day)
+                archived += await LogArchive.archive_day(day)
+                oldest = await LogRepository.get_oldest_timestamp(after=day + timedelta(days=1))
+        finally:
+            LogArchive.archived += archived
+            await LogRepository.release_lease(LEASE, LogArchive.owner)
+        return archived
+
+    @staticmethod
+    async def run() -> None:
+        while True:
+            try:
+                archived = await LogArchive.run_once()
+                if archived:
+                    print(f"Archived {archived} request logs older than {settings.LOG_RETENTION_DAYS} days")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Request log archiving failed, retrying in {settings.LOG_ARCHIVE_INTERVAL_S}s: {e}")
+            await asyncio.sleep(settings.LOG_ARCHIVE_INTERVAL_S)
+
+    @staticmethod
+    def start() -> None:
+        if settings.LOG_RETENTION_DAYS > 0:
+            LogArchive.task = asyncio.create_task(LogArchive.run())
+
+    @staticmethod
+    async def stop() -> None:
+        if LogArchive.task:
+            LogArchive.task.cancel()
+            try:
+                await LogArchive.task
+            except asyncio.CancelledError:
+                pass
+            LogArchive.task = None
+
+    @staticmethod
+    def files_for(start : datetime = None, end : datetime = None, before : datetime = None) -> list:
+        # Index entries overlapping [start, end) and not entirely after the cursor, newest first
+        entries = []
+        for entry in LogArchive.load_index():
+            first, last = datetime.fromisoformat(entry["start"]), datetime.fromisoformat(entry["end"])
+            if (start and last < start) or (end and first >= end) or (before and first > before):
+                continue
+            entries.append(entry)
+        return sorted(entries, key=lambda entry : (entry["end"], entry["file"]), reverse=True)
+
+    @staticmethod
+    def read_batches(entry : dict, size : int):
+        # Lists of up to `size` documents in file order; the compressed file is memory-mapped
+        path = os.path.join(settings.LOG_ARCHIVE_DIR, entry["file"])
+        with open(path, "rb") as raw:
+            if os.fstat(raw.fileno()).st_size == 0:
+                return
+            with mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ) as data, open_reader(data, entry["codec"]) as reader:
+                batch = []
+                for line in io.BufferedReader(reader) if entry["codec"] == "zstd" else reader:
+                    doc = json.loads(line)
+                    doc["_id"] = ObjectId(doc["_id"])
+                    doc["timestamp"] = datetime.fromisoformat(doc["timestamp"])
+                    batch.append(doc)
+                    if len(batch) == size:
+                        yield batch
+                        batch = []
+                if batch:
+                    yield batch
+
+    @staticmethod
+    def newest(start : datetime = None, end : datetime = None, before : datetime = None):
+        # Timestamp of the newest archived log the range could include, None when no file overlaps it
+        entries = LogArchive.files_for(start, end, before)
+        return datetime.fromisoformat(entries[0]["end"]) if entries else None
+
+    @staticmethod
+    def read_docs(entry : dict):
+        for batch in LogArchive.read_batches(entry, settings.LOG_STREAM_BATCH_SIZE):
+            yield from batch
+
+    @staticmethod
+    def merged_docs(entries : list):
+        # Files whose time ranges overlap, like a day's later parts, are merged on (timestamp, _id);
+        # ranges that don't overlap are read one after the other, newest first
+        groups = []
+        for entry in entries:
+            first = datetime.fromisoformat(entry["start"])
+            if groups and datetime.fromisoformat(entry["end"]) >= groups[-1][1]:
+                groups[-1][0].append(entry)
+                groups[-1][1] = min(groups[-1][1], first)
+            else:
+                groups.append([[entry], first])
+
+        for group, _ in groups:
+            if len(group) == 1:
+                yield from LogArchive.read_docs(group[0])
+            else:
+                yield from heapq.merge(*[LogArchive.read_docs(entry) for entry in group], key=log_key, reverse=True)
+
+    @staticmethod
+    async def iter_logs(matches, start : datetime = None, end : datetime = None, before : datetime = None):
+        # Archived logs matching the filter, in the log API's order; files are decoded off the event loop
+        docs = LogArchive.merged_docs(LogArchive.files_for(start, end, before))
+        while True:
+            batch = await asyncio.to_thread(lambda : list(itertools.islice(docs, settings.LOG_STREAM_BATCH_SIZE)))
+            if not batch:
+                break
+            for doc in batch:
+                if matches(doc):
+                    yield doc
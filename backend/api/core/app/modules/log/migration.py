@@ -0,0 +1,71 @@
+from app.core.db import Database
+from app.core.config import settings
+from app.modules.log.model import parse_timestamp
+from pymongo import UpdateOne
+import asyncio
+
+class TimestampMigration:
+    # Request logs posted to /logs/register while timestamps were plain strings still hold the client's
+    # string, which sorts apart from the datetimes and can't be paged or archived with them. They are
+    # converted in _id order batches while the service runs, each update conditional on the old string.
+    # A string that doesn't parse takes the time the log was inserted, read from its _id, and is kept
+    # as client_timestamp.
+    task = None
+    converted = 0
+
+    @staticmethod
+    async def migrate_batch(after):
+        col = Database.db[settings.DB_LOGS_COLLECTION]
+        query = {"timestamp" : {"$type" : "string"}}
+        if after is not None:
+            query["_id"] = {"$gt" : after}
+
+        cursor = col.find(query, {"timestamp" : 1}).sort("_id", 1).limit(settings.LOG_MIGRATION_BATCH_SIZE)
+        docs = await cursor.to_list(length=None)
+        if not docs:
+            return None
+
+        updates = []
+        for doc in docs:
+            timestamp = parse_timestamp(doc["timestamp"])
+            if timestamp is None:
+                update = {"timestamp" : parse_timestamp(doc["_id"].generation_time), "client_timestamp" : doc["timestamp"]}
+            else:
+                update = {"timestamp" : timestamp}
+            updates.append(UpdateOne({"_id" : doc["_id"], "timestamp" : doc["timestamp"]}, {"$set" : update}))
+
+        result = await col.bulk_write(updates, ordered=False)
+        TimestampMigration.converted += result.modified_count
+        return docs[-1]["_id"]
+
+    @staticmethod
+    async def run() -> None:
+        after = None
+        try:
+            while True:
+                after = await TimestampMigration.migrate_batch(after)
+                if after is None:
+                    break
+                await asyncio.sleep(settings.LOG_MIGRATION_PAUSE_S)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Request log timestamp migration stopped, it resumes on next start: {e}")
+            return
+        if TimestampMigration.converted:
+            print(f"Request log timestamp migration done: {TimestampMigration.converted} converted")
+
+    @staticmethod
+    def start() -> None:
+        if settings.LOG_MIGRATION_ENABLED:
+            TimestampMigration.task = asyncio.create_task(TimestampMigration.run())
+
+    @staticmethod
+    async def stop() -> None:
+        if TimestampMigration.task and not TimestampMigration.task.done():
+            TimestampMigration.task.cancel()
+            try:
+                await TimestampMigration.task
+            except asyncio.CancelledError:
+                pass
+        TimestampMigration.task = None
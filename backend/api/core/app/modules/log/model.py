@@ -1,9 +1,25 @@
 from pydantic import BaseModel 
-from typing import Optional 
+from typing import Optional, Union
+from datetime import datetime
+
+def parse_timestamp(value) -> Optional[datetime]:
+    # Log timestamps are stored as naive server local time, the way the request middleware writes them
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        try:
+            parsed = datetime.fromisoformat(str(value).strip())
+        except ValueError:
+            return None
+    return parsed.astimezone().replace(tzinfo=None) if parsed.tzinfo else parsed
 
 class LogEntry(BaseModel):
     type : str 
-    timestamp : str
+    # /logs/register takes any string, as it always has; ISO 8601 ones are stored as datetimes
+    timestamp : Union[datetime, str]
     activity : str 
     user : str
-    
\ No newline at end of file
+    # Filled in by the request middleware, read by the traffic rollups
+    route : Optional[str] = None
+    status : Optional[int] = None
+    role : Optional[str] = None
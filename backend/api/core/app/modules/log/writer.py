@@ -0,0 +1,141 @@
+from app.core.config import settings
+from app.modules.log.repository import LogRepository, RollupRepository
+from app.core.metrics import Metrics
+import asyncio
+
+def rollup_counts(batch : list) -> dict:
+    # Requests per (granularity, bucket, route, status class, role) in a batch of request logs
+    counts = {}
+    for doc in batch:
+        status = doc.get("status")
+        if status is None:
+            continue
+        minute = doc["timestamp"].replace(second=0, microsecond=0)
+        for granularity, bucket in (("minute", minute), ("hour", minute.replace(minute=0))):
+            key = (granularity, bucket, doc.get("route") or "unmatched", f"{status // 100}xx", doc.get("role") or "")
+            counts[key] = counts.get(key, 0) + 1
+    return counts
+
+class LogWriter:
+    # Request logs are queued by the middleware and written in the background with insert_many,
+    # a batch at a time: whenever LOG_BATCH_SIZE entries are waiting or LOG_FLUSH_INTERVAL_S after
+    # the first of them arrived. When the queue is full the entry is dropped, or with
+    # LOG_QUEUE_POLICY = "block" the request waits for room, which slows requests down to the
+    # pace of the database instead of losing logs.
+    queue = None
+    task = None
+    queued = 0
+    written = 0
+    dropped = 0
+    failed = 0
+
+    @staticmethod
+    def start() -> None:
+        LogWriter.queue = asyncio.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+        LogWriter.task = asyncio.create_task(LogWriter.run(LogWriter.queue))
+
+    @staticmethod
+    async def stop() -> None:
+        # The sentinel goes in behind everything already queued, so the writer flushes it all before exiting
+        queue, task = LogWriter.queue, LogWriter.task
+        LogWriter.queue = None
+        if task is None:
+            return
+
+        async def drain():
+            await queue.put(None)
+            await task
+
+        try:
+            await asyncio.wait_for(drain(), settings.LOG_SHUTDOWN_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            print(f"Log writer didn't flush within {settings.LOG_SHUTDOWN_TIMEOUT_S}s, {queue.qsize()} entries lost")
+            # The writer is still running when the sentinel couldn't even be queued, it mustn't outlive shutdown
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        LogWriter.task = None
+
+    @staticmethod
+    async def submit(doc : dict) -> None:
+        queue = LogWriter.queue
+        if queue is None:
+            LogWriter.dropped += 1
+            return
+
+        if settings.LOG_QUEUE_POLICY == "block":
+            await queue.put(doc)
+        else:
+            try:
+                queue.put_nowait(doc)
+            except asyncio.QueueFull:
+                LogWriter.dropped += 1
+                return
+        LogWriter.queued += 1
+
+    @staticmethod
+    async def next_batch(queue : asyncio.Queue):
+        # Blocks for the first entry, then takes what is already queued and waits for more until the
+        # batch is full or the flush interval is over. The second value is False once the sentinel is seen.
+        first = await queue.get()
+        if first is None:
+            return [], False
+
+        batch = [first]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.LOG_FLUSH_INTERVAL_S
+        while len(batch) < settings.LOG_BATCH_SIZE:
+            try:
+                doc = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    doc = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            if doc is None:
+                return batch, False
+            batch.append(doc)
+        return batch, True
+
+    @staticmethod
+    async def flush(batch : list) -> None:
+        try:
+            await LogRepository.insert_logs(batch)
+            LogWriter.written += len(batch)
+        except Exception as e:
+            LogWriter.failed += len(batch)
+            print(f"Failed to write {len(batch)} request logs: {e}")
+            return
+
+        try:
+            await RollupRepository.add_counts(rollup_counts(batch))
+        except Exception as e:
+            print(f"Failed to update the traffic rollups of {len(batch)} request logs: {e}")
+
+    @staticmethod
+    async def run(queue : asyncio.Queue) -> None:
+        running = True
+        while running:
+            batch, running = await LogWriter.next_batch(queue)
+            if batch:
+                await LogWriter.flush(batch)
+
+    @staticmethod
+    def get_stats() -> dict:
+        return {
+            "queued" : LogWriter.queued,
+            "written" : LogWriter.written,
+            "dropped" : LogWriter.dropped,
+            "failed" : LogWriter.failed,
+            "pending" : LogWriter.queue.qsize() if LogWriter.queue else 0
+        }
+
+Metrics.collect("request_log_entries_total", "counter", "Request log entries by outcome in the background writer",
+    lambda : [({"outcome" : outcome}, value) for outcome, value in LogWriter.get_stats().items() if outcome != "pending"])
+Metrics.collect("request_log_queue_depth", "gauge", "Request log entries waiting to be written",
+    lambda : [({}, LogWriter.get_stats()["pending"])])
@@ -1,5 +1,6 @@
 from app.core.db import Database
 from app.core.config import settings
+from bson import ObjectId
 class UserRepository:
     @staticmethod
     async def search_user_by_email(email : str):
@@ -15,6 +16,14 @@ class UserRepository:
             return None 
         return str(user["_id"])
     
+    @staticmethod
+    async def get_specialization(user_id : str):
+        col = Database.db[settings.DB_USER_COLLECTION]
+        user = await col.find_one({"_id" : ObjectId(user_id)}, {"specialization" : 1})
+        if not user:
+            return None
+        return user.get("specialization")
+
     @staticmethod
     async def get_users_list_by_role(role : str):
         col = Database.db[settings.DB_USER_COLLECTION]
@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+from typing import Optional
+
+class WaitlistRequest(BaseModel):
+    prior : str
+    # Exactly one of them: wait for this doctor, or for any doctor of the specialization
+    doctor_id : Optional[str] = None
+    specialization : Optional[str] = None
@@ -0,0 +1,75 @@
+from app.core.db import Database
+from app.core.config import settings
+from bson import ObjectId
+
+# Sort order of a queue: most urgent first, then whoever has waited longest
+QUEUE_ORDER = [("rank", 1), ("created", 1)]
+
+class WaitlistRepository:
+    # One document per patient and queue. A queue is either one doctor (doctor_id set) or a whole
+    # specialization (doctor_id null), and the compound indexes below keep every queue sorted, so
+    # reading or popping a head is a single index seek however long the waitlist grows.
+
+    @staticmethod
+    async def setup() -> None:
+        col = Database.db[settings.DB_WAITLIST_COLLECTION]
+        await col.create_index([("doctor_id", 1), ("rank", 1), ("created", 1)])
+        await col.create_index([("specialization", 1), ("doctor_id", 1), ("rank", 1), ("created", 1)])
+        await col.create_index([("patient_id", 1), ("doctor_id", 1), ("specialization", 1)], unique=True)
+
+    @staticmethod
+    def queue_filter(doctor_id : str = None, specialization : str = None) -> dict:
+        if doctor_id:
+            return {"doctor_id" : ObjectId(doctor_id)}
+        return {"specialization" : specialization, "doctor_id" : None}
+
+    @staticmethod
+    async def insert_entry(entry : dict):
+        col = Database.db[settings.DB_WAITLIST_COLLECTION]
+        return await col.insert_one(entry)
+
+    @staticmethod
+    async def get_head(doctor_id : str = None, specialization : str = None, skip : list = None):
+        col = Database.db[settings.DB_WAITLIST_COLLECTION]
+        query = WaitlistRepository.queue_filter(doctor_id, specialization)
+        if skip:
+            query["patient_id"] = {"$nin" : skip}
+        return await col.find_one(query, sort=QUEUE_ORDER)
+
+    @staticmethod
+    async def take_entry(entry_id : ObjectId):
+        # Only one caller gets the document back, whoever else read the same head gets None
+        col = Database.db[settings.DB_WAITLIST_COLLECTION]
+        return await col.find_one_and_delete({"_id" : entry_id})
+
+    @staticmethod
+    async def count_ahead(entry : dict) -> int:
+        col = Database.db[settings.DB_WAITLIST_COLLECTION]
+        query = {"doctor_id" : entry["doctor_id"]}
+        if entry["doctor_id"] is None:
+            query["specialization"] = entry["specialization"]
+        query["$or"] = [
+            {"rank" : {"$lt" : entry["rank"]}},
+            {"rank" : entry["rank"], "created" : {"$lt" : entry["created"]}}
+        ]
+        return await col.count_documents(query)
+
+    @staticmethod
+    async def get_entries_for_patient(patient_id : str):
+        col = Database.db[settings.DB_WAITLIST_COLLECTION]
+        cursor = col.find({"patient_id" : ObjectId(patient_id)}).sort(QUEUE_ORDER)
+        return await cursor.to_list(length=None)
+
+    @staticmethod
+    async def delete_entry(entry_id : str, patient_id : str):
+        col = Database.db[settings.DB_WAITLIST_COLLECTION]
+        return await col.delete_one({"_id" : ObjectId(entry_id), "patient_id" : ObjectId(patient_id)})
+
+    @staticmethod
+    async def delete_matching(patient_id : ObjectId, doctor_id : str, specialization : str = None) -> None:
+        # Once booked, the patient leaves the other queue the same slot could have come from too
+        col = Database.db[settings.DB_WAITLIST_COLLECTION]
+        queues = [{"doctor_id" : ObjectId(doctor_id)}]
+        if specialization:
+            queues.append({"specialization" : specialization, "doctor_id" : None})
+        await col.delete_many({"patient_id" : patient_id, "$or" : queues})
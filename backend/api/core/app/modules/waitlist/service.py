@@ -0,0 +1,118 @@
+from app.modules.waitlist.repository import WaitlistRepository
+from app.modules.waitlist.model import WaitlistRequest
+from app.modules.appointments.repository import AppointmentRepository
+from app.modules.user.repository import UserRepository
+from app.core.dates import DATE_FORMAT, local_now
+from datetime import datetime, timezone
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from fastapi import HTTPException
+
+PRIORITY_RANK = {"High" : 0, "Medium" : 1, "Low" : 2}
+
+class WaitlistService:
+    @staticmethod
+    async def join(patient_email : str, role : str, req : WaitlistRequest):
+        if role != "patient":
+            raise HTTPException(403, "Only patients can join a waitlist")
+        if req.prior not in PRIORITY_RANK:
+            raise HTTPException(400, "Priority must be High, Medium or Low")
+        if bool(req.doctor_id) == bool(req.specialization):
+            raise HTTPException(400, "Wait either for a doctor or for a specialization")
+
+        patient_id = await UserRepository.get_user_id_by_email(patient_email)
+        entry = {
+            "patient_id" : ObjectId(patient_id),
+            "doctor_id" : ObjectId(req.doctor_id) if req.doctor_id else None,
+            "specialization" : None if req.doctor_id else req.specialization,
+            "prior" : req.prior,
+            "rank" : PRIORITY_RANK[req.prior],
+            "created" : datetime.now(timezone.utc)
+        }
+        try:
+            result = await WaitlistRepository.insert_entry(entry)
+        except DuplicateKeyError:
+            raise HTTPException(409, "Already on this waitlist")
+
+        return {"message" : "Succesfully joined waitlist", "entry_id" : str(result.inserted_id)}
+
+    @staticmethod
+    async def get_entries_for_patient(patient_email : str, role : str):
+        if role != "patient":
+            raise HTTPException(400, "Access denied")
+
+        patient_id = await UserRepository.get_user_id_by_email(patient_email)
+        entries = []
+        for entry in await WaitlistRepository.get_entries_for_patient(patient_id):
+            entries.append({
+                "_id" : str(entry["_id"]),
+                "doctor_id" : str(entry["doctor_id"]) if entry["doctor_id"] else None,
+                "specialization" : entry["specialization"],
+                "prior" : entry["prior"],
+                "position" : await WaitlistRepository.count_ahead(entry) + 1
+            })
+        return {"entries" : entries}
+
+    @staticmethod
+    async def leave(patient_email : str, entry_id : str):
+        patient_id = await UserRepository.get_user_id_by_email(patient_email)
+        result = await WaitlistRepository.delete_entry(entry_id, patient_id)
+        if result.deleted_count == 1:
+            return {"message" : "Succesfully left waitlist"}
+        raise HTTPException(400, "Couldn't leave waitlist")
+
+    @staticmethod
+    async def pop_head(doctor_id : str, specialization : str = None, date : str = None, skip : list = None):
+        # Best of the doctor's own queue and its specialization's queue. Patients in `skip` and those
+        # who already have an appointment at `date` are passed over but stay queued. Popping deletes
+        # by _id, so when a concurrent cancellation took the same head first we read the heads again
+        skip = list(skip or [])
+        while True:
+            heads = [await WaitlistRepository.get_head(doctor_id=doctor_id, skip=skip)]
+            if specialization:
+                heads.append(await WaitlistRepository.get_head(specialization=specialization, skip=skip))
+            heads = [head for head in heads if head]
+            if not heads:
+                return None
+
+            best = min(heads, key=lambda head : (head["rank"], head["created"]))
+            if date and await AppointmentRepository.has_upcoming_at(best["patient_id"], date):
+                skip.append(best["patient_id"])
+                continue
+            entry = await WaitlistRepository.take_entry(best["_id"])
+            if entry:
+                return entry
+
+    @staticmethod
+    async def remove_booked(patient_id, doctor_id : str, specialization : str = None) -> None:
+        # A patient who got a slot with the doctor, however they booked it, no longer waits for one
+        if specialization is None:
+            specialization = await UserRepository.get_specialization(doctor_id)
+        await WaitlistRepository.delete_matching(ObjectId(patient_id), doctor_id, specialization)
+
+    @staticmethod
+    async def backfill(doctor_id : str, date : str, cancelled_by = None) -> bool:
+        # Hands a freed slot, still claimed in the availability bitmap, to the head of the waitlist,
+        # never back to the patient whose appointment it was.
+        # Returns False when it should be released instead: nobody is waiting, or the slot has passed
+        if datetime.strptime(date, DATE_FORMAT) <= local_now():
+            return False
+
+        specialization = await UserRepository.get_specialization(doctor_id)
+        entry = await WaitlistService.pop_head(doctor_id, specialization, date, [cancelled_by] if cancelled_by else None)
+        if entry is None:
+            return False
+
+        try:
+            await AppointmentRepository.insert_appointment(doctor_id=doctor_id, patient_id=str(entry["patient_id"]), date=date)
+        except Exception as e:
+            print(f"Couldn't book waitlist entry {entry['_id']} into {date}: {e}")
+            await WaitlistRepository.insert_entry(entry)
+            return False
+
+        # The slot is booked now, so a failed cleanup mustn't make the caller release it
+        try:
+            await WaitlistService.remove_booked(entry["patient_id"], doctor_id, specialization)
+        except Exception as e:
+            print(f"Couldn't clear the waitlist entries of patient {entry['patient_id']}: {e}")
+        return True
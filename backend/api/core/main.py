@@ -1,17 +1,39 @@
 from fastapi import FastAPI , Request
 from app.core.db import Database
+from app.modules.availability.repository import AvailabilityRepository, ScheduleRepository
+from app.modules.appointments.migration import DateMigration
+from app.modules.waitlist.repository import WaitlistRepository
 from contextlib import asynccontextmanager
-from app.endpoints import auth, log, user, forms, appointments
+from app.endpoints import auth, log, user, forms, appointments, schedule, waitlist, metrics
 from app.modules.auth.service import decode_token
 from app.modules.log.model import LogEntry
 from app.modules.log.service import LogService
+from app.modules.log.writer import LogWriter
+from app.modules.log.archive import LogArchive
+from app.modules.log.migration import TimestampMigration
+from app.core.metrics import REQUEST_DURATION, REQUESTS, IN_FLIGHT
+from app.modules.log.repository import LogRepository, RollupRepository
 from fastapi.middleware.cors import CORSMiddleware
 import datetime 
+import time
 
 @asynccontextmanager
 async def lifespan(app : FastAPI):
     await Database.connectToDatabase()
+    await AvailabilityRepository.setup()
+    await ScheduleRepository.setup()
+    await WaitlistRepository.setup()
+    await LogRepository.setup()
+    await RollupRepository.setup()
+    DateMigration.start()
+    LogWriter.start()
+    LogArchive.start()
+    TimestampMigration.start()
     yield 
+    await DateMigration.stop()
+    await TimestampMigration.stop()
+    await LogArchive.stop()
+    await LogWriter.stop()
     await Database.disconnectFromDatabase()
 
 app = FastAPI(lifespan=lifespan)
@@ -27,7 +49,15 @@ origins = [
 @app.middleware("http")
 async def function_func(request : Request , callable):
 
-    result = await callable(request)
+    started = time.perf_counter()
+    IN_FLIGHT.inc()
+    try:
+        result = await callable(request)
+    finally:
+        IN_FLIGHT.dec()
+    route = getattr(request.scope.get("route") , "path" , "unmatched")
+    REQUEST_DURATION.observe((request.method , route) , time.perf_counter() - started)
+    REQUESTS.inc((request.method , route , f"{result.status_code // 100}xx"))
           
     try:
          authorization_header = request.headers.get("Authorization")[len("Bearer ") : ]
@@ -35,31 +65,31 @@ async def function_func(request : Request , callable):
     except:
         user_info = {}
     
-    entry = LogEntry
-    
     status_code = result.status_code 
 
     if status_code < 300: 
-        entry.type = "OK"
+        log_type = "OK"
     elif status_code < 400:
-        entry.type = "Redirect"
+        log_type = "Redirect"
     elif status_code < 500:
-        entry.type = "Bad Request"
+        log_type = "Bad Request"
     else:
-        entry.type = "Server Error"
+        log_type = "Server Error"
 
-    if "email" in user_info.keys():
-        entry.user = user_info["email"]
-    else:
-        entry.user = ""
-
-    entry.timestamp = datetime.datetime.now()
     base_url = '%s' % (request.base_url)
     url = '%s' % (request.url)
 
-    entry.activity = url[ len(base_url) : ]
-
-    await LogService.insert_log(entry , user_info)
+    # A new entry per request, queued for the background writer so the response doesn't wait on the insert
+    entry = LogEntry(
+        type = log_type ,
+        timestamp = datetime.datetime.now() ,
+        activity = url[ len(base_url) : ] ,
+        user = user_info.get("email" , "") ,
+        route = route ,
+        status = status_code ,
+        role = user_info.get("role" , "")
+    )
+    await LogService.queue_log(entry)
 
     return result
 
@@ -76,4 +106,7 @@ app.include_router(auth.router)
 app.include_router(log.router)
 app.include_router(user.router)
 app.include_router(forms.router)
-app.include_router(appointments.router)
\ No newline at end of file
+app.include_router(appointments.router)
+app.include_router(schedule.router)
+app.include_router(waitlist.router)
+app.include_router(metrics.router)
\ No newline at end of file
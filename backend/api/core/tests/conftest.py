@@ -0,0 +1,14 @@
+import os
+
+# The settings are read at import time, the tests never reach the database
+for name, value in {
+    "DB_URI" : "mongodb://localhost:27017",
+    "DB_NAME" : "test",
+    "DB_USER_COLLECTION" : "users",
+    "DB_LOGS_COLLECTION" : "logs",
+    "DB_APPOINTMENTS_COLLECTION" : "appointments",
+    "DB_FORMS_COLLECTION" : "forms",
+    "JWT_ALGORITHM" : "HS256",
+    "SECRET_KEY" : "test"
+}.items():
+    os.environ.setdefault(name, value)
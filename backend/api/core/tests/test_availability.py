@@ -0,0 +1,158 @@
+import asyncio
+from datetime import datetime
+import pytest
+from app.core.config import settings
+from app.modules.availability.schedule import Schedule
+from app.modules.availability.service import AvailabilityService
+from app.modules.availability.repository import AvailabilityRepository, ScheduleRepository
+from app.modules.appointments.repository import AppointmentRepository
+
+DOCTOR = "65a000000000000000000001"
+WEEK = "2030-01-07"
+HOURS = {day : [["08:00", "16:00"]] for day in range(1, 6)}
+
+class Store:
+    # In-memory stand-in for the availability and schedule collections, with the same conditional updates
+    def __init__(self, schedule : dict):
+        self.weeks = {}
+        self.schedule = schedule
+        self.appointments = []
+
+    def week(self, version : int, **days) -> dict:
+        doc = {"_id" : WEEK, "week" : WEEK, "version" : version, **{f"d{day}" : days.get(f"d{day}", 0) for day in range(1, 8)}}
+        self.weeks[WEEK] = doc
+        return dict(doc)
+
+    def install(self, monkeypatch):
+        async def get_schedule(doctor_id):
+            return dict(self.schedule)
+
+        async def get_week(doctor_id, week):
+            doc = self.weeks.get(week)
+            return dict(doc) if doc else None
+
+        async def claim_slot(doctor_id, week, day, bit, version=0):
+            doc = self.weeks.get(week)
+            if doc is None or doc["version"] != version or doc[f"d{day}"] >> bit & 1:
+                return False
+            doc[f"d{day}"] |= 1 << bit
+            return True
+
+        async def release_slot(doctor_id, week, day, bit, version=0):
+            doc = self.weeks.get(week)
+            if doc is None or doc["version"] != version or not doc[f"d{day}"] >> bit & 1:
+                return 0
+            doc[f"d{day}"] &= ~(1 << bit)
+            return 1
+
+        async def swap_week(doc, days, version):
+            stored = self.weeks.get(doc["week"])
+            if stored is None or any(stored[key] != doc.get(key, 0) for key in ["version", *[f"d{day}" for day in range(1, 8)]]):
+                return False
+            stored.update({f"d{day}" : mask for day, mask in days.items()}, version=version)
+            return True
+
+        async def get_upcoming_dates(doctor_id, start, end):
+            return [date for date in self.appointments if start <= date.strftime("%Y-%m-%d %H:%M") and (end is None or date.strftime("%Y-%m-%d %H:%M") < end)]
+
+        monkeypatch.setattr(ScheduleRepository, "get_schedule", staticmethod(get_schedule))
+        monkeypatch.setattr(AvailabilityRepository, "get_week", staticmethod(get_week))
+        monkeypatch.setattr(AvailabilityRepository, "claim_slot", staticmethod(claim_slot))
+        monkeypatch.setattr(AvailabilityRepository, "release_slot", staticmethod(release_slot))
+        monkeypatch.setattr(AvailabilityRepository, "swap_week", staticmethod(swap_week))
+        monkeypatch.setattr(AppointmentRepository, "get_upcoming_dates", staticmethod(get_upcoming_dates))
+        monkeypatch.setattr(settings, "RELEASE_RETRY_PAUSE_S", 0.0)
+
+@pytest.fixture
+def hourly():
+    return Schedule(60, HOURS, version=0)
+
+@pytest.fixture
+def half_hourly():
+    return Schedule(30, {**HOURS, 1 : [["08:00", "10:00"]]}, version=1)
+
+def test_rebuild_week_carries_claimed_bits(monkeypatch, hourly, half_hourly):
+    store = Store({"slot_minutes" : 30, "hours" : HOURS, "version" : 1})
+    store.install(monkeypatch)
+    # Monday 09:00 and 11:00 were claimed but not stored yet, Tuesday 10:00 is a stored appointment
+    doc = store.week(0, d1=1 << 9 | 1 << 11, d2=1 << 10)
+    store.appointments = [datetime(2030, 1, 8, 10)]
+
+    unplaced = asyncio.run(AvailabilityService.rebuild_week(DOCTOR, doc, hourly, half_hourly))
+
+    week = store.weeks[WEEK]
+    assert week["version"] == 1
+    assert week["d1"] == 1 << 18
+    assert week["d2"] == 1 << 20
+    # Monday 11:00 is off the new template
+    assert unplaced == [datetime(2030, 1, 7, 11)]
+
+def test_rebuild_week_redoes_a_week_claimed_meanwhile(monkeypatch, hourly, half_hourly):
+    store = Store({"slot_minutes" : 30, "hours" : HOURS, "version" : 1})
+    store.install(monkeypatch)
+    doc = store.week(0, d3=1 << 9)
+    # A claim with the old template lands after the week was read
+    store.weeks[WEEK]["d3"] |= 1 << 13
+
+    assert asyncio.run(AvailabilityService.rebuild_week(DOCTOR, doc, hourly, half_hourly)) == []
+    assert store.weeks[WEEK]["d3"] == 1 << 18 | 1 << 26
+
+def test_release_retries_on_a_week_rebuilt_meanwhile(monkeypatch):
+    store = Store({"slot_minutes" : 60, "hours" : HOURS, "version" : 0})
+    store.install(monkeypatch)
+    reads = []
+    get_schedule = ScheduleRepository.get_schedule
+
+    async def stale_once(doctor_id):
+        # The first read still sees the old template, the week was already rebuilt under the new one
+        reads.append(doctor_id)
+        if len(reads) > 1:
+            store.schedule = {"slot_minutes" : 30, "hours" : HOURS, "version" : 1}
+        return await get_schedule(doctor_id)
+
+    monkeypatch.setattr(ScheduleRepository, "get_schedule", staticmethod(stale_once))
+    store.week(1, d2=1 << 20 | 1 << 22)
+
+    asyncio.run(AvailabilityService.release(DOCTOR, "2030-01-08 10:00"))
+
+    assert len(reads) == 2
+    assert store.weeks[WEEK]["d2"] == 1 << 22
+
+def test_release_waits_for_a_pending_rebuild(monkeypatch, hourly, half_hourly):
+    store = Store({"slot_minutes" : 30, "hours" : HOURS, "version" : 1})
+    store.install(monkeypatch)
+    # set_schedule wrote the new template but hasn't reached this week yet, and does by the second read
+    doc = store.week(0, d2=1 << 10)
+    reads = []
+    get_schedule = ScheduleRepository.get_schedule
+
+    async def rebuilt_later(doctor_id):
+        reads.append(doctor_id)
+        if len(reads) == 2:
+            await AvailabilityService.rebuild_week(DOCTOR, doc, hourly, half_hourly)
+        return await get_schedule(doctor_id)
+
+    monkeypatch.setattr(ScheduleRepository, "get_schedule", staticmethod(rebuilt_later))
+
+    asyncio.run(AvailabilityService.release(DOCTOR, "2030-01-08 10:00"))
+
+    assert len(reads) == 2
+    assert store.weeks[WEEK]["version"] == 1
+    assert store.weeks[WEEK]["d2"] == 0
+
+def test_release_of_a_clear_slot_stops(monkeypatch):
+    store = Store({"slot_minutes" : 60, "hours" : HOURS, "version" : 0})
+    store.install(monkeypatch)
+    store.week(0)
+    released = []
+    release_slot = AvailabilityRepository.release_slot
+
+    async def counting(*args):
+        released.append(args)
+        return await release_slot(*args)
+
+    monkeypatch.setattr(AvailabilityRepository, "release_slot", staticmethod(counting))
+
+    asyncio.run(AvailabilityService.release(DOCTOR, "2030-01-08 10:00"))
+
+    assert len(released) == 1
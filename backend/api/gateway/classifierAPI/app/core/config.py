@@ -5,10 +5,73 @@ class Settings(BaseSettings):
     DB_NAME: str
     DB_MODEL_PATH_COLLECTION : str
     DB_LOGS_COLLECTION : str
+    DB_LOG_ROLLUPS_COLLECTION : str = "log_rollups"
+    DB_LOCKS_COLLECTION : str = "locks"
     DB_APPOINTMENTS_COLLECTION : str
+    DB_USER_COLLECTION : str = "users"
+    DB_PREDICTION_CACHE_COLLECTION : str = "prediction_cache"
+    DB_AVAILABILITY_COLLECTION : str = "availability"
+    DB_SCHEDULES_COLLECTION : str = "schedules"
+    DB_WAITLIST_COLLECTION : str = "waitlist"
     #Security
     JWT_ALGORITHM: str
     SECRET_KEY: str
+    #Models
+    MODEL_DIR : str = "app/models"
+    MODEL_RELOAD_INTERVAL_S : float = 30.0
+    MODEL_MEMORY_BUDGET_MB : float = 512.0
+    MODEL_KEEP_VERSIONS : int = 2
+    MODEL_FAST_PATH : bool = True
+    MODEL_SHARED_DIR : str = ""
+    MODEL_WARMUP : str = "eager"
+    MODEL_LOAD_CONCURRENCY : int = 4
+    #Inference
+    INFERENCE_MAX_BATCH_SIZE : int = 32
+    INFERENCE_MAX_WAIT_MS : float = 2.0
+    INFERENCE_STATS_WINDOW : int = 10000
+    INFERENCE_DEFAULT_EXECUTOR : str = "thread"
+    INFERENCE_EXECUTOR_MODES : dict[str, str] = {}
+    INFERENCE_THREAD_WORKERS : int = 4
+    INFERENCE_PROCESS_WORKERS : int = 2
+    INFERENCE_MAX_CONCURRENCY : int = 4
+    INFERENCE_MAX_QUEUE_DEPTH : int = 1024
+    #Prediction cache
+    PREDICTION_CACHE_SIZE : int = 10000
+    PREDICTION_CACHE_TTL_S : float = 600.0
+    PREDICTION_CACHE_BACKEND : str = ""
+    #Scheduling
+    SLOT_FIRST_HOUR : int = 8
+    SLOT_LAST_HOUR : int = 15
+    SLOT_WORKING_DAYS : int = 5
+    APPOINTMENT_TIMEZONE : str = "UTC"
+    PLANNER_HORIZON_DAYS : int = 7
+    PLANNER_MAX_HORIZON_DAYS : int = 90
+    PLANNER_MAX_BATCH_SIZE : int = 5000
+    BOOKING_MAX_ATTEMPTS : int = 3
+    RELEASE_MAX_ATTEMPTS : int = 20
+    RELEASE_RETRY_PAUSE_S : float = 0.05
+    CALENDAR_CACHE_SIZE : int = 5000
+    CALENDAR_CACHE_TTL_S : float = 5.0
+    CALENDAR_CACHE_WATCH : bool = True
+    #Logging
+    LOG_QUEUE_SIZE : int = 10000
+    LOG_BATCH_SIZE : int = 500
+    LOG_FLUSH_INTERVAL_S : float = 1.0
+    LOG_QUEUE_POLICY : str = "drop"
+    LOG_SHUTDOWN_TIMEOUT_S : float = 10.0
+    LOG_MIGRATION_ENABLED : bool = True
+    LOG_MIGRATION_BATCH_SIZE : int = 500
+    LOG_MIGRATION_PAUSE_S : float = 0.05
+    LOG_PAGE_SIZE : int = 100
+    LOG_MAX_PAGE_SIZE : int = 1000
+    LOG_STREAM_BATCH_SIZE : int = 500
+    LOG_ROLLUP_MINUTE_TTL_DAYS : int = 14
+    LOG_ROLLUP_MAX_BUCKETS : int = 20000
+    LOG_RETENTION_DAYS : int = 30
+    LOG_ARCHIVE_DIR : str = "log_archive"
+    LOG_ARCHIVE_CODEC : str = "gzip"
+    LOG_ARCHIVE_INTERVAL_S : float = 3600.0
+    LOG_ARCHIVE_LEASE_S : float = 600.0
     class Config:
         env_file = ".env"
 
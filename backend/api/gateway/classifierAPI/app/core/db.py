@@ -1,12 +1,13 @@
 from pymongo import AsyncMongoClient
 from app.core.config import settings
+from app.core.metrics import MongoCommandMetrics
 
 class Database:
     db = None
     client = None
     @staticmethod
     async def connectToDatabase() -> None:
-        Database.client = AsyncMongoClient(settings.DB_URI)
+        Database.client = AsyncMongoClient(settings.DB_URI, event_listeners=[MongoCommandMetrics()])
         Database.db = Database.client[settings.DB_NAME] 
 
     @staticmethod
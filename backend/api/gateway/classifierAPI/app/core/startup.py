@@ -0,0 +1,31 @@
+from contextlib import contextmanager
+import time
+
+class StartupTimings:
+    # Imported first by main.py so "imports" covers loading the rest of the application
+    started = time.perf_counter()
+    last_mark = started
+    phases = {}
+
+    @staticmethod
+    def mark(phase : str) -> None:
+        now = time.perf_counter()
+        StartupTimings.phases[phase] = now - StartupTimings.last_mark
+        StartupTimings.last_mark = now
+
+    @staticmethod
+    @contextmanager
+    def phase(phase : str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            StartupTimings.phases[phase] = time.perf_counter() - started
+            StartupTimings.last_mark = time.perf_counter()
+
+    @staticmethod
+    def report() -> dict:
+        return {
+            "phases_seconds" : dict(StartupTimings.phases),
+            "total_seconds" : StartupTimings.last_mark - StartupTimings.started
+        }
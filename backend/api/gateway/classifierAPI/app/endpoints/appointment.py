@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends
 from app.security.security import get_current_user
-from app.modules.appointment.model import AppointmentRequest
+from app.modules.appointment.model import AppointmentRequest, SpecialtyPlannerRequest, BatchPlannerRequest, TriageBookRequest
 from app.modules.appointment.service import AppointmentService
 
 router = APIRouter()
@@ -9,4 +9,28 @@ router = APIRouter()
     "/planner"
 )
 async def plan_the_thing(req : AppointmentRequest , user : dict = Depends(get_current_user)):
-    return await AppointmentService.make_appointment(req , user)
\ No newline at end of file
+    return await AppointmentService.make_appointment(req , user)
+
+@router.post(
+    "/triage-and-book"
+)
+async def triage_and_book(req : TriageBookRequest , user : dict = Depends(get_current_user)):
+    return await AppointmentService.triage_and_book(req , user)
+
+@router.post(
+    "/planner/specialty"
+)
+async def plan_for_specialty(req : SpecialtyPlannerRequest , user : dict = Depends(get_current_user)):
+    return await AppointmentService.plan_for_specialty(req , user)
+
+@router.post(
+    "/planner/batch"
+)
+async def plan_batch(req : BatchPlannerRequest , user : dict = Depends(get_current_user)):
+    return await AppointmentService.plan_batch(req , user)
+
+@router.get(
+    "/planner/stats"
+)
+async def get_planner_stats(user : dict = Depends(get_current_user)):
+    return await AppointmentService.get_planner_stats(user)
\ No newline at end of file
@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.models.prediction_models import PredictionModels
+from app.core.startup import StartupTimings
+
+router = APIRouter()
+
+@router.get(
+    "/ready"
+)
+async def ready():
+    readiness = PredictionModels.readiness()
+    readiness["startup"] = StartupTimings.report()
+    return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
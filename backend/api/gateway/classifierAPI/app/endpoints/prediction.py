@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends
-from app.modules.prediction.model import FormResponse
+from typing import Optional
+from app.modules.prediction.model import FormResponse, ScreeningRequest
 from app.security.security import get_current_user
 from app.modules.prediction.service import PredictionService
 
@@ -8,5 +9,23 @@ router = APIRouter()
 @router.post(
     "/get-results/{model_id}"
 )
-async def get_prediction_results(model_id : str, form : FormResponse, usr : dict = Depends(get_current_user)):
-    return await PredictionService.get_prediction_result(model_id, form.questions)
+async def get_prediction_results(model_id : str, form : FormResponse, version : Optional[str] = None, usr : dict = Depends(get_current_user)):
+    return await PredictionService.get_prediction_result(model_id, form.questions, version)
+
+@router.post(
+    "/screening"
+)
+async def get_screening_results(req : ScreeningRequest, usr : dict = Depends(get_current_user)):
+    return await PredictionService.screen(req.answers, req.models)
+
+@router.get(
+    "/inference/stats"
+)
+async def get_inference_stats(usr : dict = Depends(get_current_user)):
+    return await PredictionService.get_inference_stats(usr)
+
+@router.get(
+    "/models"
+)
+async def get_models(usr : dict = Depends(get_current_user)):
+    return await PredictionService.get_models(usr)
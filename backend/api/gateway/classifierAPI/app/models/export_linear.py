@@ -0,0 +1,40 @@
+# Exports linear sklearn models to the .npz format served by LinearScorer.
+#
+#   python -m app.models.export_linear                      # every .joblib in MODEL_DIR
+#   python -m app.models.export_linear app/models/x.joblib  # specific files
+import sys
+import glob
+import os
+import joblib
+
+from app.models.linear import LinearScorer
+from app.models.prediction_models import file_checksum
+
+def export_model(joblib_path : str) -> str:
+    model = joblib.load(joblib_path)
+    if not LinearScorer.is_supported(model):
+        return None
+
+    npz_path = os.path.splitext(joblib_path)[0] + ".npz"
+    LinearScorer.from_estimator(model).save(npz_path, file_checksum(joblib_path))
+    return npz_path
+
+def main(paths : list):
+    if not paths:
+        from app.core.config import settings
+        paths = sorted(glob.glob(os.path.join(settings.MODEL_DIR, "*.joblib")))
+
+    for path in paths:
+        try:
+            exported = export_model(path)
+        except Exception as e:
+            print(f"Failed to export {path}: {e}")
+            continue
+
+        if exported is None:
+            print(f"Skipped {path}: not a supported linear model, sklearn will be used")
+        else:
+            print(f"Exported {path} -> {exported}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,104 @@
+import numpy as np
+import json
+import os
+
+def features_path(model_path : str) -> str:
+    return os.path.splitext(model_path)[0] + ".features.json"
+
+class FeaturePipeline:
+    # Serve-time half of ai/common/features.py: the schema is fitted and saved next to the
+    # model by the training script, and replayed here over whole batches.
+
+    def __init__(self, columns : list, categorical : dict = None, mean : list = None, scale : list = None):
+        self.columns = list(columns)
+        self.n_features = len(self.columns)
+        self.categorical = {}
+        for name, mapping in (categorical or {}).items():
+            labels = np.array([str(label).lower() for label in mapping.keys()])
+            codes = np.array(list(mapping.values()), dtype=np.float64)
+            order = np.argsort(labels)
+            self.categorical[self.columns.index(name)] = (labels[order], codes[order])
+        self.numeric = np.array([i for i in range(self.n_features) if i not in self.categorical], dtype=np.intp)
+        self.mean = np.asarray(mean, dtype=np.float64) if mean is not None else None
+        self.scale = np.asarray(scale, dtype=np.float64) if scale is not None else None
+
+    @staticmethod
+    def load(path : str) -> "FeaturePipeline":
+        with open(path) as f:
+            schema = json.load(f)
+        return FeaturePipeline(schema["columns"], schema.get("categorical"), schema.get("mean"), schema.get("scale"))
+
+    @staticmethod
+    def identity(model) -> "FeaturePipeline":
+        # sklearn remembers column names when fitted on a DataFrame, which is enough to route named answers
+        names = getattr(model, "feature_names_in_", None)
+        if names is None:
+            names = [f"x{i}" for i in range(model.n_features_in_)]
+        return FeaturePipeline([str(name) for name in names])
+
+    @property
+    def named(self) -> bool:
+        # False for identity()'s positional placeholders, answers can't be matched to those by name
+        return self.columns != [f"x{i}" for i in range(self.n_features)]
+
+    def encode(self, rows : list) -> np.ndarray:
+        # Validates the shape once for the whole batch, then converts column-wise instead of per element
+        widths = {len(row) for row in rows}
+        if widths != {self.n_features}:
+            raise ValueError(f"Expected {self.n_features} features, got {', '.join(map(str, sorted(widths)))}")
+
+        raw = np.array(rows, dtype=object).reshape(len(rows), self.n_features)
+        if not self.categorical:
+            return self.to_float(raw, np.arange(self.n_features))
+
+        encoded = np.empty(raw.shape, dtype=np.float64)
+        encoded[:, self.numeric] = self.to_float(raw[:, self.numeric], self.numeric)
+
+        for index, (labels, codes) in self.categorical.items():
+            column = raw[:, index]
+            text = np.char.lower(column.astype(str))
+            position = np.minimum(np.searchsorted(labels, text), len(labels) - 1)
+            matched = labels[position] == text
+            encoded[matched, index] = codes[position[matched]]
+            if not matched.all():
+                # Already-encoded numeric answers are still accepted for categorical columns
+                encoded[~matched, index] = self.to_float(column[~matched].reshape(-1, 1), [index])[:, 0]
+
+        return encoded
+
+    def to_float(self, block : np.ndarray, indices) -> np.ndarray:
+        try:
+            return block.astype(np.float64)
+        except (TypeError, ValueError):
+            for position, index in enumerate(indices):
+                try:
+                    block[:, position].astype(np.float64)
+                except (TypeError, ValueError):
+                    raise ValueError(f"Invalid value for feature {self.columns[index]}")
+            raise
+
+    def transform(self, matrix : np.ndarray) -> np.ndarray:
+        if self.mean is None:
+            return matrix
+        return (matrix - self.mean) / self.scale
+
+class ServingModel:
+    def __init__(self, model, pipeline : FeaturePipeline):
+        self.model = model
+        self.pipeline = pipeline
+        self.n_features_in_ = pipeline.n_features
+
+    def predict(self, matrix : np.ndarray) -> np.ndarray:
+        return self.model.predict(self.pipeline.transform(matrix))
+
+    @staticmethod
+    def wrap(model, model_path : str) -> "ServingModel":
+        path = features_path(model_path)
+        if os.path.exists(path):
+            pipeline = FeaturePipeline.load(path)
+        else:
+            pipeline = FeaturePipeline.identity(model)
+
+        if pipeline.n_features != model.n_features_in_:
+            raise ValueError(f"{path} describes {pipeline.n_features} features, the model expects {model.n_features_in_}")
+        return ServingModel(model, pipeline)
@@ -0,0 +1,94 @@
+import numpy as np
+
+# Estimators whose predict is argmax(X @ coef.T + intercept) over classes_
+SUPPORTED_ESTIMATORS = {"LogisticRegression", "SGDClassifier", "LinearSVC", "RidgeClassifier", "Perceptron"}
+
+class LinearScorer:
+    def __init__(self, coef : np.ndarray, intercept : np.ndarray, classes : np.ndarray, kind : str = "LogisticRegression", feature_names : np.ndarray = None):
+        # Only the pre-transposed weights are kept so scoring is a single matmul without a copy
+        self.weights = np.ascontiguousarray(np.asarray(coef, dtype=np.float64).T)
+        self.intercept_ = np.ascontiguousarray(intercept, dtype=np.float64)
+        self.classes_ = classes
+        self.n_features_in_ = self.weights.shape[0]
+        self.kind = kind
+        if feature_names is not None and len(feature_names):
+            self.feature_names_in_ = np.asarray(feature_names, dtype=str)
+
+    @property
+    def coef_(self) -> np.ndarray:
+        return self.weights.T
+
+    def decision_function(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[1]} features, but {self.kind} is expecting {self.n_features_in_} features as input.")
+
+        scores = X @ self.weights
+        scores += self.intercept_
+        return scores
+
+    def predict(self, X) -> np.ndarray:
+        scores = self.decision_function(X)
+        if scores.shape[1] == 1:
+            return self.classes_[(scores[:, 0] > 0).astype(np.intp)]
+        return self.classes_[scores.argmax(axis=1)]
+
+    def predict_proba(self, X) -> np.ndarray:
+        scores = self.decision_function(X)
+        if scores.shape[1] == 1:
+            positive = 1.0 / (1.0 + np.exp(-scores[:, 0]))
+            return np.column_stack([1.0 - positive, positive])
+
+        scores -= scores.max(axis=1, keepdims=True)
+        np.exp(scores, out=scores)
+        scores /= scores.sum(axis=1, keepdims=True)
+        return scores
+
+    def save(self, path : str, source_checksum : str = "") -> None:
+        np.savez(
+            path,
+            source_checksum=np.array(source_checksum),
+            coef=self.coef_,
+            intercept=self.intercept_,
+            classes=self.classes_,
+            n_features=np.array(self.n_features_in_),
+            kind=np.array(self.kind),
+            feature_names=np.asarray(getattr(self, "feature_names_in_", []), dtype=str)
+        )
+
+    @staticmethod
+    def load(path : str) -> "LinearScorer":
+        with np.load(path, allow_pickle=False) as data:
+            feature_names = data["feature_names"] if "feature_names" in data.files else None
+            scorer = LinearScorer(data["coef"], data["intercept"], data["classes"], str(data["kind"]), feature_names)
+            if int(data["n_features"]) != scorer.n_features_in_:
+                raise ValueError(f"Corrupt linear model file {path}")
+            return scorer
+
+    @staticmethod
+    def read_source_checksum(path : str) -> str:
+        with np.load(path, allow_pickle=False) as data:
+            return str(data["source_checksum"]) if "source_checksum" in data.files else ""
+
+    @staticmethod
+    def is_supported(model) -> bool:
+        return (
+            type(model).__name__ in SUPPORTED_ESTIMATORS
+            and hasattr(model, "coef_")
+            and hasattr(model, "intercept_")
+            and hasattr(model, "classes_")
+        )
+
+    @staticmethod
+    def from_estimator(model) -> "LinearScorer":
+        if not LinearScorer.is_supported(model):
+            raise TypeError(f"{type(model).__name__} can't be exported to the linear fast path")
+        return LinearScorer(
+            np.atleast_2d(model.coef_),
+            np.atleast_1d(model.intercept_),
+            np.asarray(model.classes_),
+            type(model).__name__,
+            getattr(model, "feature_names_in_", None)
+        )
@@ -1,27 +1,337 @@
 from ..core.db import Database
 from ..core.config import settings
+from ..core.startup import StartupTimings
+from .linear import LinearScorer
+from .features import ServingModel, features_path
+from .shared_store import SharedModelStore
+from ..modules.prediction.cache import PredictionCache
 
+from collections import OrderedDict
+import hashlib
+import pickle
 import joblib
 import asyncio
+import time
+import os
+
+def file_checksum(path : str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# path -> (mtime, size, checksum) so unchanged files aren't re-hashed on every reload pass
+_checksums = {}
+
+def cached_checksum(path : str) -> str:
+    stat = os.stat(path)
+    cached = _checksums.get(path)
+    if cached and cached[0] == stat.st_mtime and cached[1] == stat.st_size:
+        return cached[2]
+    checksum = file_checksum(path)
+    _checksums[path] = (stat.st_mtime, stat.st_size, checksum)
+    return checksum
+
+def model_checksum(path : str) -> str:
+    # The feature schema is part of what gets served, so editing it alone also produces a new version
+    checksum = cached_checksum(path)
+    schema = features_path(path)
+    if os.path.exists(schema):
+        checksum = hashlib.sha256((checksum + cached_checksum(schema)).encode()).hexdigest()
+    return checksum
+
+def resolve_model_path(path : str) -> str:
+    # Prefer the exported NumPy weights, but only while they were exported from the current joblib file
+    if not settings.MODEL_FAST_PATH:
+        return path
+    npz_path = os.path.splitext(path)[0] + ".npz"
+    if not os.path.exists(npz_path):
+        return path
+    if not os.path.exists(path):
+        return npz_path
+    try:
+        if LinearScorer.read_source_checksum(npz_path) == cached_checksum(path):
+            return npz_path
+    except Exception as e:
+        print(f"Ignoring unreadable {npz_path}: {e}")
+    return path
+
+def read_model_file(path : str):
+    if path.endswith(".npz"):
+        model = LinearScorer.load(path)
+    else:
+        model = joblib.load(path)
+    return ServingModel.wrap(model, path)
+
+def load_model_file(path : str, checksum : str):
+    if SharedModelStore.enabled():
+        return SharedModelStore.load(path, checksum, read_model_file)
+    model = read_model_file(path)
+    return model, len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+
+class ModelEntry:
+    def __init__(self, model_id : str, version : str, path : str, checksum : str):
+        self.model_id = model_id
+        self.version = version
+        self.path = path
+        self.checksum = checksum
+        self.model = None
+        self.state = "registered"
+        self.size_bytes = 0
+        self.registered_at = time.time()
+        self.loaded_at = None
+        self.load_seconds = None
+        self.last_used = 0.0
+
+    def describe(self) -> dict:
+        return {
+            "model_id" : self.model_id,
+            "version" : self.version,
+            "checksum" : self.checksum,
+            "state" : self.state,
+            "resident" : self.model is not None,
+            "size_bytes" : self.size_bytes,
+            "loaded_at" : self.loaded_at,
+            "load_seconds" : self.load_seconds
+        }
 
 class PredictionModels:
-    loaded_models = {}
+    # (model_id, version) -> ModelEntry, swapped atomically on reload
+    entries = {}
+    # model_id -> version served when a request doesn't pin one
+    latest = {}
+    # resident (model_id, version) keys in least recently used order
+    resident = OrderedDict()
+    loading = {}
+    # model_id -> last load error, cleared once a load succeeds
+    failures = {}
+    synced = False
+    # registry sync started by a request that found a replaced file, shared with concurrent ones
+    syncing = None
+    warmer = None
+    reloader = None
 
     @staticmethod
-    async def load_prediction_models():
+    async def load_prediction_models(load : bool = True):
         col = Database.db[settings.DB_MODEL_PATH_COLLECTION]
+        models = await col.find().to_list(length=None)
 
-        cursor = col.find()
-        async for model in cursor:
-            try:
-                model_path = model.get("name")
-                model_id = model.get("model_id")
-                if not model_path or not model_id:
-                    continue
+        # Models are hashed and loaded concurrently, bounded so a large registry doesn't flood the executor
+        semaphore = asyncio.Semaphore(settings.MODEL_LOAD_CONCURRENCY)
+        await asyncio.gather(*[PredictionModels.sync_model(model, semaphore, load) for model in models])
+
+        PredictionModels.synced = True
+        SharedModelStore.prune({entry.checksum for entry in PredictionModels.entries.values()})
+
+    @staticmethod
+    async def sync_model(model : dict, semaphore : asyncio.Semaphore, load : bool):
+        model_path = model.get("name")
+        model_id = model.get("model_id")
+        if not model_path or not model_id:
+            return
+
+        loop = asyncio.get_running_loop()
+        try:
+            async with semaphore:
+                path = await loop.run_in_executor(
+                    None, resolve_model_path, os.path.abspath(os.path.join(settings.MODEL_DIR, model_path))
+                )
+                checksum = await loop.run_in_executor(None, model_checksum, path)
+                version = str(model.get("version") or checksum[:12])
 
-                loop = asyncio.get_running_loop()
-                loaded_model = await loop.run_in_executor(None, joblib.load, f'app/models/{model_path}')
+                current = PredictionModels.entries.get((model_id, version))
+                if current is not None and current.checksum == checksum:
+                    return
 
-                PredictionModels.loaded_models[model_id] = loaded_model
+                entry = ModelEntry(model_id, version, path, checksum)
+                if load:
+                    await PredictionModels.load_entry(entry)
+                PredictionModels.publish(entry)
+                PredictionModels.failures.pop(model_id, None)
+        except Exception as e:
+            PredictionModels.failures[model_id] = str(e)
+            print(f"Failed to load model {model_id}: {e}")
+
+    @staticmethod
+    async def warm_up():
+        with StartupTimings.phase("model_load"):
+            await PredictionModels.load_prediction_models(load=settings.MODEL_WARMUP != "lazy")
+
+    @staticmethod
+    def start_warm_up() -> None:
+        # "background" lets the app start serving while models load, "eager" callers await warm_up instead
+        PredictionModels.warmer = asyncio.create_task(PredictionModels.warm_up())
+
+    @staticmethod
+    def readiness() -> dict:
+        models = {}
+        for model_id, version in PredictionModels.latest.items():
+            entry = PredictionModels.entries.get((model_id, version))
+            if entry is not None:
+                models[model_id] = entry.describe()
+        for model_id, error in PredictionModels.failures.items():
+            models.setdefault(model_id, {"model_id" : model_id, "state" : "failed"})["error"] = error
+
+        ready_states = {"ready", "evicted"} | ({"registered"} if settings.MODEL_WARMUP == "lazy" else set())
+        ready = PredictionModels.synced and not PredictionModels.failures and all(
+            model["state"] in ready_states for model in models.values()
+        )
+        return {"ready" : ready, "models" : models}
+
+    @staticmethod
+    def publish(entry : ModelEntry) -> None:
+        key = (entry.model_id, entry.version)
+        PredictionModels.entries[key] = entry
+        PredictionModels.latest[entry.model_id] = entry.version
+        PredictionModels.retire_old_versions(entry.model_id)
+        PredictionCache.invalidate(entry.model_id)
+
+    @staticmethod
+    def retire_old_versions(model_id : str) -> None:
+        versions = sorted(
+            (entry for (mid, _), entry in PredictionModels.entries.items() if mid == model_id),
+            key=lambda entry: entry.registered_at,
+            reverse=True
+        )
+        for entry in versions[settings.MODEL_KEEP_VERSIONS :]:
+            key = (entry.model_id, entry.version)
+            PredictionModels.entries.pop(key, None)
+            PredictionModels.resident.pop(key, None)
+
+    @staticmethod
+    async def load_entry(entry : ModelEntry) -> None:
+        key = (entry.model_id, entry.version)
+
+        # Concurrent requests for an evicted model share a single load
+        pending = PredictionModels.loading.get(key)
+        if pending is not None:
+            await pending
+            return
+
+        loop = asyncio.get_running_loop()
+        pending = loop.create_future()
+        PredictionModels.loading[key] = pending
+        entry.state = "loading"
+        started = time.perf_counter()
+        try:
+            model, size_bytes = await loop.run_in_executor(None, load_model_file, entry.path, entry.checksum)
+            entry.model = model
+            entry.state = "ready"
+            entry.size_bytes = size_bytes
+            entry.loaded_at = time.time()
+            entry.load_seconds = time.perf_counter() - started
+            entry.last_used = time.monotonic()
+            PredictionModels.resident[key] = entry
+            PredictionModels.resident.move_to_end(key)
+            PredictionModels.evict(keep=key)
+            pending.set_result(True)
+        except Exception as e:
+            entry.state = "failed"
+            pending.set_exception(e)
+            pending.exception()
+            raise
+        finally:
+            PredictionModels.loading.pop(key, None)
+
+    @staticmethod
+    def evict(keep : tuple) -> None:
+        budget = settings.MODEL_MEMORY_BUDGET_MB * 1024 * 1024
+        used = sum(entry.size_bytes for entry in PredictionModels.resident.values())
+
+        for key in list(PredictionModels.resident.keys()):
+            if used <= budget:
+                break
+            if key == keep:
+                continue
+            entry = PredictionModels.resident.pop(key)
+            used -= entry.size_bytes
+            entry.model = None
+            entry.state = "evicted"
+
+    @staticmethod
+    async def get_model(model_id : str, version : str = None):
+        if model_id not in PredictionModels.latest and PredictionModels.warmer and not PredictionModels.warmer.done():
+            await asyncio.shield(PredictionModels.warmer)
+
+        pinned = version
+        version = version or PredictionModels.latest.get(model_id)
+        entry = PredictionModels.entries.get((model_id, version))
+        if entry is None:
+            return None
+
+        if entry.model is not None:
+            PredictionModels.resident.move_to_end((model_id, version))
+
+        # Loops because a load made for another request can evict this entry again before a request
+        # that only waited on this entry's load resumes. Callers read entry.model without awaiting
+        # in between, which is what keeps it from being evicted under them
+        while entry.model is None:
+            # The file may have been replaced since this version was evicted
+            checksum = await asyncio.get_running_loop().run_in_executor(None, model_checksum, entry.path)
+            if checksum != entry.checksum:
+                entry = await PredictionModels.replacement(entry, pinned)
+                if entry is None:
+                    return None
+                continue
+            await PredictionModels.load_entry(entry)
+
+        entry.last_used = time.monotonic()
+        return entry
+
+    @staticmethod
+    async def resync() -> None:
+        if PredictionModels.syncing is None or PredictionModels.syncing.done():
+            PredictionModels.syncing = asyncio.create_task(PredictionModels.load_prediction_models(load=False))
+        await asyncio.shield(PredictionModels.syncing)
+
+    @staticmethod
+    async def replacement(entry : ModelEntry, pinned : str = None):
+        # The entry's file was replaced, so the registry is synced now instead of at the next reload.
+        # When that doesn't register the new file, a version of the model that is still resident
+        # serves unpinned requests meanwhile
+        try:
+            await PredictionModels.resync()
+        except Exception as e:
+            print(f"Model sync for {entry.model_id} failed: {e}")
+
+        current = PredictionModels.entries.get((entry.model_id, pinned or PredictionModels.latest.get(entry.model_id)))
+        if current is not None and current is not entry:
+            return current
+        if pinned:
+            return None
+        resident = [other for (model_id, _), other in PredictionModels.resident.items() if model_id == entry.model_id]
+        return resident[-1] if resident else None
+
+    @staticmethod
+    def list_models() -> list:
+        return [
+            dict(entry.describe(), latest=PredictionModels.latest.get(entry.model_id) == entry.version)
+            for entry in PredictionModels.entries.values()
+        ]
+
+    @staticmethod
+    async def watch_for_changes():
+        while True:
+            await asyncio.sleep(settings.MODEL_RELOAD_INTERVAL_S)
+            try:
+                await PredictionModels.load_prediction_models(load=settings.MODEL_WARMUP != "lazy")
             except Exception as e:
-                print(f"Failed to load model {model.get('model_id')}: {e}")
\ No newline at end of file
+                print(f"Model reload failed: {e}")
+
+    @staticmethod
+    def start_reloader() -> None:
+        if settings.MODEL_RELOAD_INTERVAL_S > 0:
+            PredictionModels.reloader = asyncio.create_task(PredictionModels.watch_for_changes())
+
+    @staticmethod
+    async def stop_reloader() -> None:
+        if PredictionModels.warmer and not PredictionModels.warmer.done():
+            PredictionModels.warmer.cancel()
+        if PredictionModels.reloader:
+            PredictionModels.reloader.cancel()
+            try:
+                await PredictionModels.reloader
+            except asyncio.CancelledError:
+                pass
+            PredictionModels.reloader = None
@@ -0,0 +1,91 @@
+from ..core.config import settings
+
+from contextlib import contextmanager
+import fcntl
+import joblib
+import os
+import time
+
+class SharedModelStore:
+    # Every uvicorn worker attaches to the same uncompressed joblib copy of a model with
+    # mmap_mode="r", so the weight arrays live once in the page cache instead of once per process.
+
+    @staticmethod
+    def enabled() -> bool:
+        return bool(settings.MODEL_SHARED_DIR)
+
+    @staticmethod
+    def shared_path(checksum : str) -> str:
+        return os.path.join(settings.MODEL_SHARED_DIR, f"{checksum}.joblib")
+
+    @staticmethod
+    @contextmanager
+    def locked(shared_path : str, operation : int):
+        # prune unlinks lock files along with their model, so a lock that was taken on a file unlinked
+        # meanwhile is taken again on the current one
+        while True:
+            lock = open(shared_path + ".lock", "a")
+            try:
+                fcntl.flock(lock, operation)
+                try:
+                    current = os.stat(shared_path + ".lock").st_ino == os.fstat(lock.fileno()).st_ino
+                except FileNotFoundError:
+                    current = False
+                if current:
+                    try:
+                        yield
+                    finally:
+                        fcntl.flock(lock, fcntl.LOCK_UN)
+                    return
+                fcntl.flock(lock, fcntl.LOCK_UN)
+            finally:
+                lock.close()
+
+    @staticmethod
+    def publish(path : str, checksum : str, read_model_file) -> str:
+        shared_path = SharedModelStore.shared_path(checksum)
+        os.makedirs(settings.MODEL_SHARED_DIR, exist_ok=True)
+        with SharedModelStore.locked(shared_path, fcntl.LOCK_EX):
+            # Whichever worker gets here first materialises the file, the rest wait and reuse it
+            if not os.path.exists(shared_path):
+                model = read_model_file(path)
+                tmp_path = f"{shared_path}.{os.getpid()}.tmp"
+                joblib.dump(model, tmp_path, compress=0)
+                os.replace(tmp_path, shared_path)
+
+        return shared_path
+
+    @staticmethod
+    def load(path : str, checksum : str, read_model_file):
+        # Attached under a shared lock, which prune can't take over, and touched so that prune sees
+        # the file is in use. Once mapped, the file can go, the worker keeps its pages
+        shared_path = SharedModelStore.shared_path(checksum)
+        for _ in range(2):
+            if os.path.exists(shared_path):
+                with SharedModelStore.locked(shared_path, fcntl.LOCK_SH):
+                    if os.path.exists(shared_path):
+                        os.utime(shared_path)
+                        return joblib.load(shared_path, mmap_mode="r"), os.path.getsize(shared_path)
+            SharedModelStore.publish(path, checksum, read_model_file)
+        raise FileNotFoundError(shared_path)
+
+    @staticmethod
+    def prune(checksums : set) -> None:
+        # Other workers reload on their own clock and may still reference a model this one dropped, so
+        # a file only goes once it is unreferenced here and no worker attached to it for a whole reload
+        # interval. The decision is made under the file's lock, so no worker attaches meanwhile
+        if not SharedModelStore.enabled() or not os.path.isdir(settings.MODEL_SHARED_DIR):
+            return
+
+        cutoff = time.time() - settings.MODEL_RELOAD_INTERVAL_S
+        for name in os.listdir(settings.MODEL_SHARED_DIR):
+            if not name.endswith(".joblib") or name[:-len(".joblib")] in checksums:
+                continue
+            shared_path = os.path.join(settings.MODEL_SHARED_DIR, name)
+            try:
+                with SharedModelStore.locked(shared_path, fcntl.LOCK_EX | fcntl.LOCK_NB):
+                    if os.path.getmtime(shared_path) < cutoff:
+                        os.remove(shared_path)
+                        os.remove(shared_path + ".lock")
+            except (BlockingIOError, FileNotFoundError):
+                pass
@@ -1,5 +1,28 @@
 from pydantic import BaseModel
+from typing import List, Optional, Union
 
 class AppointmentRequest(BaseModel):
     doctor_id : str 
     prior : str 
+
+
+class SpecialtyPlannerRequest(BaseModel):
+    specialization : str
+    prior : str
+    top_k : int = 1
+
+class BatchPlanItem(BaseModel):
+    patient : str
+    prior : str
+    doctor_id : Optional[str] = None
+    specialization : Optional[str] = None
+
+class BatchPlannerRequest(BaseModel):
+    requests : List[BatchPlanItem]
+
+class TriageBookRequest(BaseModel):
+    model_id : str
+    questions : List[Union[float,str]]
+    version : Optional[str] = None
+    doctor_id : Optional[str] = None
+    specialization : Optional[str] = None
@@ -1,18 +1,76 @@
 from app.core.config import settings
 from app.core.db import Database
+from app.core.dates import range_filter, to_local, to_storage
 from bson import SON
 from bson import ObjectId
 
 class AppointmentRepository:
     @staticmethod
-    async def get_calendar(doctor_id : str):
+    async def setup() -> None:
         col = Database.db[settings.DB_APPOINTMENTS_COLLECTION]
-        cursor =  col.find({"doctor_id" : ObjectId(doctor_id)})
-        calendar = []
+        await col.create_index([("doctor_id", 1), ("status", 1), ("date", 1)])
 
-        async for obj in cursor: 
-            if obj["status"] == "upcoming":
-                calendar.append(obj["date"])
+    @staticmethod
+    def calendar_query(start : str = None, end : str = None) -> dict:
+        # Matches both stored forms until the date migration has run, see app/core/dates.py
+        query = {"status" : "upcoming"}
+        query.update(range_filter(start, end))
+        return query
+
+    @staticmethod
+    async def get_calendar(doctor_id : str, start : str = None, end : str = None):
+        col = Database.db[settings.DB_APPOINTMENTS_COLLECTION]
+        query = AppointmentRepository.calendar_query(start, end)
+        query["doctor_id"] = ObjectId(doctor_id)
+
+        cursor = col.find(query, {"date" : 1, "_id" : 0})
+        return [to_local(obj["date"]) async for obj in cursor]
 
-        return calendar
-        
\ No newline at end of file
+    @staticmethod
+    async def get_calendars(doctor_ids : list, start : str = None, end : str = None) -> dict:
+        col = Database.db[settings.DB_APPOINTMENTS_COLLECTION]
+        query = AppointmentRepository.calendar_query(start, end)
+        query["doctor_id"] = {"$in" : [ObjectId(doctor_id) for doctor_id in doctor_ids]}
+
+        calendars = {}
+        async for obj in col.find(query, {"doctor_id" : 1, "date" : 1, "_id" : 0}):
+            calendars.setdefault(str(obj["doctor_id"]), []).append(to_local(obj["date"]))
+        return calendars
+
+    @staticmethod
+    async def insert_appointment(doctor_id : str , patient_id : str , date : str):
+        # Same document the core service writes for /appointments/create
+        col = Database.db[settings.DB_APPOINTMENTS_COLLECTION]
+        return await col.insert_one({"doctor_id" : ObjectId(doctor_id), "patient_id" : ObjectId(patient_id), "date" : to_storage(date), "status" : "upcoming"})
+
+    @staticmethod
+    async def leave_waitlists(patient_id : str , doctor_id : str) -> None:
+        # The core service's waitlist: once booked with the doctor, the patient leaves the doctor's
+        # queue and the queue of the doctor's specialization
+        doctor = await Database.db[settings.DB_USER_COLLECTION].find_one({"_id" : ObjectId(doctor_id)}, {"specialization" : 1})
+        queues = [{"doctor_id" : ObjectId(doctor_id)}]
+        if doctor and doctor.get("specialization"):
+            queues.append({"specialization" : doctor["specialization"], "doctor_id" : None})
+        await Database.db[settings.DB_WAITLIST_COLLECTION].delete_many({"patient_id" : ObjectId(patient_id), "$or" : queues})
+
+    @staticmethod
+    async def get_user_id_by_email(email : str):
+        col = Database.db[settings.DB_USER_COLLECTION]
+        user = await col.find_one({"email" : email}, {"_id" : 1})
+        if not user:
+            return None
+        return str(user["_id"])
+
+    @staticmethod
+    async def get_doctor_ids(specialization : str) -> list:
+        col = Database.db[settings.DB_USER_COLLECTION]
+        cursor = col.find({"specialization" : specialization}, {"_id" : 1})
+        return [str(obj["_id"]) async for obj in cursor]
+
+    @staticmethod
+    async def get_doctor_ids_by_specialization(specializations : list) -> dict:
+        col = Database.db[settings.DB_USER_COLLECTION]
+        doctors = {}
+        async for obj in col.find({"specialization" : {"$in" : specializations}}, {"_id" : 1, "specialization" : 1}):
+            doctors.setdefault(obj["specialization"], []).append(str(obj["_id"]))
+        return doctors
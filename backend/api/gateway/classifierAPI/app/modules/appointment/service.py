@@ -1,103 +1,356 @@
-from app.modules.appointment.model import AppointmentRequest
+from app.modules.appointment.model import AppointmentRequest, SpecialtyPlannerRequest, BatchPlannerRequest, TriageBookRequest
 from app.modules.appointment.repository import AppointmentRepository
+from app.modules.availability.service import AvailabilityService, free_days, free_masks, free_slot_stream
+from app.modules.availability.schedule import Schedule
+from app.modules.availability.cache import CalendarCache
+from app.modules.prediction.service import PredictionService
+from app.core.config import settings
+from app.core.dates import local_now
 from datetime import datetime , timedelta 
 import math
+import heapq
+import itertools
 from fastapi import HTTPException, Depends
 
 
-def lower_bound(vect : list , x : datetime):
-    l = 0
-    r = len(vect) - 1
-    answer = len(vect)
+def count_free_slots(masks : list) -> int:
+    return sum(free.bit_count() for _, free in masks)
 
-    while l <= r:
-        mid = (l + r) // 2 
+def scan_free_slots(present : datetime, booked : list, schedule : Schedule = None) -> list:
+    return list(free_slot_stream(free_masks(present, booked, schedule), schedule))
 
-        if vect[mid] >= x:
-            answer = mid 
-            r = mid - 1
-        else:
-            l = mid + 1
+def priority_index(prior : str , total : int) -> int:
+    LOW = math.floor(20 / 100 * total)
+    MEDIUM = math.floor(60 / 100 * total)
+    HIGH = math.floor(20 / 100 * total)
+    LOW += total - MEDIUM - HIGH - LOW
 
-    return answer
+    prior_numb = {"Low" : 0 , "Medium" : 1 , "High" : 2}
+    prior_idx = {2 : 0 , 1 : HIGH , 0 : MEDIUM + HIGH}
+    prior_quants = {0 : LOW , 1 : MEDIUM , 2 : HIGH}
 
-def search_for_empty_slot(prior : str , appointments : list):
-    appointments = [datetime.strptime(data , "%Y-%m-%d %H:%M") for data in appointments]
-    appointments = sorted(appointments)
-    
-    present = datetime.now()
-   # present = datetime(year = present.year , month = present.month , day = 23 , hour = 14 , minute= 0)
+    prior_trans = prior_numb[prior]
 
-    present_day_of_the_week = present.isoweekday()
+    while prior_quants[prior_trans] == 0:
+        prior_trans -= 1
+        prior_trans += 3
+        prior_trans %= 3
 
-    present_day_start = datetime(year = present.year , month = present.month , day = present.day , hour = 8 , minute= 0)
-    present_day_final = datetime(year = present.year , month = present.month , day = present.day , hour = 15 , minute= 0)
+    return prior_idx[prior_trans]
 
-    days = [[] for i in range(0 , 8)]
+def search_for_empty_slot(prior : str , booked : list , present : datetime = None , schedule : Schedule = None):
+    present = present or local_now()
+    free_slots = scan_free_slots(present , booked , schedule)
 
-    ptr = lower_bound(appointments , present)
+    if len(free_slots) == 0:
+        return None 
 
-    free_slots = []
+    return datetime.strftime(free_slots[priority_index(prior , len(free_slots))] , "%Y-%m-%d %H:%M")
 
-    while True: 
-        current_time = present_day_start
+def search_across_doctors(prior : str , booked : dict , present : datetime = None , top_k : int = 1 , schedules : dict = None) -> list:
+    # The single-doctor policy applied to the union of every doctor's free slots. Whole days before
+    # the chosen position are skipped by popcount, and only the rest of the per-doctor streams are
+    # heap-merged, as far as the chosen position plus top_k
+    present = present or local_now()
+    schedules = schedules or {}
+    masks = {doctor_id : free_masks(present , days , schedules.get(doctor_id)) for doctor_id , days in booked.items()}
 
-        while current_time.isoweekday() <= 5 and current_time <= present_day_final:
-            if ptr < len(appointments) and current_time == appointments[ptr]:
-                days[current_time.isoweekday()].append(current_time)
-                ptr += 1
-            elif current_time >= present:
-                free_slots.append(current_time)
+    per_day = {}
+    for doctor_masks in masks.values():
+        for day , free in doctor_masks:
+            per_day[day] = per_day.get(day , 0) + free.bit_count()
+    total = sum(per_day.values())
 
-            current_time += timedelta(hours = 1)
+    if total == 0:
+        return []
 
-        present_day_start += timedelta(days = 1)
-        present_day_final += timedelta(days = 1)
+    start = min(priority_index(prior , total) , max(0 , total - top_k))
+    first_day = None
+    for day in sorted(per_day):
+        if start < per_day[day]:
+            first_day = day
+            break
+        start -= per_day[day]
 
-        # print(present_day_start.isoweekday())
-        # print(present_day_final.strftime("%Y-%m-%d %H:%M"))
+    streams = [
+        zip(free_slot_stream([(day , free) for day , free in doctor_masks if day >= first_day] , schedules.get(doctor_id)) , itertools.repeat(doctor_id))
+        for doctor_id , doctor_masks in masks.items()
+    ]
+    return [
+        {"doctor_id" : doctor_id , "date" : datetime.strftime(slot , "%Y-%m-%d %H:%M")}
+        for slot , doctor_id in itertools.islice(heapq.merge(*streams) , start , start + top_k)
+    ]
 
-        if present_day_start.isoweekday() == present_day_of_the_week:
-            break
+PRIORITY_RANK = {"High" : 0 , "Medium" : 1 , "Low" : 2}
+# Where a patient is placed when their own band has no slot left: the next more urgent band
+PRIORITY_FALLBACK = {"High" : ["High"] , "Medium" : ["Medium" , "High"] , "Low" : ["Low" , "Medium" , "High"]}
 
-    if len(free_slots) == 0:
-        return None 
+class BatchPlanner:
+    # Assigns a whole queue at once over a shared in-memory copy of the calendars. Every pool (one
+    # doctor or a specialization) gets the single-patient policy's bands, fixed from the calendars
+    # before anyone is placed: High starts at the earliest slot, Medium at the 20% mark and Low at
+    # the 80% mark of the pool's free slots. Each (pool, band) keeps a heap with one cursor per doctor
+    # on their next free slot inside the band; cursors made stale by another pool are advanced lazily
+    # when they reach the top, so each placement is O(log doctors).
 
-    LOW = math.floor(20 / 100 * len(free_slots))
-    MEDIUM = math.floor(60 / 100 * len(free_slots))
-    HIGH = math.floor(20 / 100 * len(free_slots))
-    LOW += len(free_slots) - MEDIUM - HIGH - LOW
+    def __init__(self, booked : dict , present : datetime , schedules : dict = None):
+        schedules = schedules or {}
+        self.today = datetime(year = present.year , month = present.month , day = present.day)
+        self.slot_minutes = {doctor_id : (schedules.get(doctor_id) or Schedule.default()).slot_minutes for doctor_id in booked}
+        self.free = {doctor_id : free_days(present , days , schedules.get(doctor_id)) for doctor_id , days in booked.items()}
+        self.starts = {}
+        self.heaps = {}
 
-    prior_numb = {"Low" : 0 , "Medium" : 1 , "High" : 2}
-    prior_idx = {2 : 0 , 1 : HIGH , 0 : MEDIUM + HIGH}
-    prior_quants = {0 : LOW , 1 : MEDIUM , 2 : HIGH}
+    def next_free(self, doctor_id : str , offset : int , minute : int):
+        # (day, minute of day) of the doctor's first free slot starting at or after the given one
+        days = self.free[doctor_id]
+        slot_minutes = self.slot_minutes[doctor_id]
+        first = -(-minute // slot_minutes)
+        for day in range(offset , len(days)):
+            mask = days[day] & ~((1 << first) - 1) if day == offset else days[day]
+            if mask:
+                return day , ((mask & -mask).bit_length() - 1) * slot_minutes
+        return None
 
-    prior_trans = prior_numb[prior]
+    def band_start(self, doctor_ids : list , prior : str):
+        # (day, minute of day) of the slot search_across_doctors would pick for this pool and priority
+        per_day = [sum(self.free[doctor_id][day].bit_count() for doctor_id in doctor_ids) for day in range(len(self.free[doctor_ids[0]]))]
+        total = sum(per_day)
+        if total == 0:
+            return None
 
-    while prior_quants[prior_trans] == 0:
-        prior_trans -= 1
-        prior_trans += 3
-        prior_trans %= 3
+        position = priority_index(prior , total)
+        for day , count in enumerate(per_day):
+            if position >= count:
+                position -= count
+                continue
+            minutes = sorted(
+                bit * self.slot_minutes[doctor_id]
+                for doctor_id in doctor_ids
+                for bit in range(self.free[doctor_id][day].bit_length())
+                if (self.free[doctor_id][day] >> bit) & 1
+            )
+            return day , minutes[position]
+        return None
+
+    def prepare(self, pool , doctor_ids : list) -> None:
+        if pool in self.starts:
+            return
+        self.starts[pool] = {prior : self.band_start(doctor_ids , prior) if doctor_ids else None for prior in PRIORITY_RANK}
+
+    def band(self, pool , doctor_ids : list , prior : str) -> list:
+        key = (pool , prior)
+        if key not in self.heaps:
+            start = self.starts[pool][prior]
+            heap = []
+            if start is not None:
+                for doctor_id in doctor_ids:
+                    slot = self.next_free(doctor_id , *start)
+                    if slot:
+                        heap.append((slot , doctor_id))
+            heapq.heapify(heap)
+            self.heaps[key] = heap
+        return self.heaps[key]
 
-    # for i in days:
-    #     print(i)
+    def take(self, pool , doctor_ids : list , prior : str):
+        for band in PRIORITY_FALLBACK[prior]:
+            heap = self.band(pool , doctor_ids , band)
+            while heap:
+                (day , minute) , doctor_id = heap[0]
+                bit = minute // self.slot_minutes[doctor_id]
+                free = (self.free[doctor_id][day] >> bit) & 1
+                if free:
+                    self.free[doctor_id][day] &= ~(1 << bit)
 
-    return datetime.strftime(free_slots[prior_idx[prior_trans]] , "%Y-%m-%d %H:%M")
-    
+                following = self.next_free(doctor_id , day , minute + 1 if free else minute)
+                if following:
+                    heapq.heapreplace(heap , (following , doctor_id))
+                else:
+                    heapq.heappop(heap)
+
+                if free:
+                    return doctor_id , self.today + timedelta(days = day , minutes = minute)
+        return None
+
+    def plan(self, requests : list) -> list:
+        # requests are (pool, doctor_ids, prior) in arrival order; the result is (doctor_id, slot) or None for each
+        for pool , doctor_ids , _ in requests:
+            self.prepare(pool , doctor_ids)
+
+        placed = [None] * len(requests)
+        for index in sorted(range(len(requests)) , key = lambda index : PRIORITY_RANK[requests[index][2]]):
+            pool , doctor_ids , prior = requests[index]
+            if doctor_ids:
+                placed[index] = self.take(pool , doctor_ids , prior)
+        return placed
 
 class AppointmentService:
+    @staticmethod
+    async def find_slot_for_doctor(doctor_id : str , prior : str , present : datetime):
+        schedule , booked = await AvailabilityService.get_booked(doctor_id , present , settings.PLANNER_HORIZON_DAYS)
+        date = search_for_empty_slot(prior , booked , present , schedule)
+
+        if date == None:
+            # Nothing left in the planning horizon: take the first free slot after it, walking
+            # forward a week at a time instead of giving up
+            after = datetime(present.year , present.month , present.day) + timedelta(days = settings.PLANNER_HORIZON_DAYS)
+            slots = AvailabilityService.iter_free_slots(doctor_id , after , settings.PLANNER_MAX_HORIZON_DAYS - settings.PLANNER_HORIZON_DAYS)
+            async for slot in slots:
+                date = datetime.strftime(slot , "%Y-%m-%d %H:%M")
+                break
+            await slots.aclose()
+        return date
+
     @staticmethod
     async def make_appointment(req : AppointmentRequest , user):
+        present = local_now()
         try:
-            appointments = await AppointmentRepository.get_calendar(req.doctor_id)
+            date = await AppointmentService.find_slot_for_doctor(req.doctor_id , req.prior , present)
         except Exception:
             raise HTTPException(500 , "There was a problem fetching medic calendar")
 
-        date = search_for_empty_slot(req.prior , appointments)
-        #print(appointments)
-
         if date == None:
-            raise HTTPException(400 , "Couldn't find suitable date this week")
+            raise HTTPException(400 , f"Couldn't find a free slot in the next {settings.PLANNER_MAX_HORIZON_DAYS} days")
         
         #await AppointmentRepository.insert(date , req.id_med)
-        return {"date" : date}
\ No newline at end of file
+        return {"date" : date}
+
+    @staticmethod
+    async def plan_slot(req : TriageBookRequest , prior : str , present : datetime):
+        # (doctor_id, date) the planners would suggest for this request right now, None when there is no free slot
+        if req.doctor_id is not None:
+            date = await AppointmentService.find_slot_for_doctor(req.doctor_id , prior , present)
+            return (req.doctor_id , date) if date else None
+
+        doctor_ids = await AppointmentRepository.get_doctor_ids(req.specialization)
+        if len(doctor_ids) == 0:
+            raise HTTPException(404 , "No doctors found for this specialization")
+        booked , schedules = await AvailabilityService.get_booked_for_doctors(doctor_ids , present , settings.PLANNER_HORIZON_DAYS)
+        options = search_across_doctors(prior , booked , present , 1 , schedules)
+        return (options[0]["doctor_id"] , options[0]["date"]) if options else None
+
+    @staticmethod
+    async def triage_and_book(req : TriageBookRequest , user):
+        # Prediction, planning and booking in one request. The slot is claimed in the availability
+        # bitmap the core service books through, so when someone else got it between our read of the
+        # calendars and the claim, we re-plan on fresh calendars instead of double-booking
+        if user.get("role") != "patient":
+            raise HTTPException(403 , "Only patients can book an appointment")
+        if (req.doctor_id is None) == (req.specialization is None):
+            raise HTTPException(400 , "Book either with a doctor_id or a specialization")
+
+        prediction = await PredictionService.get_prediction_result(req.model_id , req.questions , req.version)
+        prior = prediction["Status"]
+
+        patient_id = await AppointmentRepository.get_user_id_by_email(user.get("email"))
+        if patient_id is None:
+            raise HTTPException(404 , "Patient not found")
+
+        for _ in range(settings.BOOKING_MAX_ATTEMPTS):
+            present = local_now()
+            try:
+                planned = await AppointmentService.plan_slot(req , prior , present)
+                if planned is None:
+                    raise HTTPException(400 , "Couldn't find a free slot for this request")
+                doctor_id , date = planned
+                claimed = await AvailabilityService.claim(doctor_id , date)
+            except HTTPException:
+                raise
+            except Exception:
+                raise HTTPException(500 , "There was a problem fetching medic calendar")
+
+            # Either our own booking or a stale calendar, the cached one is out of date both ways
+            CalendarCache.invalidate(doctor_id)
+            if not claimed:
+                continue
+
+            try:
+                result = await AppointmentRepository.insert_appointment(doctor_id , patient_id , date)
+            except Exception as e:
+                await AvailabilityService.release(doctor_id , date)
+                raise HTTPException(500 , f"Failed to create appointment : {e}")
+
+            try:
+                await AppointmentRepository.leave_waitlists(patient_id , doctor_id)
+            except Exception as e:
+                print(f"Couldn't take patient {patient_id} off the waitlists of doctor {doctor_id}: {e}")
+
+            return {
+                "appointment_id" : str(result.inserted_id) ,
+                "doctor_id" : doctor_id ,
+                "date" : date ,
+                "prior" : prior ,
+                "version" : prediction["Version"]
+            }
+
+        raise HTTPException(409 , "The planned slots were booked by someone else, try again")
+
+    @staticmethod
+    async def plan_for_specialty(req : SpecialtyPlannerRequest , user):
+        if req.prior not in ("Low" , "Medium" , "High"):
+            raise HTTPException(400 , "Priority must be Low, Medium or High")
+        if not 1 <= req.top_k <= 50:
+            raise HTTPException(400 , "top_k must be between 1 and 50")
+
+        present = local_now()
+        try:
+            doctor_ids = await AppointmentRepository.get_doctor_ids(req.specialization)
+            if len(doctor_ids) == 0:
+                raise HTTPException(404 , "No doctors found for this specialization")
+            booked , schedules = await AvailabilityService.get_booked_for_doctors(doctor_ids , present , settings.PLANNER_HORIZON_DAYS)
+        except HTTPException:
+            raise
+        except Exception:
+            raise HTTPException(500 , "There was a problem fetching medic calendars")
+
+        options = search_across_doctors(req.prior , booked , present , req.top_k , schedules)
+
+        if len(options) == 0:
+            raise HTTPException(400 , f"Couldn't find a free slot in the next {settings.PLANNER_HORIZON_DAYS} days")
+
+        return {"options" : options}
+
+    @staticmethod
+    async def plan_batch(req : BatchPlannerRequest , user):
+        if user.get("role") not in ("admin" , "doctor"):
+            raise HTTPException(403 , "Forbidden access!")
+        if len(req.requests) > settings.PLANNER_MAX_BATCH_SIZE:
+            raise HTTPException(400 , f"A batch holds at most {settings.PLANNER_MAX_BATCH_SIZE} requests")
+        for item in req.requests:
+            if item.prior not in PRIORITY_RANK:
+                raise HTTPException(400 , "Priority must be Low, Medium or High")
+            if (item.doctor_id is None) == (item.specialization is None):
+                raise HTTPException(400 , "Each request needs either a doctor_id or a specialization")
+
+        present = local_now()
+        try:
+            specializations = sorted({item.specialization for item in req.requests if item.specialization is not None})
+            doctors = await AppointmentRepository.get_doctor_ids_by_specialization(specializations)
+            doctor_ids = sorted({item.doctor_id for item in req.requests if item.doctor_id is not None}.union(*doctors.values()))
+            booked , schedules = await AvailabilityService.get_booked_for_doctors(doctor_ids , present , settings.PLANNER_HORIZON_DAYS) if doctor_ids else ({} , {})
+        except Exception:
+            raise HTTPException(500 , "There was a problem fetching medic calendars")
+
+        pools = [
+            (("doctor" , item.doctor_id) , [item.doctor_id]) if item.doctor_id is not None
+            else (("specialization" , item.specialization) , doctors.get(item.specialization , []))
+            for item in req.requests
+        ]
+        placed = BatchPlanner(booked , present , schedules).plan([(pool , doctor_ids , item.prior) for (pool , doctor_ids) , item in zip(pools , req.requests)])
+
+        assignments = []
+        unassigned = []
+        for item , result in zip(req.requests , placed):
+            if result is None:
+                unassigned.append({"patient" : item.patient , "prior" : item.prior})
+            else:
+                assignments.append({"patient" : item.patient , "prior" : item.prior , "doctor_id" : result[0] , "date" : datetime.strftime(result[1] , "%Y-%m-%d %H:%M")})
+
+        return {"assignments" : assignments , "unassigned" : unassigned}
+
+    @staticmethod
+    async def get_planner_stats(current_user : dict):
+        if current_user.get("role") != "admin":
+            raise HTTPException(403, "Forbidden access!")
+
+        return {"calendar_cache" : CalendarCache.get_stats()}
\ No newline at end of file
@@ -0,0 +1,158 @@
+from app.core.config import settings
+from app.core.db import Database
+from collections import OrderedDict
+import asyncio
+import time
+
+class CalendarCache:
+    # doctor_id -> (expires_at, {week : {"d1".."d7" : mask}, "schedule" : Schedule}), in least recently used order
+    entries = OrderedDict()
+    # (doctor_id, weeks) -> future of the fetch in flight, shared by every caller asking for it
+    loading = {}
+    # Bumped on invalidation so a fetch that started before it doesn't store stale weeks
+    generations = {}
+    epoch = 0
+    watcher = None
+    hits = 0
+    misses = 0
+    shared_loads = 0
+    invalidations = 0
+
+    @staticmethod
+    def start() -> None:
+        if settings.CALENDAR_CACHE_SIZE > 0 and settings.CALENDAR_CACHE_WATCH:
+            CalendarCache.watcher = asyncio.create_task(CalendarCache.watch_for_changes())
+
+    @staticmethod
+    async def stop() -> None:
+        if CalendarCache.watcher:
+            CalendarCache.watcher.cancel()
+            try:
+                await CalendarCache.watcher
+            except asyncio.CancelledError:
+                pass
+            CalendarCache.watcher = None
+
+    @staticmethod
+    def lookup(doctor_id : str, weeks : list):
+        cached = CalendarCache.entries.get(doctor_id)
+        if cached is None:
+            return None
+        if cached[0] <= time.monotonic():
+            del CalendarCache.entries[doctor_id]
+            return None
+        if not all(week in cached[1] for week in weeks):
+            return None
+        CalendarCache.entries.move_to_end(doctor_id)
+        return cached[1]
+
+    @staticmethod
+    def store(doctor_id : str, weeks : dict) -> None:
+        cached = CalendarCache.entries.get(doctor_id)
+        merged = dict(cached[1]) if cached and cached[0] > time.monotonic() else {}
+        merged.update(weeks)
+        CalendarCache.entries[doctor_id] = (time.monotonic() + settings.CALENDAR_CACHE_TTL_S, merged)
+        CalendarCache.entries.move_to_end(doctor_id)
+        while len(CalendarCache.entries) > settings.CALENDAR_CACHE_SIZE:
+            CalendarCache.entries.popitem(last=False)
+
+    @staticmethod
+    async def get(doctor_id : str, weeks : list, loader) -> dict:
+        if settings.CALENDAR_CACHE_SIZE <= 0:
+            return await loader(doctor_id, weeks)
+
+        cached = CalendarCache.lookup(doctor_id, weeks)
+        if cached is not None:
+            CalendarCache.hits += 1
+            return cached
+
+        key = (doctor_id, tuple(weeks))
+        pending = CalendarCache.loading.get(key)
+        if pending is not None:
+            CalendarCache.shared_loads += 1
+            return await asyncio.shield(pending)
+
+        CalendarCache.misses += 1
+        generation = (CalendarCache.epoch, CalendarCache.generations.get(doctor_id, 0))
+        pending = asyncio.get_running_loop().create_future()
+        CalendarCache.loading[key] = pending
+        try:
+            loaded = await loader(doctor_id, weeks)
+            if (CalendarCache.epoch, CalendarCache.generations.get(doctor_id, 0)) == generation:
+                CalendarCache.store(doctor_id, loaded)
+            pending.set_result(loaded)
+            return loaded
+        except Exception as e:
+            pending.set_exception(e)
+            # Mark the exception retrieved, waiters (if any) still get it raised
+            pending.exception()
+            raise
+        finally:
+            del CalendarCache.loading[key]
+            if not pending.done():
+                pending.cancel()
+
+    @staticmethod
+    async def get_many(doctor_ids : list, weeks : list, loader) -> dict:
+        # Batched counterpart of get(): cached doctors are served from memory and the rest are
+        # fetched together with one loader call instead of one fetch per doctor
+        found = {}
+        missing = []
+        for doctor_id in doctor_ids:
+            cached = CalendarCache.lookup(doctor_id, weeks) if settings.CALENDAR_CACHE_SIZE > 0 else None
+            if cached is None:
+                missing.append(doctor_id)
+            else:
+                found[doctor_id] = cached
+        CalendarCache.hits += len(found)
+
+        if missing:
+            CalendarCache.misses += len(missing)
+            generations = {doctor_id : (CalendarCache.epoch, CalendarCache.generations.get(doctor_id, 0)) for doctor_id in missing}
+            loaded = await loader(missing, weeks)
+            for doctor_id in missing:
+                found[doctor_id] = loaded[doctor_id]
+                if settings.CALENDAR_CACHE_SIZE > 0 and (CalendarCache.epoch, CalendarCache.generations.get(doctor_id, 0)) == generations[doctor_id]:
+                    CalendarCache.store(doctor_id, loaded[doctor_id])
+
+        return found
+
+    @staticmethod
+    def invalidate(doctor_id : str = None) -> None:
+        CalendarCache.invalidations += 1
+        if doctor_id is None:
+            CalendarCache.entries.clear()
+            CalendarCache.epoch += 1
+            return
+        CalendarCache.entries.pop(doctor_id, None)
+        CalendarCache.generations[doctor_id] = CalendarCache.generations.get(doctor_id, 0) + 1
+
+    @staticmethod
+    async def watch_for_changes() -> None:
+        # Bookings and cancellations happen in the core service; its bitmap updates reach us through
+        # a change stream. Without a replica set there is no stream and entries just live out their TTL.
+        col = Database.db[settings.DB_AVAILABILITY_COLLECTION]
+        while True:
+            try:
+                stream = await col.watch(full_document="updateLookup")
+                async with stream:
+                    async for change in stream:
+                        doctor_id = (change.get("fullDocument") or {}).get("doctor_id")
+                        CalendarCache.invalidate(str(doctor_id) if doctor_id else None)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Calendar change stream unavailable, relying on the {settings.CALENDAR_CACHE_TTL_S}s TTL: {e}")
+                return
+
+    @staticmethod
+    def get_stats() -> dict:
+        lookups = CalendarCache.hits + CalendarCache.misses + CalendarCache.shared_loads
+        return {
+            "size" : len(CalendarCache.entries),
+            "hits" : CalendarCache.hits,
+            "misses" : CalendarCache.misses,
+            "shared_loads" : CalendarCache.shared_loads,
+            "invalidations" : CalendarCache.invalidations,
+            "hit_ratio" : (CalendarCache.hits + CalendarCache.shared_loads) / lookups if lookups else 0.0
+        }
@@ -0,0 +1,78 @@
+from app.core.config import settings
+from app.core.db import Database
+from bson import ObjectId, Int64
+from pymongo.errors import DuplicateKeyError
+
+def version_filter(version : int):
+    # Weeks and schedules written before templates were versioned have no version field, they are version 0
+    return version if version else {"$in" : [0, None]}
+
+class AvailabilityRepository:
+    # Same layout the core service claims slots in: one document per doctor and Monday,
+    # d1..d7 holding a bitmap of the booked slots of each ISO weekday (bit i is the slot
+    # starting i slot lengths after midnight, see schedule.py).
+
+    @staticmethod
+    async def setup() -> None:
+        col = Database.db[settings.DB_AVAILABILITY_COLLECTION]
+        await col.create_index([("doctor_id", 1), ("week", 1)], unique=True)
+
+    @staticmethod
+    async def get_weeks(doctor_id : str, weeks : list) -> dict:
+        col = Database.db[settings.DB_AVAILABILITY_COLLECTION]
+        cursor = col.find({"doctor_id" : ObjectId(doctor_id), "week" : {"$in" : weeks}}, {"_id" : 0, "doctor_id" : 0})
+        return {doc["week"] : doc async for doc in cursor}
+
+    @staticmethod
+    async def get_weeks_for_doctors(doctor_ids : list, weeks : list) -> dict:
+        col = Database.db[settings.DB_AVAILABILITY_COLLECTION]
+        cursor = col.find({"doctor_id" : {"$in" : [ObjectId(doctor_id) for doctor_id in doctor_ids]}, "week" : {"$in" : weeks}}, {"_id" : 0})
+        stored = {}
+        async for doc in cursor:
+            stored.setdefault(str(doc.pop("doctor_id")), {})[doc["week"]] = doc
+        return stored
+
+    @staticmethod
+    async def create_week(doctor_id : str, week : str, days : dict, version : int = 0) -> None:
+        col = Database.db[settings.DB_AVAILABILITY_COLLECTION]
+        try:
+            await col.update_one(
+                {"doctor_id" : ObjectId(doctor_id), "week" : week},
+                {"$setOnInsert" : {**{f"d{day}" : Int64(mask) for day, mask in days.items()}, "version" : version}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            pass
+
+    @staticmethod
+    async def claim_slot(doctor_id : str, week : str, day : int, bit : int, version : int = 0) -> bool:
+        # Only lands on a week laid out by the same schedule version the bit was computed with
+        col = Database.db[settings.DB_AVAILABILITY_COLLECTION]
+        mask = Int64(1 << bit)
+        result = await col.update_one(
+            {"doctor_id" : ObjectId(doctor_id), "week" : week, "version" : version_filter(version), f"d{day}" : {"$bitsAllClear" : mask}},
+            {"$bit" : {f"d{day}" : {"or" : mask}}}
+        )
+        return result.modified_count == 1
+
+    @staticmethod
+    async def release_slot(doctor_id : str, week : str, day : int, bit : int, version : int = 0) -> int:
+        # 0 when the week is laid out by another schedule version, or the bit was already clear
+        col = Database.db[settings.DB_AVAILABILITY_COLLECTION]
+        result = await col.update_one(
+            {"doctor_id" : ObjectId(doctor_id), "week" : week, "version" : version_filter(version)},
+            {"$bit" : {f"d{day}" : {"and" : Int64(~(1 << bit))}}}
+        )
+        return result.modified_count
+
+class ScheduleRepository:
+    @staticmethod
+    async def get_schedule(doctor_id : str):
+        col = Database.db[settings.DB_SCHEDULES_COLLECTION]
+        return await col.find_one({"doctor_id" : ObjectId(doctor_id)}, {"_id" : 0})
+
+    @staticmethod
+    async def get_schedules(doctor_ids : list) -> dict:
+        col = Database.db[settings.DB_SCHEDULES_COLLECTION]
+        cursor = col.find({"doctor_id" : {"$in" : [ObjectId(doctor_id) for doctor_id in doctor_ids]}}, {"_id" : 0})
+        return {str(doc["doctor_id"]) : doc async for doc in cursor}
@@ -0,0 +1,73 @@
+from app.core.config import settings
+from datetime import datetime, timedelta
+
+DAY_MINUTES = 24 * 60
+
+def parse_minutes(value : str) -> int:
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+class Schedule:
+    # A doctor's working-hour template. Slots start at multiples of slot_minutes from midnight and
+    # bit i of a day's bitmap is the slot starting at i * slot_minutes, so a day has to fit in the
+    # 64 bits of the availability documents: slots are at least 30 minutes long.
+    fallback = None
+
+    def __init__(self, slot_minutes : int, hours : dict, holidays : list = None, version : int = 0):
+        if not 30 <= slot_minutes <= DAY_MINUTES or DAY_MINUTES % slot_minutes:
+            raise ValueError("slot_minutes must divide a day and be at least 30")
+
+        self.slot_minutes = slot_minutes
+        # Bumped on every change, availability weeks carry the version whose bit layout they use
+        self.version = version
+        self.hours = {int(day) : [(parse_minutes(start), parse_minutes(end)) for start, end in windows] for day, windows in hours.items()}
+        self.holidays = set(holidays or [])
+        self.weekday_masks = {day : 0 for day in range(1, 8)}
+        for day, windows in self.hours.items():
+            if not 1 <= day <= 7:
+                raise ValueError("Working hours are keyed by ISO weekday, 1 to 7")
+            for start, end in windows:
+                if not 0 <= start < end <= DAY_MINUTES:
+                    raise ValueError("Working hours must be HH:MM ranges within one day")
+                first = -(-start // slot_minutes)
+                last = end // slot_minutes
+                if last > first:
+                    self.weekday_masks[day] |= ((1 << last) - 1) & ~((1 << first) - 1)
+
+    @staticmethod
+    def default() -> "Schedule":
+        # Doctors without a template of their own keep the original grid: hourly slots on working days
+        if Schedule.fallback is None:
+            window = [(f"{settings.SLOT_FIRST_HOUR:02d}:00", f"{settings.SLOT_LAST_HOUR + 1:02d}:00")]
+            Schedule.fallback = Schedule(60, {day : window for day in range(1, settings.SLOT_WORKING_DAYS + 1)})
+        return Schedule.fallback
+
+    @staticmethod
+    def from_doc(doc) -> "Schedule":
+        if not doc:
+            return Schedule.default()
+        return Schedule(doc["slot_minutes"], doc["hours"], doc.get("holidays"), doc.get("version", 0))
+
+    def day_mask(self, day : datetime) -> int:
+        if self.holidays and day.strftime("%Y-%m-%d") in self.holidays:
+            return 0
+        return self.weekday_masks[day.isoweekday()]
+
+    def first_bit(self, present : datetime) -> int:
+        # First slot that hasn't started yet on present's day
+        elapsed = present.hour * 3600 + present.minute * 60 + present.second + present.microsecond / 1e6
+        return int(-(-elapsed // (self.slot_minutes * 60)))
+
+    def slot_time(self, day : datetime, bit : int) -> datetime:
+        return day + timedelta(minutes=bit * self.slot_minutes)
+
+    def position(self, date : datetime):
+        # (week, weekday, bit) of a slot in this template, None for anything off it
+        minutes = date.hour * 60 + date.minute
+        if date.second or date.microsecond or minutes % self.slot_minutes:
+            return None
+        bit = minutes // self.slot_minutes
+        if not (self.day_mask(date) >> bit) & 1:
+            return None
+        week = datetime(date.year, date.month, date.day) - timedelta(days=date.weekday())
+        return week.strftime("%Y-%m-%d"), date.isoweekday(), bit
@@ -0,0 +1,170 @@
+from app.modules.availability.repository import AvailabilityRepository, ScheduleRepository
+from app.modules.availability.schedule import Schedule
+from app.modules.appointment.repository import AppointmentRepository
+from app.modules.availability.cache import CalendarCache
+from app.core.config import settings
+from datetime import datetime, timedelta
+import asyncio
+
+DATE_FORMAT = "%Y-%m-%d %H:%M"
+
+def week_start(date : datetime) -> datetime:
+    return datetime(date.year, date.month, date.day) - timedelta(days=date.weekday())
+
+def bitmaps_from_dates(dates : list, weeks : list, schedule : Schedule) -> dict:
+    built = {week : {day : 0 for day in range(1, 8)} for week in weeks}
+    for date in dates:
+        position = schedule.position(date)
+        if position and position[0] in built:
+            built[position[0]][position[1]] |= 1 << position[2]
+    return built
+
+def date_range(weeks : list):
+    start = datetime.strptime(min(weeks), "%Y-%m-%d")
+    end = datetime.strptime(max(weeks), "%Y-%m-%d") + timedelta(days=7)
+    return start.strftime(DATE_FORMAT), end.strftime(DATE_FORMAT)
+
+def horizon(first_day : datetime, days : int):
+    start = datetime(first_day.year, first_day.month, first_day.day)
+    dates = [start + timedelta(days=offset) for offset in range(days)]
+    return dates, sorted({week_start(date).strftime("%Y-%m-%d") for date in dates})
+
+def booked_days(stored : dict, dates : list) -> list:
+    return [int(stored[week_start(date).strftime("%Y-%m-%d")].get(f"d{date.isoweekday()}", 0)) for date in dates]
+
+def free_days(present : datetime, booked : list, schedule : Schedule = None) -> list:
+    # booked[i] is the booked-slot bitmap of the i-th day from present's day; returns the free-slot
+    # bitmap of each of those days under the schedule, with the slots already started today cleared
+    schedule = schedule or Schedule.default()
+    today = datetime(present.year, present.month, present.day)
+    free = []
+
+    for offset, mask in enumerate(booked):
+        available = schedule.day_mask(today + timedelta(days=offset)) & ~mask
+        if offset == 0:
+            available &= ~((1 << schedule.first_bit(present)) - 1)
+        free.append(available)
+
+    return free
+
+def free_masks(present : datetime, booked : list, schedule : Schedule = None) -> list:
+    # (day, free-slot bitmap) of every day that still has a free slot
+    today = datetime(present.year, present.month, present.day)
+    return [(today + timedelta(days=offset), free) for offset, free in enumerate(free_days(present, booked, schedule)) if free]
+
+def free_slot_stream(masks : list, schedule : Schedule = None):
+    # Free slots in chronological order, lowest clear bit first
+    schedule = schedule or Schedule.default()
+    for day, free in masks:
+        while free:
+            lowest = free & -free
+            yield schedule.slot_time(day, lowest.bit_length() - 1)
+            free ^= lowest
+
+class AvailabilityService:
+    @staticmethod
+    async def build_weeks(doctor_id : str, weeks : list, schedule : Schedule) -> dict:
+        # Seeds the bitmaps of weeks nobody has booked through the core service yet
+        start, end = date_range(weeks)
+        built = bitmaps_from_dates(await AppointmentRepository.get_calendar(doctor_id, start, end), weeks, schedule)
+        for week, days in built.items():
+            await AvailabilityRepository.create_week(doctor_id, week, days, schedule.version)
+        return built
+
+    @staticmethod
+    async def load_weeks(doctor_id : str, weeks : list) -> dict:
+        # The template is cached with the weeks, so it is invalidated along with them
+        schedule = Schedule.from_doc(await ScheduleRepository.get_schedule(doctor_id))
+        stored = await AvailabilityRepository.get_weeks(doctor_id, weeks)
+        missing = [week for week in weeks if week not in stored]
+        if missing:
+            for week, built in (await AvailabilityService.build_weeks(doctor_id, missing, schedule)).items():
+                stored[week] = {f"d{day}" : mask for day, mask in built.items()}
+        stored["schedule"] = schedule
+        return stored
+
+    @staticmethod
+    async def load_weeks_for_doctors(doctor_ids : list, weeks : list) -> dict:
+        # Same as load_weeks for many doctors at once: one query for the templates, one for the
+        # bitmaps and one for the calendars of whichever doctors still have weeks to seed
+        schedules = await ScheduleRepository.get_schedules(doctor_ids)
+        stored = await AvailabilityRepository.get_weeks_for_doctors(doctor_ids, weeks)
+        for doctor_id in doctor_ids:
+            stored.setdefault(doctor_id, {})["schedule"] = Schedule.from_doc(schedules.get(doctor_id))
+
+        incomplete = [doctor_id for doctor_id in doctor_ids if any(week not in stored[doctor_id] for week in weeks)]
+        if not incomplete:
+            return stored
+
+        start, end = date_range(weeks)
+        calendars = await AppointmentRepository.get_calendars(incomplete, start, end)
+        created = []
+        for doctor_id in incomplete:
+            doctor_weeks = stored[doctor_id]
+            missing = [week for week in weeks if week not in doctor_weeks]
+            for week, days in bitmaps_from_dates(calendars.get(doctor_id, []), missing, doctor_weeks["schedule"]).items():
+                doctor_weeks[week] = {f"d{day}" : mask for day, mask in days.items()}
+                created.append(AvailabilityRepository.create_week(doctor_id, week, days, doctor_weeks["schedule"].version))
+        await asyncio.gather(*created)
+        return stored
+
+    @staticmethod
+    async def get_booked(doctor_id : str, first_day : datetime, days : int):
+        # The doctor's schedule and booked-slot bitmaps for `days` consecutive days starting at first_day
+        dates, weeks = horizon(first_day, days)
+        stored = await CalendarCache.get(doctor_id, weeks, AvailabilityService.load_weeks)
+        return stored["schedule"], booked_days(stored, dates)
+
+    @staticmethod
+    async def get_booked_for_doctors(doctor_ids : list, first_day : datetime, days : int):
+        dates, weeks = horizon(first_day, days)
+        stored = await CalendarCache.get_many(doctor_ids, weeks, AvailabilityService.load_weeks_for_doctors)
+        booked = {doctor_id : booked_days(stored[doctor_id], dates) for doctor_id in doctor_ids}
+        schedules = {doctor_id : stored[doctor_id]["schedule"] for doctor_id in doctor_ids}
+        return booked, schedules
+
+    @staticmethod
+    async def iter_free_slots(doctor_id : str, present : datetime, max_days : int):
+        # Free slots from present onward, loading one calendar week at a time and only as far as the
+        # caller keeps iterating
+        day = datetime(present.year, present.month, present.day)
+        end = day + timedelta(days=max_days)
+        while day < end:
+            days = min(7 - day.weekday(), (end - day).days)
+            schedule, booked = await AvailabilityService.get_booked(doctor_id, day, days)
+            for slot in free_slot_stream(free_masks(max(present, day), booked, schedule), schedule):
+                yield slot
+            day += timedelta(days=days)
+
+    @staticmethod
+    async def claim(doctor_id : str, date : str) -> bool:
+        # Same claim as the core service's: False when the slot is taken or not in the doctor's template
+        schedule = Schedule.from_doc(await ScheduleRepository.get_schedule(doctor_id))
+        position = schedule.position(datetime.strptime(date, DATE_FORMAT))
+        if position is None:
+            return False
+
+        week, day, bit = position
+        if await AvailabilityRepository.claim_slot(doctor_id, week, day, bit, schedule.version):
+            return True
+        if await AvailabilityRepository.get_weeks(doctor_id, [week]):
+            return False
+
+        await AvailabilityService.build_weeks(doctor_id, [week], schedule)
+        return await AvailabilityRepository.claim_slot(doctor_id, week, day, bit, schedule.version)
+
+    @staticmethod
+    async def release(doctor_id : str, date : str) -> None:
+        # Retried like the core service's release when the week is laid out by another schedule version
+        for _ in range(settings.RELEASE_MAX_ATTEMPTS):
+            schedule = Schedule.from_doc(await ScheduleRepository.get_schedule(doctor_id))
+            position = schedule.position(datetime.strptime(date, DATE_FORMAT))
+            if position is None or await AvailabilityRepository.release_slot(doctor_id, *position, schedule.version):
+                return
+
+            doc = (await AvailabilityRepository.get_weeks(doctor_id, [position[0]])).get(position[0])
+            if doc is None or (doc.get("version") or 0) == schedule.version:
+                return
+            if (doc.get("version") or 0) < schedule.version:
+                await asyncio.sleep(settings.RELEASE_RETRY_PAUSE_S)
+        print(f"Couldn't release {date} for doctor {doctor_id}, its week kept being rebuilt")
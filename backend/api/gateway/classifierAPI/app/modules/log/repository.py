@@ -1,27 +1,145 @@
 from app.core.db import Database
 from app.core.config import settings
-from app.modules.log.model import LogEntry
+from app.modules.log.model import LogEntry, parse_timestamp
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime, timedelta, timezone
+import re
 
 class LogRepository: 
     @staticmethod
     async def insert_log(entry : LogEntry , current_user : dict):
         col = Database.db[settings.DB_LOGS_COLLECTION]
-        result = await col.insert_one({
+        timestamp = parse_timestamp(entry.timestamp)
+        doc = {
             "type" : entry.type ,
-            "timestamp" : entry.timestamp ,
+            "timestamp" : timestamp or datetime.now() ,
             "activity" : entry.activity , 
             "user" : entry.user
-        })
+        }
+        if timestamp is None:
+            # Unreadable client timestamps are kept aside, the log is filed under the time it was received
+            doc["client_timestamp"] = entry.timestamp
+        result = await col.insert_one(doc)
     
         return result.inserted_id
 
-    async def get_logs():
+    @staticmethod
+    async def insert_logs(docs : list):
+        col = Database.db[settings.DB_LOGS_COLLECTION]
+        await col.insert_many(docs, ordered=False)
+
+    @staticmethod
+    async def setup() -> None:
+        # Newest first is the only order served; each filter gets an index that already yields it
+        col = Database.db[settings.DB_LOGS_COLLECTION]
+        await col.create_index([("timestamp", -1), ("_id", -1)])
+        await col.create_index([("user", 1), ("timestamp", -1), ("_id", -1)])
+        await col.create_index([("type", 1), ("timestamp", -1), ("_id", -1)])
+        await col.create_index([("activity", 1), ("timestamp", -1)])
+
+    @staticmethod
+    def log_query(start = None, end = None, user : str = None, type : str = None, path : str = None, after : tuple = None) -> dict:
+        # Only datetime timestamps: a string one, left until TimestampMigration reaches it, sorts apart
+        # from them and can't be compared with a cursor, so it would be served out of order or never again
+        query = {"timestamp" : {"$type" : "date"}}
+        if start:
+            query["timestamp"]["$gte"] = start
+        if end:
+            query["timestamp"]["$lt"] = end
+        if user is not None:
+            query["user"] = user
+        if type is not None:
+            query["type"] = type
+        if path:
+            query["activity"] = {"$regex" : "^" + re.escape(path)}
+        if after:
+            # Keyset pagination: everything strictly older than the last (timestamp, _id) served
+            timestamp, log_id = after
+            query["$or"] = [
+                {"timestamp" : {"$lt" : timestamp}},
+                {"timestamp" : timestamp, "_id" : {"$lt" : log_id}}
+            ]
+        return query
+
+    @staticmethod
+    def find_logs(query : dict, limit : int = 0):
+        col = Database.db[settings.DB_LOGS_COLLECTION]
+        return col.find(query, batch_size=settings.LOG_STREAM_BATCH_SIZE).sort([("timestamp", -1), ("_id", -1)]).limit(limit)
+
+    @staticmethod
+    async def get_oldest_timestamp(after = None):
         col = Database.db[settings.DB_LOGS_COLLECTION]
-        res = []
+        # Strings sort before every date, and are TimestampMigration's to convert rather than archive
+        query = {"timestamp" : {"$type" : "date"}}
+        if after:
+            query["timestamp"]["$gte"] = after
+        doc = await col.find_one(query, {"timestamp" : 1}, sort=[("timestamp", 1)])
+        return doc["timestamp"] if doc else None
 
-        async for log in col.find():
-            modified_log = log 
-            modified_log.pop("_id")
-            res.append(modified_log)
+    @staticmethod
+    async def delete_logs(query : dict) -> None:
+        col = Database.db[settings.DB_LOGS_COLLECTION]
+        await col.delete_many(query)
+
+    @staticmethod
+    async def acquire_lease(name : str, owner : str, seconds : float) -> bool:
+        # Taken or renewed by one process at a time, across workers and services; a holder that dies
+        # without releasing it loses it once it expires
+        col = Database.db[settings.DB_LOCKS_COLLECTION]
+        now = datetime.now(timezone.utc)
+        try:
+            await col.update_one(
+                {"_id" : name, "$or" : [{"owner" : owner}, {"expires" : {"$lt" : now}}]},
+                {"$set" : {"owner" : owner, "expires" : now + timedelta(seconds=seconds)}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    @staticmethod
+    async def release_lease(name : str, owner : str) -> None:
+        col = Database.db[settings.DB_LOCKS_COLLECTION]
+        await col.delete_one({"_id" : name, "owner" : owner})
 
-        return res
\ No newline at end of file
+class RollupRepository:
+    # Request counts per (granularity, bucket, route, status class, role), where bucket is the start
+    # of the minute or hour. Every flushed batch of request logs is folded in with $inc upserts, so a
+    # chart over a day reads at most 1440 documents per series instead of the day's logs.
+
+    @staticmethod
+    async def setup() -> None:
+        col = Database.db[settings.DB_LOG_ROLLUPS_COLLECTION]
+        await col.create_index([("granularity", 1), ("bucket", 1), ("route", 1), ("status_class", 1), ("role", 1)], unique=True)
+        await col.create_index(
+            "bucket",
+            expireAfterSeconds=settings.LOG_ROLLUP_MINUTE_TTL_DAYS * 86400,
+            partialFilterExpression={"granularity" : "minute"},
+            name="minute_rollup_ttl"
+        )
+
+    @staticmethod
+    async def add_counts(counts : dict) -> None:
+        col = Database.db[settings.DB_LOG_ROLLUPS_COLLECTION]
+        updates = [
+            UpdateOne(
+                {"granularity" : granularity, "bucket" : bucket, "route" : route, "status_class" : status_class, "role" : role},
+                {"$inc" : {"count" : count}},
+                upsert=True
+            )
+            for (granularity, bucket, route, status_class, role), count in counts.items()
+        ]
+        if updates:
+            await col.bulk_write(updates, ordered=False)
+
+    @staticmethod
+    async def get_rollups(granularity : str, start, end, route : str = None, role : str = None):
+        col = Database.db[settings.DB_LOG_ROLLUPS_COLLECTION]
+        query = {"granularity" : granularity, "bucket" : {"$gte" : start, "$lt" : end}}
+        if route is not None:
+            query["route"] = route
+        if role is not None:
+            query["role"] = role
+        cursor = col.find(query, {"_id" : 0, "granularity" : 0}).sort("bucket", 1)
+        return await cursor.to_list(length=None)
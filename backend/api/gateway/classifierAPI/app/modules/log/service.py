@@ -1,18 +1,164 @@
 from app.core.config import settings
 from fastapi import HTTPException, Depends
-#from app.modules.log.repository import LogRepository
+from fastapi.responses import StreamingResponse
 from app.modules.log.model import LogEntry
-from app.modules.log.repository import LogRepository
+from app.modules.log.repository import LogRepository, RollupRepository
+from app.modules.log.writer import LogWriter
+from app.modules.log.archive import LogArchive, log_key
+from datetime import datetime, timedelta
+from bson import ObjectId
+import base64
+import json
+
+def encode_cursor(doc : dict) -> str:
+    timestamp = doc["timestamp"]
+    timestamp = timestamp.isoformat() if isinstance(timestamp, datetime) else str(timestamp)
+    return base64.urlsafe_b64encode(f"{timestamp}|{doc['_id']}".encode()).decode()
+
+def decode_cursor(value : str):
+    try:
+        timestamp, log_id = base64.urlsafe_b64decode(value.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), ObjectId(log_id)
+    except Exception:
+        raise HTTPException(400, "Invalid cursor")
+
+def serialize_log(doc : dict) -> dict:
+    doc.pop("_id", None)
+    if isinstance(doc.get("timestamp"), datetime):
+        doc["timestamp"] = doc["timestamp"].isoformat()
+    return doc
+
+async def stream_logs(cursor):
+    lines = []
+    async for doc in cursor:
+        lines.append(json.dumps(serialize_log(doc), default=str))
+        if len(lines) == settings.LOG_STREAM_BATCH_SIZE:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+def log_matcher(start = None, end = None, user : str = None, type : str = None, path : str = None, after : tuple = None):
+    # LogRepository.log_query for documents read back from the archives
+    def matches(doc : dict) -> bool:
+        timestamp = doc["timestamp"]
+        if (start and timestamp < start) or (end and timestamp >= end):
+            return False
+        if (user is not None and doc.get("user") != user) or (type is not None and doc.get("type") != type):
+            return False
+        if path and not doc.get("activity", "").startswith(path):
+            return False
+        return not after or (timestamp, doc["_id"]) < after
+    return matches
+
+async def next_log(logs):
+    try:
+        return await logs.__anext__()
+    except StopAsyncIteration:
+        return None
+
+async def merge_logs(recent, archived, newest : datetime):
+    # Logs newer than everything archived come straight from MongoDB and the archives aren't opened
+    # for them. Past that point, logs that reached MongoDB late can be older than archived ones, so
+    # both sources are merged on (timestamp, _id)
+    doc = await next_log(recent)
+    while doc is not None and doc["timestamp"] > newest:
+        yield doc
+        doc = await next_log(recent)
+
+    other = await next_log(archived)
+    while doc is not None or other is not None:
+        if other is None or (doc is not None and log_key(doc) > log_key(other)):
+            yield doc
+            doc = await next_log(recent)
+        else:
+            yield other
+            other = await next_log(archived)
+
+async def iter_logs(query : dict, matches, limit : int, start = None, end = None, after : tuple = None):
+    # MongoDB holds the recent logs and the archives everything past retention
+    before = after[0] if after else None
+    logs = LogRepository.find_logs(query, limit).__aiter__()
+    newest = LogArchive.newest(start, end, before)
+    if newest is not None:
+        logs = merge_logs(logs, LogArchive.iter_logs(matches, start, end, before), newest)
+
+    served = 0
+    async for doc in logs:
+        yield doc
+        served += 1
+        if limit and served >= limit:
+            return
+
+ROLLUP_STEPS = {"minute" : timedelta(minutes=1), "hour" : timedelta(hours=1)}
+
+def local_naive(value : datetime) -> datetime:
+    # Request logs carry the server's naive local time
+    return value.astimezone().replace(tzinfo=None) if value.tzinfo else value
 
 class LogService:
     @staticmethod
-    async def fetch_logs(current_user : dict):
+    async def fetch_logs(current_user : dict, start = None, end = None, user : str = None, type : str = None,
+                         path : str = None, after : str = None, limit : int = None, format : str = "json"):
         if current_user["role"] != "admin":
              raise HTTPException(403, "Forbidden access!")
-        
-        return await LogRepository.get_logs()
+        if format not in ("json", "ndjson"):
+            raise HTTPException(400, "Format must be json or ndjson")
+
+        start = local_naive(start) if start else None
+        end = local_naive(end) if end else None
+        path = path.lstrip("/") if path else None
+        after = decode_cursor(after) if after else None
+        query = LogRepository.log_query(start, end, user, type, path, after)
+        matches = log_matcher(start, end, user, type, path, after)
+
+        if format == "ndjson":
+            # Documents go out as the cursor yields them, a driver batch at a time, whatever the result size
+            return StreamingResponse(stream_logs(iter_logs(query, matches, limit or 0, start, end, after)), media_type="application/x-ndjson")
+
+        limit = limit or settings.LOG_PAGE_SIZE
+        if not 1 <= limit <= settings.LOG_MAX_PAGE_SIZE:
+            raise HTTPException(400, f"Limit must be between 1 and {settings.LOG_MAX_PAGE_SIZE}")
+
+        docs = [doc async for doc in iter_logs(query, matches, limit + 1, start, end, after)]
+        next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+        return {"logs" : [serialize_log(doc) for doc in docs[:limit]], "next" : next_cursor}
+
+    @staticmethod
+    async def fetch_rollups(current_user : dict, granularity : str = "minute", start = None, end = None,
+                            route : str = None, role : str = None, group_by : str = None):
+        # Chart series from the pre-aggregated rollups: one point per bucket, or per bucket and route/role
+        if current_user["role"] != "admin":
+             raise HTTPException(403, "Forbidden access!")
+        if granularity not in ROLLUP_STEPS:
+            raise HTTPException(400, "Granularity must be minute or hour")
+        if group_by not in (None, "route", "role"):
+            raise HTTPException(400, "Group by must be route or role")
+
+        step = ROLLUP_STEPS[granularity]
+        end = local_naive(end) if end else datetime.now()
+        start = local_naive(start) if start else end - step * 60
+        start = start.replace(second=0, microsecond=0)
+        if granularity == "hour":
+            start = start.replace(minute=0)
+        if not start < end or (end - start) / step > settings.LOG_ROLLUP_MAX_BUCKETS:
+            raise HTTPException(400, f"The range must cover between 1 and {settings.LOG_ROLLUP_MAX_BUCKETS} buckets")
+
+        points = {}
+        for doc in await RollupRepository.get_rollups(granularity, start, end, route, role):
+            group = doc[group_by] if group_by else None
+            point = points.get((doc["bucket"], group))
+            if point is None:
+                point = points[(doc["bucket"], group)] = {"bucket" : doc["bucket"].isoformat(), "total" : 0, "status" : {}}
+                if group_by:
+                    point[group_by] = group
+            point["total"] += doc["count"]
+            point["status"][doc["status_class"]] = point["status"].get(doc["status_class"], 0) + doc["count"]
+
+        for point in points.values():
+            point["error_rate"] = point["status"].get("5xx", 0) / point["total"]
+        return {"granularity" : granularity, "points" : list(points.values())}
 
-    
     @staticmethod
     async def insert_log(entry : LogEntry , current_user : dict):
         try:
@@ -20,3 +166,16 @@ class LogService:
             return {"success" : 1}
         except Exception:
              raise HTTPException(500, "There was a problem at the registration process")
+
+    @staticmethod
+    async def queue_log(entry : LogEntry):
+        # Request logs from the middleware, written in the background by LogWriter
+        await LogWriter.submit({
+            "type" : entry.type ,
+            "timestamp" : entry.timestamp ,
+            "activity" : entry.activity ,
+            "user" : entry.user ,
+            "route" : entry.route ,
+            "status" : entry.status ,
+            "role" : entry.role
+        })
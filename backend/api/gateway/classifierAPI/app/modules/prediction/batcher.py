@@ -0,0 +1,139 @@
+from app.core.config import settings
+from app.modules.prediction.executor import InferenceExecutor
+from app.core.metrics import Metrics
+from collections import deque
+import numpy as np
+import asyncio
+import time
+
+INFERENCE_DURATION = Metrics.histogram("inference_duration_seconds", "Time to run a batch through a model", ("model",))
+INFERENCE_QUEUE_WAIT = Metrics.histogram("inference_queue_wait_seconds", "Time a request waited to join a batch", ("model",))
+INFERENCE_BATCH_SIZE = Metrics.histogram("inference_batch_size", "Rows per batch sent to a model", ("model",), (1, 2, 4, 8, 16, 32, 64, 128))
+
+class BatchStats:
+    def __init__(self, window : int):
+        self.requests = 0
+        self.batches = 0
+        self.max_batch_size = 0
+        self.batch_sizes = deque(maxlen = window)
+        self.queue_waits = deque(maxlen = window)
+
+    def record(self, batch_size : int, waits : list):
+        self.requests += batch_size
+        self.batches += 1
+        self.max_batch_size = max(self.max_batch_size, batch_size)
+        self.batch_sizes.append(batch_size)
+        self.queue_waits.extend(waits)
+
+    def snapshot(self) -> dict:
+        waits = np.fromiter(self.queue_waits, dtype=np.float64) * 1000
+        sizes = np.fromiter(self.batch_sizes, dtype=np.float64)
+
+        return {
+            "requests" : self.requests,
+            "batches" : self.batches,
+            "avg_batch_size" : float(sizes.mean()) if sizes.size else 0.0,
+            "max_batch_size" : self.max_batch_size,
+            "queue_wait_ms" : {
+                "p50" : float(np.percentile(waits, 50)) if waits.size else 0.0,
+                "p99" : float(np.percentile(waits, 99)) if waits.size else 0.0,
+                "max" : float(waits.max()) if waits.size else 0.0
+            }
+        }
+
+class ModelBatcher:
+    def __init__(self, model_id : str, max_batch_size : int, max_wait : float):
+        self.model_id = model_id
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.pending = []
+        self.timer = None
+        self.tasks = set()
+        self.stats = BatchStats(settings.INFERENCE_STATS_WINDOW)
+
+    def submit(self, model, source : tuple, features : list) -> asyncio.Future:
+        InferenceExecutor.check_capacity(len(self.pending))
+
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((model, source, features, future, time.perf_counter()))
+
+        if len(self.pending) >= self.max_batch_size:
+            self.flush()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(self.max_wait, self.flush)
+
+        return future
+
+    def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+        batch = self.pending[: self.max_batch_size]
+        self.pending = self.pending[self.max_batch_size :]
+
+        if self.pending:
+            self.timer = asyncio.get_running_loop().call_soon(self.flush)
+
+        if not batch:
+            return
+
+        now = time.perf_counter()
+        waits = [now - enqueued_at for *_, enqueued_at in batch]
+        self.stats.record(len(batch), waits)
+        labels = (self.model_id,)
+        for wait in waits:
+            INFERENCE_QUEUE_WAIT.observe(labels, wait)
+
+        # Requests are grouped by model object and row width so that a hot-swapped
+        # model or a malformed form only fails its own group
+        groups = {}
+        for model, source, features, future, _ in batch:
+            groups.setdefault((id(model), len(features)), []).append((model, source, features, future))
+
+        for group in groups.values():
+            task = asyncio.create_task(self.run_group(group))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def run_group(self, group : list):
+        model, source = group[0][0], group[0][1]
+        try:
+            matrix = np.asarray([features for _, _, features, _ in group], dtype=np.float64)
+            started = time.perf_counter()
+            result = await InferenceExecutor.run(self.model_id, model, source, matrix)
+            INFERENCE_DURATION.observe((self.model_id,), time.perf_counter() - started)
+            INFERENCE_BATCH_SIZE.observe((self.model_id,), len(group))
+            result = result.tolist()
+        except Exception as e:
+            for *_, future in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (*_, future), prediction in zip(group, result):
+            if not future.done():
+                future.set_result(prediction)
+
+class InferenceEngine:
+    batchers = {}
+
+    @staticmethod
+    def get_batcher(model_id : str) -> ModelBatcher:
+        batcher = InferenceEngine.batchers.get(model_id)
+        if batcher is None:
+            batcher = ModelBatcher(
+                model_id,
+                settings.INFERENCE_MAX_BATCH_SIZE,
+                settings.INFERENCE_MAX_WAIT_MS / 1000
+            )
+            InferenceEngine.batchers[model_id] = batcher
+        return batcher
+
+    @staticmethod
+    async def predict(model_id : str, model, features : list, source : tuple = None):
+        return await InferenceEngine.get_batcher(model_id).submit(model, source, features)
+
+    @staticmethod
+    def get_stats() -> dict:
+        return {model_id : batcher.stats.snapshot() for model_id, batcher in InferenceEngine.batchers.items()}
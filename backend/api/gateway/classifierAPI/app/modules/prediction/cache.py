@@ -0,0 +1,124 @@
+from app.core.config import settings
+from app.core.db import Database
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import hashlib
+import time
+
+class MongoCacheBackend:
+    @staticmethod
+    async def setup() -> None:
+        col = Database.db[settings.DB_PREDICTION_CACHE_COLLECTION]
+        await col.create_index("expires_at", expireAfterSeconds=0)
+
+    @staticmethod
+    async def get(key : str):
+        col = Database.db[settings.DB_PREDICTION_CACHE_COLLECTION]
+        doc = await col.find_one({"_id" : key, "expires_at" : {"$gt" : datetime.now(timezone.utc)}})
+        return doc["value"] if doc else None
+
+    @staticmethod
+    async def set(key : str, value, ttl : float) -> None:
+        col = Database.db[settings.DB_PREDICTION_CACHE_COLLECTION]
+        await col.update_one(
+            {"_id" : key},
+            {"$set" : {"value" : value, "expires_at" : datetime.now(timezone.utc) + timedelta(seconds=ttl)}},
+            upsert=True
+        )
+
+CACHE_BACKENDS = {
+    "mongo" : MongoCacheBackend
+}
+
+class PredictionCache:
+    # key -> (expires_at, model_id, value), in least recently used order
+    entries = OrderedDict()
+    backend = None
+    hits = 0
+    shared_hits = 0
+    misses = 0
+    evictions = 0
+
+    @staticmethod
+    async def start() -> None:
+        PredictionCache.backend = CACHE_BACKENDS.get(settings.PREDICTION_CACHE_BACKEND)
+        if PredictionCache.backend:
+            await PredictionCache.backend.setup()
+
+    @staticmethod
+    def make_key(model_id : str, version : str, checksum : str, features : list) -> str:
+        # Adding 0.0 folds -0.0 into 0.0 so equal forms hash equally. The checksum is hashed along
+        # with the version, so a retrained file redeployed under the same version misses the shared cache
+        vector = np.asarray(features, dtype=np.float64) + 0.0
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{model_id}\0{version}\0{checksum}\0".encode())
+        digest.update(vector.tobytes())
+        return digest.hexdigest()
+
+    @staticmethod
+    def store_local(key : str, model_id : str, value) -> None:
+        PredictionCache.entries[key] = (time.monotonic() + settings.PREDICTION_CACHE_TTL_S, model_id, value)
+        PredictionCache.entries.move_to_end(key)
+        while len(PredictionCache.entries) > settings.PREDICTION_CACHE_SIZE:
+            PredictionCache.entries.popitem(last=False)
+            PredictionCache.evictions += 1
+
+    @staticmethod
+    async def get(key : str, model_id : str):
+        if settings.PREDICTION_CACHE_SIZE <= 0:
+            return None
+
+        cached = PredictionCache.entries.get(key)
+        if cached is not None:
+            if cached[0] > time.monotonic():
+                PredictionCache.entries.move_to_end(key)
+                PredictionCache.hits += 1
+                return cached[2]
+            del PredictionCache.entries[key]
+
+        if PredictionCache.backend:
+            try:
+                value = await PredictionCache.backend.get(key)
+            except Exception as e:
+                print(f"Prediction cache backend read failed: {e}")
+                value = None
+            if value is not None:
+                PredictionCache.shared_hits += 1
+                PredictionCache.store_local(key, model_id, value)
+                return value
+
+        PredictionCache.misses += 1
+        return None
+
+    @staticmethod
+    async def set(key : str, model_id : str, value) -> None:
+        if settings.PREDICTION_CACHE_SIZE <= 0:
+            return
+
+        PredictionCache.store_local(key, model_id, value)
+
+        if PredictionCache.backend:
+            try:
+                await PredictionCache.backend.set(key, value, settings.PREDICTION_CACHE_TTL_S)
+            except Exception as e:
+                print(f"Prediction cache backend write failed: {e}")
+
+    @staticmethod
+    def invalidate(model_id : str) -> None:
+        # Shared entries carry the model version in their key, so they just stop matching and expire
+        stale = [key for key, (_, cached_model_id, _) in PredictionCache.entries.items() if cached_model_id == model_id]
+        for key in stale:
+            del PredictionCache.entries[key]
+
+    @staticmethod
+    def get_stats() -> dict:
+        lookups = PredictionCache.hits + PredictionCache.shared_hits + PredictionCache.misses
+        return {
+            "size" : len(PredictionCache.entries),
+            "hits" : PredictionCache.hits,
+            "shared_hits" : PredictionCache.shared_hits,
+            "misses" : PredictionCache.misses,
+            "evictions" : PredictionCache.evictions,
+            "hit_ratio" : (PredictionCache.hits + PredictionCache.shared_hits) / lookups if lookups else 0.0
+        }
@@ -0,0 +1,73 @@
+from app.core.config import settings
+from app.models.prediction_models import load_model_file
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import numpy as np
+import asyncio
+
+class InferenceQueueFull(Exception):
+    pass
+
+# Models loaded inside process pool workers, keyed by (path, checksum) so a
+# retrained file on disk is picked up without restarting the pool
+_worker_models = {}
+
+def _process_predict(model_path : str, checksum : str, matrix : np.ndarray) -> np.ndarray:
+    model = _worker_models.get((model_path, checksum))
+    if model is None:
+        model, _ = load_model_file(model_path, checksum)
+        _worker_models[(model_path, checksum)] = model
+    return model.predict(matrix)
+
+def _thread_predict(model, matrix : np.ndarray) -> np.ndarray:
+    return model.predict(matrix)
+
+class InferenceExecutor:
+    thread_pool = None
+    process_pool = None
+    semaphore = None
+    waiting = 0
+
+    @staticmethod
+    def start() -> None:
+        InferenceExecutor.thread_pool = ThreadPoolExecutor(
+            max_workers=settings.INFERENCE_THREAD_WORKERS,
+            thread_name_prefix="inference"
+        )
+        if "process" in settings.INFERENCE_EXECUTOR_MODES.values() or settings.INFERENCE_DEFAULT_EXECUTOR == "process":
+            InferenceExecutor.process_pool = ProcessPoolExecutor(max_workers=settings.INFERENCE_PROCESS_WORKERS)
+        InferenceExecutor.semaphore = asyncio.Semaphore(settings.INFERENCE_MAX_CONCURRENCY)
+
+    @staticmethod
+    def shutdown() -> None:
+        if InferenceExecutor.thread_pool:
+            InferenceExecutor.thread_pool.shutdown(wait=True)
+            InferenceExecutor.thread_pool = None
+        if InferenceExecutor.process_pool:
+            InferenceExecutor.process_pool.shutdown(wait=True)
+            InferenceExecutor.process_pool = None
+        InferenceExecutor.semaphore = None
+
+    @staticmethod
+    def get_mode(model_id : str) -> str:
+        return settings.INFERENCE_EXECUTOR_MODES.get(model_id, settings.INFERENCE_DEFAULT_EXECUTOR)
+
+    @staticmethod
+    def check_capacity(pending : int) -> None:
+        if InferenceExecutor.waiting + pending >= settings.INFERENCE_MAX_QUEUE_DEPTH:
+            raise InferenceQueueFull("Inference queue is full")
+
+    @staticmethod
+    async def run(model_id : str, model, source : tuple, matrix : np.ndarray) -> np.ndarray:
+        # Without a started pool (scripts, benchmarks) inference runs inline
+        if InferenceExecutor.semaphore is None:
+            return model.predict(matrix)
+
+        loop = asyncio.get_running_loop()
+        InferenceExecutor.waiting += len(matrix)
+        try:
+            async with InferenceExecutor.semaphore:
+                if InferenceExecutor.get_mode(model_id) == "process" and InferenceExecutor.process_pool and source:
+                    return await loop.run_in_executor(InferenceExecutor.process_pool, _process_predict, *source, matrix)
+                return await loop.run_in_executor(InferenceExecutor.thread_pool, _thread_predict, model, matrix)
+        finally:
+            InferenceExecutor.waiting -= len(matrix)
@@ -1,5 +1,9 @@
 from pydantic import BaseModel
-from typing import List, Union
+from typing import Dict, List, Optional, Union
 
 class FormResponse(BaseModel):
-    questions : List[Union[float,str]]
\ No newline at end of file
+    questions : List[Union[float,str]]
+
+class ScreeningRequest(BaseModel):
+    answers : Dict[str, Union[float,str]]
+    models : Optional[List[str]] = None
@@ -1,28 +1,132 @@
 from app.models.prediction_models import PredictionModels
+from app.modules.prediction.batcher import InferenceEngine
+from app.modules.prediction.executor import InferenceQueueFull
+from app.modules.prediction.cache import PredictionCache
 from fastapi import HTTPException
+import asyncio
+
+def normalize_feature_name(name : str) -> str:
+    return "_".join(str(name).lower().replace("-", " ").split())
+
+def risk_level(numerical_prediction) -> str:
+    if numerical_prediction <= 0.333:
+        return "Low"
+    elif numerical_prediction > 0.666:
+        return "High"
+    return "Medium"
 
 class PredictionService:
     @staticmethod
-    async def get_prediction_result(model_id, features):
-        model = PredictionModels.loaded_models.get(model_id)
-        if model is None:
+    async def get_prediction_result(model_id, features, version = None):
+        try:
+            entry = await PredictionModels.get_model(model_id, version)
+        except Exception as e:
+            raise HTTPException(500, f"Failed to load model : {e}")
+
+        if entry is None:
             raise HTTPException(404, "Model not found!")
 
+        # Held locally so an eviction while this request awaits can't pull the model away
+        model = entry.model
+
         try:
-            parsed_features = [float(num) for num in features]
-            result = model.predict([parsed_features])
+            parsed_features = model.pipeline.encode([features])[0]
+        except ValueError as e:
+            raise HTTPException(400, f"Invalid form : {e}")
+
+        numerical_prediction = await PredictionService.score(model_id, entry, model, parsed_features)
+        return {"Status" : risk_level(numerical_prediction), "Version" : entry.version}
+
+    @staticmethod
+    async def score(model_id : str, entry, model, parsed_features):
+        try:
+            cache_key = PredictionCache.make_key(model_id, entry.version, entry.checksum, parsed_features)
+            numerical_prediction = await PredictionCache.get(cache_key, model_id)
+            if numerical_prediction is None:
+                numerical_prediction = await InferenceEngine.predict(
+                    model_id, model, parsed_features, (entry.path, entry.checksum)
+                )
+                await PredictionCache.set(cache_key, model_id, numerical_prediction)
+        except InferenceQueueFull:
+            raise HTTPException(503, "Inference queue is full, try again later")
         except Exception as e:
             raise HTTPException(500, f"Prediction failed : {e}")
-        
-        numerical_prediction = result.tolist()[0]
-
-        predicted_status = None
-
-        if numerical_prediction <= 0.333:
-            predicted_status = "Low"
-        elif numerical_prediction > 0.666:
-            predicted_status = "High"
-        else:
-            predicted_status = "Medium"
-        return {"Status" : predicted_status}
+
+        return numerical_prediction
+
+    @staticmethod
+    async def screen(answers : dict, model_ids : list = None):
+        answers = {normalize_feature_name(name) : value for name, value in answers.items()}
+        model_ids = model_ids or list(PredictionModels.latest.keys())
+
+        results = {}
+        skipped = {}
+        jobs = []
+
+        # Each model is taken off its entry as soon as it is loaded: loading the others can evict
+        # entries that were already returned, the local reference keeps the model usable
+        async def get_model(model_id : str):
+            entry = await PredictionModels.get_model(model_id)
+            return entry, entry.model if entry else None
+
+        entries = await asyncio.gather(
+            *[get_model(model_id) for model_id in model_ids],
+            return_exceptions=True
+        )
+
+        for model_id, loaded in zip(model_ids, entries):
+            if isinstance(loaded, Exception):
+                skipped[model_id] = f"Failed to load model : {loaded}"
+                continue
+            entry, model = loaded
+            if entry is None:
+                skipped[model_id] = "Model not found"
+                continue
+            if not model.pipeline.named:
+                skipped[model_id] = "Model has no feature schema, retrain it to match answers by name"
+                continue
+
+            columns = [normalize_feature_name(column) for column in model.pipeline.columns]
+            missing = [column for column, name in zip(model.pipeline.columns, columns) if name not in answers]
+            if missing:
+                skipped[model_id] = f"Missing answers : {', '.join(missing)}"
+                continue
+
+            try:
+                parsed_features = model.pipeline.encode([[answers[name] for name in columns]])[0]
+            except ValueError as e:
+                skipped[model_id] = f"Invalid form : {e}"
+                continue
+
+            jobs.append((model_id, entry, model, parsed_features))
+
+        # Every applicable model is scored concurrently, each through its own batcher
+        predictions = await asyncio.gather(
+            *[PredictionService.score(*job) for job in jobs],
+            return_exceptions=True
+        )
+
+        for (model_id, entry, _, _), prediction in zip(jobs, predictions):
+            if isinstance(prediction, HTTPException):
+                skipped[model_id] = prediction.detail
+            elif isinstance(prediction, Exception):
+                skipped[model_id] = f"Prediction failed : {prediction}"
+            else:
+                results[model_id] = {"Status" : risk_level(prediction), "Version" : entry.version}
+
+        return {"results" : results, "skipped" : skipped}
+
+    @staticmethod
+    async def get_inference_stats(current_user : dict):
+        if current_user.get("role") != "admin":
+            raise HTTPException(403, "Forbidden access!")
+
+        return {"batching" : InferenceEngine.get_stats(), "cache" : PredictionCache.get_stats()}
+
+    @staticmethod
+    async def get_models(current_user : dict):
+        if current_user.get("role") != "admin":
+            raise HTTPException(403, "Forbidden access!")
+
+        return {"models" : PredictionModels.list_models()}
        
\ No newline at end of file
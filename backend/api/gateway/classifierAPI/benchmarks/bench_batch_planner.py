@@ -0,0 +1,90 @@
+# Planning a whole triage queue: one /planner-style decision per patient in arrival order vs.
+# BatchPlanner assigning the queue in one pass.
+#
+# Run from backend/api/gateway/classifierAPI:
+#   python -m benchmarks.bench_batch_planner --requests 1000 5000 --doctors 300 --specializations 6
+#
+# The sequential baseline re-plans against the calendars after every booking, which is what
+# repeated /planner + /appointments/create calls amount to. Reports wall time and, per priority,
+# how long patients wait for their slot and how many could not be placed.
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime
+
+from app.core.config import settings
+from app.modules.appointment.service import BatchPlanner, search_across_doctors
+
+PRIORITIES = ["High", "Medium", "Low"]
+
+def synthetic_queue(requests : int, doctors : int, specializations : int, occupancy : float, seed : int):
+    rng = random.Random(seed)
+    hours = range(settings.SLOT_FIRST_HOUR, settings.SLOT_LAST_HOUR + 1)
+    booked = {
+        f"{doctor:024x}" : [sum(1 << hour for hour in hours if rng.random() < occupancy) for _ in range(7)]
+        for doctor in range(doctors)
+    }
+    doctor_ids = sorted(booked)
+    by_specialization = {f"s{index}" : doctor_ids[index::specializations] for index in range(specializations)}
+
+    queue = []
+    for _ in range(requests):
+        prior = rng.choices(PRIORITIES, weights=[2, 5, 3])[0]
+        if rng.random() < 0.2:
+            doctor_id = rng.choice(doctor_ids)
+            queue.append((("doctor", doctor_id), [doctor_id], prior))
+        else:
+            specialization = rng.choice(sorted(by_specialization))
+            queue.append((("specialization", specialization), by_specialization[specialization], prior))
+    return booked, queue
+
+def plan_sequentially(booked : dict, queue : list, present : datetime) -> list:
+    booked = {doctor_id : list(days) for doctor_id, days in booked.items()}
+    today = datetime(present.year, present.month, present.day)
+    placed = []
+    for _, doctor_ids, prior in queue:
+        options = search_across_doctors(prior, {doctor_id : booked[doctor_id] for doctor_id in doctor_ids}, present)
+        if not options:
+            placed.append(None)
+            continue
+        slot = datetime.strptime(options[0]["date"], "%Y-%m-%d %H:%M")
+        booked[options[0]["doctor_id"]][(slot - today).days] |= 1 << slot.hour
+        placed.append((options[0]["doctor_id"], slot))
+    return placed
+
+def report(label : str, queue : list, placed : list, present : datetime, elapsed : float) -> None:
+    print(f"{label}: {elapsed * 1000:.1f} ms")
+    for prior in PRIORITIES:
+        waits = [(result[1] - present).total_seconds() / 3600 for (_, _, p), result in zip(queue, placed) if p == prior and result]
+        missing = sum(1 for (_, _, p), result in zip(queue, placed) if p == prior and result is None)
+        median = statistics.median(waits) if waits else float("nan")
+        print(f"  {prior:<7} placed {len(waits):>5}  unplaced {missing:>5}  median wait {median:>6.1f} h")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--doctors", type=int, default=300)
+    parser.add_argument("--specializations", type=int, default=6)
+    parser.add_argument("--occupancy", type=float, default=0.5)
+    parser.add_argument("--skip-sequential", action="store_true")
+    args = parser.parse_args()
+
+    present = datetime.now()
+    for requests in args.requests:
+        booked, queue = synthetic_queue(requests, args.doctors, args.specializations, args.occupancy, requests)
+        print(f"--- {requests} requests, {args.doctors} doctors")
+
+        started = time.perf_counter()
+        placed = BatchPlanner(booked, present).plan(queue)
+        report("batch", queue, placed, present, time.perf_counter() - started)
+        slots = [result for result in placed if result]
+        assert len(slots) == len(set(slots)), "a slot was assigned twice"
+
+        if not args.skip_sequential:
+            started = time.perf_counter()
+            placed = plan_sequentially(booked, queue, present)
+            report("sequential", queue, placed, present, time.perf_counter() - started)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# Event-loop lag and throughput of prediction with and without the inference pool.
+#
+# Run from backend/api/gateway/classifierAPI (the usual .env must be present):
+#   python -m benchmarks.bench_inference_pool --model app/models/tyoid_cancer_risk.joblib --slow-ms 5
+#
+# --slow-ms wraps predict with a blocking sleep to stand in for a heavier model.
+import argparse
+import asyncio
+import statistics
+import time
+import joblib
+import numpy as np
+
+from app.modules.prediction.batcher import InferenceEngine
+from app.modules.prediction.executor import InferenceExecutor
+
+class SlowModel:
+    def __init__(self, model, delay : float):
+        self.model = model
+        self.delay = delay
+
+    def predict(self, matrix):
+        time.sleep(self.delay)
+        return self.model.predict(matrix)
+
+async def measure_lag(stop : asyncio.Event, lags : list, interval : float = 0.001):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+async def run(model, features : list, requests : int, concurrency : int, pooled : bool) -> dict:
+    InferenceEngine.batchers = {}
+    if pooled:
+        InferenceExecutor.start()
+
+    async def inline_predict():
+        return model.predict(np.asarray([features], dtype=np.float64)).tolist()[0]
+
+    async def client(count : int):
+        for _ in range(count):
+            if pooled:
+                await InferenceEngine.predict("bench", model, features)
+            else:
+                await inline_predict()
+
+    stop = asyncio.Event()
+    lags = []
+    lag_task = asyncio.create_task(measure_lag(stop, lags))
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client(requests // concurrency) for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await lag_task
+    if pooled:
+        InferenceExecutor.shutdown()
+
+    lags_ms = sorted(lag * 1000 for lag in lags) or [0.0]
+    return {
+        "mode" : "pool" if pooled else "inline",
+        "throughput" : requests / elapsed,
+        "lag_p50_ms" : statistics.median(lags_ms),
+        "lag_p99_ms" : lags_ms[int(0.99 * (len(lags_ms) - 1))],
+        "lag_max_ms" : lags_ms[-1]
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="app/models/tyoid_cancer_risk.joblib")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--slow-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    features = [1.0] * model.n_features_in_
+    if args.slow_ms:
+        model = SlowModel(model, args.slow_ms / 1000)
+
+    print(f"{'mode':<8}{'req/s':>12}{'lag p50 ms':>14}{'lag p99 ms':>14}{'lag max ms':>14}")
+    for pooled in (False, True):
+        row = asyncio.run(run(model, features, args.requests, args.concurrency, pooled))
+        print(f"{row['mode']:<8}{row['throughput']:>12.0f}{row['lag_p50_ms']:>14.3f}{row['lag_p99_ms']:>14.3f}{row['lag_max_ms']:>14.3f}")
+
+if __name__ == "__main__":
+    main()
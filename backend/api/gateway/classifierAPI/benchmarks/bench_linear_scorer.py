@@ -0,0 +1,78 @@
+# Compares the joblib/sklearn path with the exported NumPy LinearScorer:
+# load time, single-row predict latency and batch throughput.
+#
+# Run from backend/api/gateway/classifierAPI after `python -m app.models.export_linear`:
+#   python -m benchmarks.bench_linear_scorer
+import argparse
+import glob
+import os
+import subprocess
+import sys
+import time
+import joblib
+import numpy as np
+
+from app.models.linear import LinearScorer
+
+def best_of(fn, repeat : int, number : int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+def cold_start(code : str) -> float:
+    # A fresh interpreter shows the startup cost that matters: importing sklearn to unpickle
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], check=True)
+    return time.perf_counter() - start
+
+def bench(joblib_path : str, batch : int) -> None:
+    npz_path = os.path.splitext(joblib_path)[0] + ".npz"
+    if not os.path.exists(npz_path):
+        print(f"{os.path.basename(joblib_path)}: no exported .npz, skipping")
+        return
+
+    cold_sklearn = cold_start(f"import joblib; joblib.load({joblib_path!r})")
+    cold_numpy = cold_start(f"from app.models.linear import LinearScorer; LinearScorer.load({npz_path!r})")
+    load_sklearn = best_of(lambda: joblib.load(joblib_path), 5, 20)
+    load_numpy = best_of(lambda: LinearScorer.load(npz_path), 5, 20)
+
+    sklearn_model = joblib.load(joblib_path)
+    numpy_model = LinearScorer.load(npz_path)
+
+    rng = np.random.default_rng(0)
+    row = rng.normal(size=(1, numpy_model.n_features_in_))
+    rows = rng.normal(size=(batch, numpy_model.n_features_in_))
+
+    if not (sklearn_model.predict(rows) == numpy_model.predict(rows)).all():
+        print(f"{os.path.basename(joblib_path)}: predictions differ!")
+
+    single_sklearn = best_of(lambda: sklearn_model.predict(row), 5, 2000)
+    single_numpy = best_of(lambda: numpy_model.predict(row), 5, 2000)
+    batch_sklearn = best_of(lambda: sklearn_model.predict(rows), 5, 50)
+    batch_numpy = best_of(lambda: numpy_model.predict(rows), 5, 50)
+
+    print(os.path.basename(joblib_path))
+    print(f"  {'':<22}{'sklearn':>12}{'numpy':>12}{'speedup':>10}")
+    for label, a, b, scale, unit in (
+        ("cold start", cold_sklearn, cold_numpy, 1e3, "ms"),
+        ("warm load", load_sklearn, load_numpy, 1e3, "ms"),
+        ("predict 1 row", single_sklearn, single_numpy, 1e6, "us"),
+        (f"predict {batch} rows", batch_sklearn, batch_numpy, 1e6, "us"),
+    ):
+        print(f"  {label + ' (' + unit + ')':<22}{a * scale:>12.2f}{b * scale:>12.2f}{a / b:>9.1f}x")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", nargs="*")
+    parser.add_argument("--batch", type=int, default=1024)
+    args = parser.parse_args()
+
+    for path in args.paths or sorted(glob.glob("app/models/*.joblib")):
+        bench(path, args.batch)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# Latency of scoring one patient against every model: N sequential /get-results calls
+# (what the frontend does today) vs. one /screening call.
+#
+# Run from backend/api/gateway/classifierAPI:
+#   python -m benchmarks.bench_screening --rtt-ms 20
+#
+# Calls go straight to PredictionService; --rtt-ms adds the network round trip each
+# HTTP call would pay so the two patterns can be compared end to end.
+#
+# Models without a feature schema (no .features.json and no sklearn feature names, like the
+# shipped tyoid_cancer_risk) are left out of both patterns, since /screening skips them.
+import argparse
+import asyncio
+import glob
+import os
+import statistics
+import time
+
+from app.core.config import settings
+from app.models.prediction_models import PredictionModels, ModelEntry, load_model_file, model_checksum, resolve_model_path
+from app.modules.prediction.cache import PredictionCache
+from app.modules.prediction.service import PredictionService
+
+def register_models() -> dict:
+    answers = {}
+    for path in sorted(glob.glob("app/models/*.joblib")):
+        path = resolve_model_path(os.path.abspath(path))
+        checksum = model_checksum(path)
+        entry = ModelEntry(os.path.splitext(os.path.basename(path))[0], checksum[:12], path, checksum)
+        entry.model, entry.size_bytes = load_model_file(path, checksum)
+        if not entry.model.pipeline.named:
+            print(f"Skipping {entry.model_id}: no feature schema, /screening can't score it")
+            continue
+        entry.state = "ready"
+        PredictionModels.publish(entry)
+        PredictionModels.resident[(entry.model_id, entry.version)] = entry
+        for column in entry.model.pipeline.columns:
+            answers.setdefault(column, 1.0)
+    return answers
+
+async def sequential(answers : dict, rtt : float) -> None:
+    for model_id, version in PredictionModels.latest.items():
+        model = PredictionModels.entries[(model_id, version)].model
+        await asyncio.sleep(rtt)
+        await PredictionService.get_prediction_result(model_id, [answers[column] for column in model.pipeline.columns])
+
+async def screening(answers : dict, rtt : float) -> None:
+    await asyncio.sleep(rtt)
+    await PredictionService.screen(answers)
+
+async def measure(fn, answers : dict, rtt : float, repeat : int) -> list:
+    timings = []
+    for _ in range(repeat):
+        PredictionCache.entries.clear()
+        start = time.perf_counter()
+        await fn(answers, rtt)
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)
+
+async def main(args):
+    answers = register_models()
+    print(f"{len(PredictionModels.latest)} models, rtt {args.rtt_ms} ms, batch window {settings.INFERENCE_MAX_WAIT_MS} ms")
+    print(f"{'pattern':<22}{'p50 ms':>10}{'p99 ms':>10}")
+    for label, fn in ((f"{len(PredictionModels.latest)} x /get-results", sequential), ("1 x /screening", screening)):
+        timings = await measure(fn, answers, args.rtt_ms / 1000, args.repeat)
+        print(f"{label:<22}{statistics.median(timings):>10.2f}{timings[int(0.99 * (len(timings) - 1))]:>10.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rtt-ms", type=float, default=20.0)
+    parser.add_argument("--repeat", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,60 @@
+# Planning latency across a whole specialty: materializing every doctor's free slots and sorting
+# them vs. the popcount + heap merge in search_across_doctors.
+#
+# Run from backend/api/gateway/classifierAPI:
+#   python -m benchmarks.bench_specialty_planner --doctors 100 300 1000 --occupancy 0.7
+#
+# Calendars are random week bitmaps held in memory, so this measures the planner itself; the
+# batched MongoDB load is one query regardless of the number of doctors.
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime
+
+from app.core.config import settings
+from app.modules.appointment.service import priority_index, scan_free_slots, search_across_doctors
+
+def random_calendars(doctors : int, occupancy : float, seed : int) -> dict:
+    rng = random.Random(seed)
+    hours = range(settings.SLOT_FIRST_HOUR, settings.SLOT_LAST_HOUR + 1)
+    return {
+        f"{doctor:024x}" : [sum(1 << hour for hour in hours if rng.random() < occupancy) for _ in range(7)]
+        for doctor in range(doctors)
+    }
+
+def sort_everything(prior : str, booked : dict, present : datetime, top_k : int) -> list:
+    slots = sorted((slot, doctor_id) for doctor_id, days in booked.items() for slot in scan_free_slots(present, days))
+    if not slots:
+        return []
+    start = min(priority_index(prior, len(slots)), max(0, len(slots) - top_k))
+    return [{"doctor_id" : doctor_id, "date" : slot.strftime("%Y-%m-%d %H:%M")} for slot, doctor_id in slots[start:start + top_k]]
+
+def measure(function, repeat : int, *args) -> list:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(*args)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--doctors", type=int, nargs="+", default=[100, 300, 1000])
+    parser.add_argument("--occupancy", type=float, default=0.7)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    present = datetime.now()
+    print(f"{'doctors':>8}{'priority':>10}{'sort p50 ms':>14}{'merge p50 ms':>14}{'speedup':>10}")
+    for doctors in args.doctors:
+        booked = random_calendars(doctors, args.occupancy, doctors)
+        for prior in ("High", "Medium", "Low"):
+            assert sort_everything(prior, booked, present, args.top_k) == search_across_doctors(prior, booked, present, args.top_k)
+            baseline = statistics.median(measure(sort_everything, args.repeat, prior, booked, present, args.top_k))
+            merged = statistics.median(measure(search_across_doctors, args.repeat, prior, booked, present, args.top_k))
+            print(f"{doctors:>8}{prior:>10}{baseline:>14.2f}{merged:>14.2f}{baseline / merged:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# Per-worker memory with private model copies vs. the shared memory-mapped store.
+#
+# Run from backend/api/gateway/classifierAPI:
+#   python -m benchmarks.report_shared_memory --workers 4 --synthetic-mb 200
+#
+# Each worker loads every model in app/models (plus an optional synthetic linear model large
+# enough to make the difference visible) and reports RSS, PSS and private memory from
+# /proc/self/smaps_rollup. PSS splits shared pages between the processes mapping them, so
+# its sum over workers is the real footprint of the deployment.
+import argparse
+import glob
+import multiprocessing
+import os
+import tempfile
+import numpy as np
+
+def read_memory() -> dict:
+    memory = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:", "Private_Clean:", "Private_Dirty:"):
+                memory[parts[0][:-1]] = int(parts[1]) / 1024
+    return {
+        "rss" : memory["Rss"],
+        "pss" : memory["Pss"],
+        "private" : memory["Private_Clean"] + memory["Private_Dirty"]
+    }
+
+def worker(paths : list, shared_dir : str, barrier, results):
+    os.environ["MODEL_SHARED_DIR"] = shared_dir
+    from app.models.prediction_models import load_model_file, model_checksum
+
+    before = read_memory()
+    models = []
+    for path in paths:
+        model, _ = load_model_file(path, model_checksum(path))
+        # Touch the weights the way scoring does so mapped pages are actually resident
+        models.append(float(np.asarray(model.model.coef_).sum()))
+    barrier.wait()
+    after = read_memory()
+    results.append((before, after))
+    barrier.wait()
+
+def run(paths : list, workers : int, shared_dir : str) -> list:
+    context = multiprocessing.get_context("spawn")
+    manager = context.Manager()
+    results = manager.list()
+    barrier = context.Barrier(workers)
+
+    processes = [context.Process(target=worker, args=(paths, shared_dir, barrier, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    return list(results)
+
+def print_report(label : str, results : list) -> None:
+    print(label)
+    print(f"  {'worker':<8}{'rss before':>12}{'rss after':>12}{'pss after':>12}{'private after':>15}  (MB)")
+    for i, (before, after) in enumerate(results):
+        print(f"  {i:<8}{before['rss']:>12.1f}{after['rss']:>12.1f}{after['pss']:>12.1f}{after['private']:>15.1f}")
+    print(f"  {'total':<8}{'':>12}{sum(a['rss'] for _, a in results):>12.1f}{sum(a['pss'] for _, a in results):>12.1f}{sum(a['private'] for _, a in results):>15.1f}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--synthetic-mb", type=float, default=0.0)
+    args = parser.parse_args()
+
+    from app.models.linear import LinearScorer
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = sorted(glob.glob("app/models/*.npz")) or sorted(glob.glob("app/models/*.joblib"))
+        if args.synthetic_mb:
+            n_features = 1024
+            n_classes = max(1, int(args.synthetic_mb * 1024 * 1024 / 8 / n_features))
+            synthetic = LinearScorer(
+                np.random.default_rng(0).normal(size=(n_classes, n_features)),
+                np.zeros(n_classes),
+                np.arange(n_classes)
+            )
+            synthetic_path = os.path.join(tmp, "synthetic.npz")
+            synthetic.save(synthetic_path)
+            paths.append(synthetic_path)
+
+        print_report("private copies", run(paths, args.workers, ""))
+        print_report("shared store", run(paths, args.workers, os.path.join(tmp, "shared")))
+
+if __name__ == "__main__":
+    main()
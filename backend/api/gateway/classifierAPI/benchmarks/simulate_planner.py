@@ -0,0 +1,334 @@
+# Discrete-event simulation of the scheduling policy: a stream of patient arrivals is replayed
+# against an in-memory calendar store and every arrival is planned with one of the planners, as the
+# gateway would at that moment. Reports planner throughput and latency (overall and per simulated day,
+# as the calendars fill), slot utilization and per-priority wait-time distributions.
+#
+# Run from backend/api/gateway/classifierAPI:
+#   python -m benchmarks.simulate_planner --policy single specialty batch --days 14 --rate 12
+#   python -m benchmarks.simulate_planner --trace arrivals.jsonl --policy specialty --json run.json
+#
+# Synthetic arrivals are a Poisson process of --rate patients per hour with a High/Medium/Low mix of
+# --mix; --doctor-share of them ask for one doctor, the rest for a specialization. A recorded trace
+# is JSON lines of {"time": "%Y-%m-%d %H:%M", "prior": ..., "specialization": ..., "doctor_id": ...},
+# doctor_id optional; a specialization's doctors are the ones seen with it in the trace.
+#
+# Policies:
+#   single     search_for_empty_slot on one doctor (a random one of the specialization if none is asked for)
+#   specialty  search_across_doctors over the whole pool
+#   batch      arrivals are queued and planned together with BatchPlanner every --batch-window minutes
+# New planners plug in through POLICIES: a policy takes the simulation and a list of arrivals and
+# returns a (doctor_id, slot) or None for each.
+import argparse
+import heapq
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from app.core.config import settings
+from app.modules.appointment.service import BatchPlanner, search_across_doctors, search_for_empty_slot
+from app.modules.availability.schedule import Schedule
+
+PRIORITIES = ["High", "Medium", "Low"]
+DATE_FORMAT = "%Y-%m-%d %H:%M"
+
+class MemoryCalendar:
+    # Booked-slot bitmaps per doctor and day, the in-memory counterpart of the availability collection
+    def __init__(self, schedules : dict):
+        self.schedules = schedules
+        self.booked = {doctor_id : {} for doctor_id in schedules}
+
+    def window(self, doctor_id : str, present : datetime, days : int) -> list:
+        today = datetime(present.year, present.month, present.day)
+        doctor = self.booked[doctor_id]
+        return [doctor.get(today + timedelta(days=offset), 0) for offset in range(days)]
+
+    def locate(self, doctor_id : str, slot : datetime):
+        day = datetime(slot.year, slot.month, slot.day)
+        return day, (slot.hour * 60 + slot.minute) // self.schedules[doctor_id].slot_minutes
+
+    def book(self, doctor_id : str, slot : datetime) -> None:
+        day, bit = self.locate(doctor_id, slot)
+        mask = self.booked[doctor_id].get(day, 0)
+        if (mask >> bit) & 1:
+            raise AssertionError(f"{doctor_id} was booked twice at {slot}")
+        self.booked[doctor_id][day] = mask | 1 << bit
+
+    def release(self, doctor_id : str, slot : datetime) -> None:
+        day, bit = self.locate(doctor_id, slot)
+        self.booked[doctor_id][day] &= ~(1 << bit)
+
+    def prefill(self, start : datetime, days : int, occupancy : float, rng : random.Random) -> None:
+        for doctor_id, schedule in self.schedules.items():
+            for offset in range(days):
+                day = start + timedelta(days=offset)
+                available = schedule.day_mask(day)
+                mask = sum(1 << bit for bit in range(available.bit_length()) if (available >> bit) & 1 and rng.random() < occupancy)
+                if mask:
+                    self.booked[doctor_id][day] = mask
+
+    def utilization(self, start : datetime, days : int) -> float:
+        # Booked share of the working slots of [start, start + days)
+        booked = capacity = 0
+        for doctor_id, schedule in self.schedules.items():
+            for offset in range(days):
+                day = start + timedelta(days=offset)
+                available = schedule.day_mask(day)
+                capacity += available.bit_count()
+                booked += (self.booked[doctor_id].get(day, 0) & available).bit_count()
+        return booked / capacity if capacity else 0.0
+
+class Simulation:
+    def __init__(self, calendar : MemoryCalendar, pools : dict, horizon : int, rng : random.Random):
+        self.calendar = calendar
+        self.pools = pools
+        self.horizon = horizon
+        self.rng = rng
+        self.now = None
+
+    def pool(self, arrival : dict) -> list:
+        if arrival.get("doctor_id"):
+            return [arrival["doctor_id"]]
+        return self.pools.get(arrival.get("specialization"), [])
+
+def plan_single(sim : Simulation, arrivals : list) -> list:
+    placed = []
+    for arrival in arrivals:
+        doctor_ids = sim.pool(arrival)
+        if not doctor_ids:
+            placed.append(None)
+            continue
+        doctor_id = doctor_ids[0] if len(doctor_ids) == 1 else sim.rng.choice(doctor_ids)
+        schedule = sim.calendar.schedules[doctor_id]
+        date = search_for_empty_slot(arrival["prior"], sim.calendar.window(doctor_id, sim.now, sim.horizon), sim.now, schedule)
+        placed.append((doctor_id, datetime.strptime(date, DATE_FORMAT)) if date else None)
+    return placed
+
+def plan_specialty(sim : Simulation, arrivals : list) -> list:
+    placed = []
+    for arrival in arrivals:
+        doctor_ids = sim.pool(arrival)
+        booked = {doctor_id : sim.calendar.window(doctor_id, sim.now, sim.horizon) for doctor_id in doctor_ids}
+        options = search_across_doctors(arrival["prior"], booked, sim.now, 1, sim.calendar.schedules) if booked else []
+        placed.append((options[0]["doctor_id"], datetime.strptime(options[0]["date"], DATE_FORMAT)) if options else None)
+    return placed
+
+def plan_batch(sim : Simulation, arrivals : list) -> list:
+    requests = []
+    doctors = set()
+    for arrival in arrivals:
+        doctor_ids = sim.pool(arrival)
+        pool = ("doctor", arrival["doctor_id"]) if arrival.get("doctor_id") else ("specialization", arrival.get("specialization"))
+        requests.append((pool, doctor_ids, arrival["prior"]))
+        doctors.update(doctor_ids)
+
+    booked = {doctor_id : sim.calendar.window(doctor_id, sim.now, sim.horizon) for doctor_id in doctors}
+    schedules = {doctor_id : sim.calendar.schedules[doctor_id] for doctor_id in doctors}
+    return BatchPlanner(booked, sim.now, schedules).plan(requests)
+
+POLICIES = {"single" : plan_single, "specialty" : plan_specialty, "batch" : plan_batch}
+
+def synthetic_population(doctors : int, specializations : int, half_hour_share : float, rng : random.Random):
+    # Same working hours as the default template, cut into 30-minute slots for a share of the doctors
+    default = Schedule.default()
+    window = [[f"{settings.SLOT_FIRST_HOUR:02d}:00", f"{settings.SLOT_LAST_HOUR + 1:02d}:00"]]
+    half_hour = Schedule(30, {day : window for day in range(1, settings.SLOT_WORKING_DAYS + 1)})
+    schedules = {f"{doctor:024x}" : half_hour if rng.random() < half_hour_share else default for doctor in range(doctors)}
+    doctor_ids = sorted(schedules)
+    pools = {f"s{index}" : doctor_ids[index::specializations] for index in range(specializations)}
+    return schedules, pools
+
+def synthetic_arrivals(start : datetime, days : int, rate : float, mix : list, doctor_share : float, pools : dict, rng : random.Random) -> list:
+    arrivals = []
+    end = start + timedelta(days=days)
+    now = start + timedelta(hours=rng.expovariate(rate))
+    specializations = sorted(pools)
+    while now < end:
+        specialization = rng.choice(specializations)
+        arrival = {"time" : now, "prior" : rng.choices(PRIORITIES, weights=mix)[0], "specialization" : specialization}
+        if rng.random() < doctor_share:
+            arrival["doctor_id"] = rng.choice(pools[specialization])
+        arrivals.append(arrival)
+        now += timedelta(hours=rng.expovariate(rate))
+    return arrivals
+
+def recorded_arrivals(path : str):
+    arrivals = []
+    pools = {}
+    with open(path) as trace:
+        for line in trace:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            arrival = {"time" : datetime.strptime(record["time"], DATE_FORMAT), "prior" : record["prior"], "specialization" : record.get("specialization"), "doctor_id" : record.get("doctor_id")}
+            if arrival["doctor_id"]:
+                doctor_ids = pools.setdefault(arrival["specialization"], [])
+                if arrival["doctor_id"] not in doctor_ids:
+                    doctor_ids.append(arrival["doctor_id"])
+            arrivals.append(arrival)
+    arrivals.sort(key=lambda arrival : arrival["time"])
+    doctors = {doctor_id for doctor_ids in pools.values() for doctor_id in doctor_ids}
+    doctors.update(arrival["doctor_id"] for arrival in arrivals if arrival["doctor_id"])
+    return arrivals, {doctor_id : Schedule.default() for doctor_id in sorted(doctors)}, pools
+
+def simulate(policy : str, arrivals : list, schedules : dict, pools : dict, args, start : datetime) -> dict:
+    rng = random.Random(args.seed)
+    calendar = MemoryCalendar(schedules)
+    calendar.prefill(start, args.days + args.horizon, args.occupancy, rng)
+    sim = Simulation(calendar, pools, args.horizon, rng)
+    plan = POLICIES[policy]
+
+    # Events are (time, sequence, kind, payload); the sequence keeps simultaneous events in insertion order
+    events = []
+    sequence = 0
+    for arrival in arrivals:
+        events.append((arrival["time"], sequence, "arrival", arrival))
+        sequence += 1
+    if policy == "batch":
+        flush = start + timedelta(minutes=args.batch_window)
+        last = arrivals[-1]["time"] if arrivals else start
+        while flush <= last + timedelta(minutes=args.batch_window):
+            events.append((flush, sequence, "flush", None))
+            sequence += 1
+            flush += timedelta(minutes=args.batch_window)
+    heapq.heapify(events)
+
+    queue = []
+    outcomes = []
+    latencies = []
+    daily = {}
+    cancelled = 0
+
+    def decide(batch : list) -> None:
+        nonlocal sequence
+        started = time.perf_counter()
+        placed = plan(sim, batch)
+        elapsed = time.perf_counter() - started
+        latencies.append((elapsed, len(batch)))
+        day = daily.setdefault((sim.now - start).days, {"latencies" : [], "requests" : 0, "fill" : calendar.utilization(datetime(sim.now.year, sim.now.month, sim.now.day), args.horizon)})
+        day["latencies"].append(elapsed / len(batch))
+        day["requests"] += len(batch)
+
+        for arrival, result in zip(batch, placed):
+            outcomes.append((arrival, result))
+            if result is None:
+                continue
+            calendar.book(*result)
+            if rng.random() < args.cancel_rate:
+                # The appointment is cancelled somewhere between now and its slot, freeing it again
+                at = sim.now + (result[1] - sim.now) * rng.random()
+                heapq.heappush(events, (at, sequence, "cancel", result))
+                sequence += 1
+
+    while events:
+        sim.now, _, kind, payload = heapq.heappop(events)
+        if kind == "arrival":
+            if policy == "batch":
+                queue.append(payload)
+            else:
+                decide([payload])
+        elif kind == "flush" and queue:
+            batch, queue = queue, []
+            decide(batch)
+        elif kind == "cancel":
+            calendar.release(*payload)
+            cancelled += 1
+
+    return summarize(policy, outcomes, latencies, daily, cancelled, calendar, start, args.days)
+
+def percentile(values : list, share : float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+def summarize(policy : str, outcomes : list, latencies : list, daily : dict, cancelled : int, calendar : MemoryCalendar, start : datetime, days : int) -> dict:
+    # Latency of a batch is spread over its requests, so the percentiles are per planning decision
+    per_request = [elapsed / count for elapsed, count in latencies for _ in range(count)]
+    total = sum(elapsed for elapsed, _ in latencies)
+
+    waits = {}
+    for prior in PRIORITIES:
+        hours = [(result[1] - arrival["time"]).total_seconds() / 3600 for arrival, result in outcomes if arrival["prior"] == prior and result]
+        waits[prior] = {
+            "placed" : len(hours),
+            "unplaced" : sum(1 for arrival, result in outcomes if arrival["prior"] == prior and result is None),
+            "p10" : percentile(hours, 0.10),
+            "p50" : percentile(hours, 0.50),
+            "p90" : percentile(hours, 0.90),
+            "p99" : percentile(hours, 0.99),
+            "max" : max(hours) if hours else float("nan"),
+        }
+
+    return {
+        "policy" : policy,
+        "requests" : len(outcomes),
+        "planner_seconds" : total,
+        "throughput" : len(outcomes) / total if total else float("nan"),
+        "latency_ms" : {name : percentile(per_request, share) * 1000 for name, share in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99), ("max", 1.0))},
+        "cancelled" : cancelled,
+        "utilization" : calendar.utilization(start, days),
+        "waits_h" : waits,
+        "daily" : [
+            {"day" : day, "requests" : stats["requests"], "fill" : stats["fill"], "p50_ms" : statistics.median(stats["latencies"]) * 1000}
+            for day, stats in sorted(daily.items())
+        ],
+    }
+
+def report(summary : dict) -> None:
+    latency = summary["latency_ms"]
+    print(f"--- {summary['policy']}: {summary['requests']} requests, {summary['cancelled']} cancelled")
+    print(f"  throughput {summary['throughput']:,.0f} decisions/s over {summary['planner_seconds'] * 1000:.1f} ms of planning")
+    print(f"  latency    p50 {latency['p50']:.3f} ms  p95 {latency['p95']:.3f} ms  p99 {latency['p99']:.3f} ms  max {latency['max']:.3f} ms")
+    print(f"  utilization of the simulated days {summary['utilization']:.1%}")
+    print(f"  {'wait (h)':<9}{'placed':>8}{'unplaced':>10}{'p10':>8}{'p50':>8}{'p90':>8}{'p99':>8}{'max':>8}")
+    for prior, wait in summary["waits_h"].items():
+        print(f"  {prior:<9}{wait['placed']:>8}{wait['unplaced']:>10}{wait['p10']:>8.1f}{wait['p50']:>8.1f}{wait['p90']:>8.1f}{wait['p99']:>8.1f}{wait['max']:>8.1f}")
+    print(f"  {'day':<5}{'requests':>9}{'horizon fill':>14}{'p50 latency':>13}")
+    for day in summary["daily"]:
+        print(f"  {day['day']:<5}{day['requests']:>9}{day['fill']:>14.1%}{day['p50_ms']:>10.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--policy", nargs="+", choices=sorted(POLICIES), default=["single", "specialty", "batch"])
+    parser.add_argument("--trace", help="recorded arrivals as JSON lines, instead of a synthetic stream")
+    parser.add_argument("--start", default="2026-01-05", help="first simulated day, %%Y-%%m-%%d")
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--rate", type=float, default=12.0, help="synthetic arrivals per hour")
+    parser.add_argument("--mix", type=float, nargs=3, default=[2, 5, 3], metavar=("HIGH", "MEDIUM", "LOW"))
+    parser.add_argument("--doctors", type=int, default=60)
+    parser.add_argument("--specializations", type=int, default=6)
+    parser.add_argument("--doctor-share", type=float, default=0.2, help="share of arrivals asking for one doctor")
+    parser.add_argument("--half-hour-share", type=float, default=0.0, help="share of doctors working 30-minute slots")
+    parser.add_argument("--occupancy", type=float, default=0.3, help="share of slots already booked at the start")
+    parser.add_argument("--cancel-rate", type=float, default=0.05)
+    parser.add_argument("--horizon", type=int, default=7, help="planning horizon in days")
+    parser.add_argument("--batch-window", type=int, default=30, help="minutes between batch planner runs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the summaries to this file, for comparing runs")
+    args = parser.parse_args()
+
+    start = datetime.strptime(args.start, "%Y-%m-%d")
+    rng = random.Random(args.seed)
+    if args.trace:
+        arrivals, schedules, pools = recorded_arrivals(args.trace)
+        if arrivals:
+            start = datetime(arrivals[0]["time"].year, arrivals[0]["time"].month, arrivals[0]["time"].day)
+            args.days = (arrivals[-1]["time"] - start).days + 1
+    else:
+        schedules, pools = synthetic_population(args.doctors, args.specializations, args.half_hour_share, rng)
+        arrivals = synthetic_arrivals(start, args.days, args.rate, args.mix, args.doctor_share, pools, rng)
+
+    summaries = []
+    for policy in args.policy:
+        summary = simulate(policy, arrivals, schedules, pools, args, start)
+        report(summary)
+        summaries.append(summary)
+
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(summaries, out, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,67 @@
+from app.core.startup import StartupTimings
 from fastapi import FastAPI , Request
 from app.core.db import Database
 from app.models.prediction_models import PredictionModels
+from app.modules.prediction.executor import InferenceExecutor
+from app.modules.prediction.cache import PredictionCache
+from app.modules.availability.repository import AvailabilityRepository
+from app.modules.availability.cache import CalendarCache
+from app.modules.appointment.repository import AppointmentRepository
 from contextlib import asynccontextmanager
 from app.endpoints import prediction
 from app.endpoints import appointment
 from app.endpoints import log 
+from app.endpoints import health
+from app.endpoints import metrics
 from fastapi.middleware.cors import CORSMiddleware
 from app.modules.log.model import LogEntry
 import datetime 
+import time
 from app.modules.log.service import LogService
+from app.modules.log.writer import LogWriter
+from app.modules.log.archive import LogArchive
+from app.modules.log.migration import TimestampMigration
+from app.core.metrics import REQUEST_DURATION, REQUESTS, IN_FLIGHT
+from app.modules.log.repository import LogRepository, RollupRepository
 import jwt 
 from app.core.config import settings
 
+StartupTimings.mark("imports")
+
 def decode_token(token : str) -> dict:
     info = jwt.decode(token, settings.SECRET_KEY, settings.JWT_ALGORITHM)
     return info
 
 @asynccontextmanager
 async def lifespan(app : FastAPI):
-    await Database.connectToDatabase()
-    await PredictionModels.load_prediction_models()
+    with StartupTimings.phase("db_connect"):
+        await Database.connectToDatabase()
+        # The client connects lazily, the ping makes the connection cost show up here
+        await Database.db.command("ping")
+        await AvailabilityRepository.setup()
+        await AppointmentRepository.setup()
+        await LogRepository.setup()
+        await RollupRepository.setup()
+
+    if settings.MODEL_WARMUP == "eager":
+        await PredictionModels.warm_up()
+    else:
+        PredictionModels.start_warm_up()
+    PredictionModels.start_reloader()
+    InferenceExecutor.start()
+    await PredictionCache.start()
+    CalendarCache.start()
+    LogWriter.start()
+    LogArchive.start()
+    TimestampMigration.start()
+    print(f"Startup timings: {StartupTimings.report()}")
     yield 
+    await PredictionModels.stop_reloader()
+    InferenceExecutor.shutdown()
+    await CalendarCache.stop()
+    await TimestampMigration.stop()
+    await LogArchive.stop()
+    await LogWriter.stop()
     await Database.disconnectFromDatabase()
 
 app = FastAPI(lifespan=lifespan)
@@ -36,7 +77,15 @@ origins = [
 @app.middleware("http")
 async def function_func(request : Request , callable):
 
-    result = await callable(request)
+    started = time.perf_counter()
+    IN_FLIGHT.inc()
+    try:
+        result = await callable(request)
+    finally:
+        IN_FLIGHT.dec()
+    route = getattr(request.scope.get("route") , "path" , "unmatched")
+    REQUEST_DURATION.observe((request.method , route) , time.perf_counter() - started)
+    REQUESTS.inc((request.method , route , f"{result.status_code // 100}xx"))
           
     try:
          authorization_header = request.headers.get("Authorization")[len("Bearer ") : ]
@@ -44,32 +93,31 @@ async def function_func(request : Request , callable):
     except:
         user_info = {}
     
-    entry = LogEntry
-    
     status_code = result.status_code 
 
     if status_code < 300: 
-        entry.type = "OK"
+        log_type = "OK"
     elif status_code < 400:
-        entry.type = "Redirect"
+        log_type = "Redirect"
     elif status_code < 500:
-        entry.type = "Bad Request"
+        log_type = "Bad Request"
     else:
-        entry.type = "Server Error"
+        log_type = "Server Error"
 
-    if "email" in user_info.keys():
-        entry.user = user_info["email"]
-    else:
-        entry.user = ""
-
-    entry.timestamp = datetime.datetime.now()
-    
     base_url = '%s' % (request.base_url)
     url = '%s' % (request.url)
 
-    entry.activity = url[ len(base_url) : ]
-
-    await LogService.insert_log(entry , user_info)
+    # A new entry per request, queued for the background writer so the response doesn't wait on the insert
+    entry = LogEntry(
+        type = log_type ,
+        timestamp = datetime.datetime.now() ,
+        activity = url[ len(base_url) : ] ,
+        user = user_info.get("email" , "") ,
+        route = route ,
+        status = status_code ,
+        role = user_info.get("role" , "")
+    )
+    await LogService.queue_log(entry)
 
     return result
 
@@ -84,4 +132,6 @@ app.add_middleware(
 #Endpoints
 app.include_router(prediction.router)
 app.include_router(appointment.router)
-app.include_router(log.router)
\ No newline at end of file
+app.include_router(log.router)
+app.include_router(health.router)
+app.include_router(metrics.router)
\ No newline at end of file